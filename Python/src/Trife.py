@@ -2,7 +2,7 @@
 # 1. IMPORT LIBRARIES
 # =================================================================================
 import pygame
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 import math
 import random
@@ -10,6 +10,32 @@ import json
 import uuid
 import threading
 import time
+import sys
+import argparse
+import collections
+import struct
+import mmap
+from array import array
+import wave
+import hashlib
+import traceback
+import logging
+import logging.handlers
+import tempfile
+import shutil
+import tracemalloc
+import bisect
+import itertools
+import contextlib
+import socket
+import socketserver
+import http.server
+import ipaddress
+import stat
+import zlib
+import select
+import ctypes
+import ctypes.util
 
 # --- Weather HTTP ---
 try:
@@ -33,36 +59,217 @@ except Exception:
     filedialog = None
     print("Warning: 'tkinter' not available. File picker will be disabled.")
 
+# --- Tone synthesis (optional; a pure-Python path is used without it) ---
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 # --- NEW: System Stats ---
 try:
     import psutil
 except ImportError:
     psutil = None
-    print("Warning: 'psutil' not found. System Stats view will be disabled.")
+    print("Warning: 'psutil' not found. System Stats will fall back to /proc (Linux only).")
 
 
 # =================================================================================
 # 2. INITIALIZE & SETUP CORE APP VARIABLES
 # =================================================================================
+# --- Command-line options ---
+arg_parser = argparse.ArgumentParser(description="Trife Living Clock")
+arg_parser.add_argument("--bench-sampler", type=int, nargs="?", const=500, default=None, metavar="N",
+                        help="time N samples of each system sampler backend, print the results and exit")
+arg_parser.add_argument("--bench-gain", action="store_true",
+                        help="time building the amplified notification buffer at each gain level and exit")
+arg_parser.add_argument("--scale", type=float, default=None, metavar="S",
+                        help="UI scale factor for this run (overrides display.ui_scale in config.json)")
+arg_parser.add_argument("--record", default=None, metavar="FILE",
+                        help="record this session's input to FILE so it can be played back with --replay")
+arg_parser.add_argument("--replay", default=None, metavar="FILE",
+                        help="replay a recorded session headlessly, print frame timings and the final state hash, and exit")
+arg_parser.add_argument("--replay-timings", default=None, metavar="CSV",
+                        help="with --replay: also write every frame's time to CSV")
+arg_parser.add_argument("--expect-hash", default=None, metavar="HEX",
+                        help="with --replay: exit with status 1 unless the final state hash starts with HEX")
+arg_parser.add_argument("--memory-report", action="store_true",
+                        help="trace Python allocations from startup and print a memory report on exit (F9 prints one any time)")
+arg_parser.add_argument("--profile", default=None, metavar="WINDOW",
+                        help="sample the main loop into collapsed-stack files: 'flip' profiles every view flip, "
+                             "a number profiles that many seconds from startup (F10 starts/stops a session any time)")
+arg_parser.add_argument("--profile-hz", type=int, default=100, metavar="HZ",
+                        help="profiler sampling rate (default 100)")
+arg_parser.add_argument("--render", default=None, metavar="DIR",
+                        help="render views to PNG files in DIR from injected state, without a window, and exit")
+arg_parser.add_argument("--render-views", default="main", metavar="LIST",
+                        help="with --render: comma-separated view names, or 'all' (default main)")
+arg_parser.add_argument("--render-matrix", action="store_true",
+                        help="with --render: every theme x digit colour x background, not just the configured look")
+arg_parser.add_argument("--render-state", default=None, metavar="FILE",
+                        help="with --render: JSON overriding the injected 'time', 'weather' (a weatherapi.com "
+                             "response or a path to one; default assets/Output.json), 'system' and 'pomodoro'")
+cli_args, _ = arg_parser.parse_known_args()
+if cli_args.profile not in (None, 'flip'):
+    try:
+        cli_args.profile = float(cli_args.profile)
+    except ValueError:
+        arg_parser.error("--profile takes 'flip' or a number of seconds")
+
+if cli_args.memory_report:
+    tracemalloc.start()  # before any asset loads, so their allocation sites are attributed
+
+# One-shot command-line tools never need a visible window or audio device
+HEADLESS = (cli_args.bench_sampler is not None or cli_args.bench_gain or cli_args.replay is not None
+            or cli_args.render is not None)
+if HEADLESS:
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+# Profiles are written where the app was started, even when a replay moves into its sandbox below
+PROFILE_DIR = os.path.abspath('profiles')
+
+# Injected state for --render: a fixed moment, the weather recorded in assets/Output.json and
+# made-up system and pomodoro readings, so a tree renders the same pixels on any machine
+RENDER_STATE = {
+    "time": "2025-10-14T12:59:30",
+    "weather": None,
+    "system": {"cpu": 23.5, "ram_pct": 47.9, "ram_total": 15.6, "ram_used": 7.5, "backend": "render",
+               "disk_read": 52e3, "disk_write": 18e3, "net_rx": 3.1e3, "net_tx": 1.2e3,
+               "self": {"cpu": 2.1, "rss": 96 * 1024**2, "threads": 7, "fds": 23, "fps": 60.0, "frame_ms": 3.2}},
+    "pomodoro": {"mode": "focus", "sessions_completed": 2, "running": True, "remaining_ms": 754000},
+}
+
+# --- Replay / render / benchmark sandbox ---
+# A replay starts from the settings and tasks saved in the recording, inside a scratch directory,
+# so every run begins identically and the user's own files are never read or written. A render
+# copies the user's settings and tasks into one, with the injected pomodoro state beside them.
+# A benchmark copies only the settings, so the pomodoro state and metrics history it builds on
+# the way (with a sample taken under benchmark load) stay out of the user's files.
+SESSION_VERSION = 1
+sandbox_dir = None
+render_state, render_epoch = None, None
+if cli_args.replay:
+    cli_args.replay = os.path.abspath(cli_args.replay)
+    if cli_args.replay_timings:
+        cli_args.replay_timings = os.path.abspath(cli_args.replay_timings)
+    try:
+        with open(cli_args.replay, 'r') as f:
+            replay_header = json.loads(f.readline())
+    except (OSError, json.JSONDecodeError) as e:
+        sys.exit(f"Cannot read recording {cli_args.replay}: {e}")
+    if replay_header.get("version") != SESSION_VERSION:
+        sys.exit(f"Recording {cli_args.replay} is version {replay_header.get('version')}, expected {SESSION_VERSION}")
+    cli_args.scale = replay_header["ui_scale"]  # recorded positions are in that scale's pixels
+    sandbox_dir = tempfile.mkdtemp(prefix="trife-replay-")
+    os.chdir(sandbox_dir)
+    with open('config.json', 'w') as f:
+        json.dump(replay_header["config"], f)
+    with open('todo.json', 'w') as f:
+        json.dump(replay_header["tasks"], f)
+elif cli_args.render:
+    cli_args.render = os.path.abspath(cli_args.render)
+    render_state = dict(RENDER_STATE)
+    try:
+        if cli_args.render_state:
+            with open(cli_args.render_state, 'r') as f:
+                render_state.update(json.load(f))
+        if isinstance(render_state["weather"], str):
+            with open(render_state["weather"], 'r') as f:
+                render_state["weather"] = json.load(f)
+        render_epoch = datetime.fromisoformat(render_state["time"]).timestamp()
+    except (OSError, ValueError) as e:
+        sys.exit(f"Cannot read render state: {e}")
+    saved = {}
+    for name in ('config.json', 'todo.json'):
+        try:
+            with open(name, 'r') as f:
+                saved[name] = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            pass
+    (saved.get('config.json') or {}).get("weather", {}).pop("api_key", None)   # nothing is fetched
+    sandbox_dir = tempfile.mkdtemp(prefix="trife-render-")
+    os.chdir(sandbox_dir)
+    for name, content in saved.items():
+        with open(name, 'w') as f:
+            json.dump(content, f)
+    pomodoro_state = dict(render_state["pomodoro"])
+    if pomodoro_state.get("running"):
+        pomodoro_state["deadline_epoch"] = render_epoch + pomodoro_state.get("remaining_ms", 0) / 1000
+    with open('pomodoro_state.json', 'w') as f:
+        json.dump(pomodoro_state, f)
+elif HEADLESS:
+    saved = None
+    try:
+        with open('config.json', 'r') as f:
+            saved = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        pass
+    sandbox_dir = tempfile.mkdtemp(prefix="trife-bench-")
+    os.chdir(sandbox_dir)
+    if saved is not None:
+        with open('config.json', 'w') as f:
+            json.dump(saved, f)
+
 pygame.init()
-WIDTH, HEIGHT = 600, 600
-CORNER_RADIUS = 25
 CONFIG_FILE = 'config.json'
 TODO_FILE = 'todo.json'
+POMODORO_STATE_FILE = 'pomodoro_state.json'
+POMODORO_LOG_FILE = 'pomodoro_history.bin'
+POMODORO_ROLLUP_FILE = 'pomodoro_rollups.json'
+HISTORY_DIR = 'history'
+SOUND_CACHE_DIR = 'sound_cache'
+
+# --- Layout scale ---
+# Every position and size in this file is written in layout units for a 600x600 window;
+# px() converts them to real pixels so a 4K display renders natively at 2x instead of upscaling.
+BASE_WIDTH, BASE_HEIGHT = 600, 600
+UI_SCALE_STEP = 0.25
+display_config = {"ui_scale": "auto"}   # "auto" (from the desktop height) or a number such as 1.5
+
+def read_display_config():
+    """The scale has to be known before the window exists, so it is read ahead of load_settings()."""
+    try:
+        with open(CONFIG_FILE, 'r') as f:
+            dc = json.load(f).get("display", {})
+        display_config["ui_scale"] = dc.get("ui_scale", display_config["ui_scale"])
+    except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+        pass
+
+def resolve_ui_scale(configured):
+    """Configured number, or 1x per 1080 desktop rows rounded down to UI_SCALE_STEP (1.0 – 4.0)."""
+    try:
+        scale = float(configured)
+    except (TypeError, ValueError):
+        desktop_h = pygame.display.Info().current_h if not HEADLESS else 0
+        scale = math.floor(desktop_h / 1080 / UI_SCALE_STEP) * UI_SCALE_STEP if desktop_h > 0 else 1.0
+    return max(1.0, min(4.0, scale))
+
+def px(value):
+    """Layout units -> pixels at the current UI scale."""
+    return int(round(value * UI_SCALE))
+
+def px_rect(x, y, w, h):
+    return pygame.Rect(px(x), px(y), px(w), px(h))
+
+read_display_config()
+UI_SCALE = resolve_ui_scale(cli_args.scale if cli_args.scale else display_config["ui_scale"])
+WIDTH, HEIGHT = px(BASE_WIDTH), px(BASE_HEIGHT)
+CORNER_RADIUS = px(25)
 
 # --- Paths ---
-script_dir = os.path.dirname(__file__)
+script_dir = os.path.dirname(os.path.abspath(__file__))
 assets_dir = os.path.join(script_dir, '..', 'assets')
 fonts_dir = os.path.join(assets_dir, 'fonts')
+characters_dir = os.path.join(assets_dir, 'characters')  # optional extra character packs, one folder each
 TRANSPARENT_COLOR = (0, 255, 0)
 
 # --- MODIFIED: Top bar buttons (added system and focus) ---
-settings_button_rect = pygame.Rect(10, 10, 30, 30)
-weather_button_rect  = pygame.Rect(50, 10, 30, 30)
-pomodoro_button_rect = pygame.Rect(90, 10, 30, 30)
-system_button_rect   = pygame.Rect(130, 10, 30, 30) # --- NEW ---
-focus_button_rect    = pygame.Rect(170, 10, 30, 30) # --- NEW ---
-close_button_rect    = pygame.Rect(WIDTH - 40, 10, 30, 30)
+settings_button_rect = px_rect(10, 10, 30, 30)
+weather_button_rect  = px_rect(50, 10, 30, 30)
+pomodoro_button_rect = px_rect(90, 10, 30, 30)
+system_button_rect   = px_rect(130, 10, 30, 30) # --- NEW ---
+focus_button_rect    = px_rect(170, 10, 30, 30) # --- NEW ---
+close_button_rect    = px_rect(BASE_WIDTH - 40, 10, 30, 30)
 
 # =================================================================================
 # 3. CREATE THE CUSTOM WINDOW
@@ -81,74 +288,382 @@ if win32api:
     win32gui.SetLayeredWindowAttributes(hwnd, win32api.RGB(*TRANSPARENT_COLOR), 0, win32con.LWA_COLORKEY)
 
 
+# =================================================================================
+# 3.4 SCALED ASSET CACHE
+# =================================================================================
+class ScaledAssets:
+    """Fonts and images rasterized once for the UI scale. Images are keyed by scale as well, so a
+    different scale re-rasterizes from the source file instead of resampling scaled pixels."""
+    def __init__(self, scale):
+        self.scale = scale
+        self._fonts = {}
+        self._images = {}
+        self.hits = self.misses = 0
+
+    def font(self, path, size):
+        """Font for a size in layout units."""
+        return self.font_px(path, max(1, int(round(size * self.scale))))
+
+    def font_px(self, path, pixel_size):
+        key = (path, pixel_size)
+        if key in self._fonts:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self._fonts[key] = pygame.font.Font(path, pixel_size)
+        return self._fonts[key]
+
+    def image(self, path, size=None, smooth=True):
+        """Image at `size` layout units (None: the file's own size, scaled)."""
+        key = (self.scale, path, size, smooth)
+        if key in self._images:
+            self.hits += 1
+        else:
+            self.misses += 1
+            src = pygame.image.load(path).convert_alpha()
+            w, h = size or src.get_size()
+            target = (max(1, int(round(w * self.scale))), max(1, int(round(h * self.scale))))
+            if target == src.get_size():
+                self._images[key] = src
+            else:
+                resize = pygame.transform.smoothscale if smooth else pygame.transform.scale
+                self._images[key] = resize(src, target)
+        return self._images[key]
+
+    def surfaces(self):
+        return list(self._images.values())
+
+scaled_assets = ScaledAssets(UI_SCALE)
+
+
+class BackgroundStore:
+    """Backgrounds by key, in the order added. Only the background on screen is held at full size,
+    already dimmed and rounded; the others are a file path plus a small preview made once for the
+    Settings view, and are decoded again if they get selected (off the main thread after preload())."""
+    THUMB_SIZE = (100, 60)   # layout units, the size of a Settings preview
+    DIM = (0, 0, 0, 80)
+
+    def __init__(self, size, radius):
+        self.size = size
+        self.radius = radius
+        self.version = 0     # bumped whenever backgrounds are added or dropped
+        self._paths = {}
+        self._thumbs = {}
+        self._full_key, self._full = None, None
+        self._lock = threading.Lock()
+        self._preloading = set()     # keys a worker is decoding; display() keeps the old image meanwhile
+        self._preloaded = {}         # key -> (path, surface or the exception raised)
+        self.hits = self.misses = 0   # display()/thumbnail() calls answered from a held surface / that built one
+
+    def add(self, key, path):
+        """Register (or replace) a background. Only checks the file exists; decoding waits until it is needed."""
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        self._paths[key] = path
+        self._thumbs.pop(key, None)
+        self._preloading.discard(key)
+        if self._full_key == key:
+            self._full_key, self._full = None, None
+        self.version += 1
+
+    def __contains__(self, key):
+        return key in self._paths
+
+    def keys(self):
+        return list(self._paths)
+
+    def _load(self, path):
+        image = pygame.transform.scale(pygame.image.load(path).convert_alpha(), self.size)
+        dim = pygame.Surface(self.size, pygame.SRCALPHA)
+        dim.fill(self.DIM)
+        image.blit(dim, (0, 0))
+        return apply_rounded_corners(image, self.radius)
+
+    def _drop(self, key, error):
+        print(f"Warning: could not load background '{key}': {error}")
+        del self._paths[key]
+        self._thumbs.pop(key, None)
+        self.version += 1
+
+    def preload(self, key):
+        """Decode a background on a worker thread. Until it is ready, display() of that key keeps
+        returning the background already on screen, so switching to it never stalls a frame."""
+        if key == self._full_key or key in self._preloading or key not in self._paths:
+            return
+        path = self._paths[key]
+        self._preloading.add(key)
+
+        def work():
+            try:
+                result = self._load(path)
+            except Exception as e:
+                result = e
+            with self._lock:
+                self._preloaded[key] = (path, result)
+        threading.Thread(target=work, name="background-decode", daemon=True).start()
+
+    def display(self, key):
+        """Full-size surface for a background (bg1 if the key is unknown or its file is unreadable)."""
+        if key not in self._paths:
+            key = 'bg1'
+        if key == self._full_key:
+            self.hits += 1
+            return self._full
+        full = None
+        if key in self._preloading:
+            with self._lock:
+                path, full = self._preloaded.pop(key, (None, None))
+            if path is None and self._full is not None:
+                return self._full    # still decoding: keep the current background up
+            self._preloading.discard(key)
+            if path != self._paths[key]:
+                full = None          # replaced by add() since the worker started
+        self.misses += 1
+        try:
+            if full is None:
+                full = self._load(self._paths[key])
+            elif isinstance(full, Exception):
+                raise full
+        except Exception as e:
+            if key == 'bg1':
+                raise
+            self._drop(key, e)
+            return self.display('bg1')
+        self._full_key, self._full = key, full
+        return full
+
+    def thumbnail(self, key):
+        """THUMB_SIZE preview, or None if the file could not be read (the background is dropped)."""
+        if key in self._thumbs:
+            self.hits += 1
+        else:
+            self.misses += 1
+            try:
+                full = self._full if key == self._full_key else self._load(self._paths[key])
+            except Exception as e:
+                self._drop(key, e)
+                return None
+            self._thumbs[key] = pygame.transform.smoothscale(full, (px(self.THUMB_SIZE[0]), px(self.THUMB_SIZE[1])))
+        return self._thumbs[key]
+
+    def surfaces(self):
+        return ([self._full] if self._full is not None else []) + list(self._thumbs.values())
+
+
+# =================================================================================
+# 3.5 SPRITE SHEETS & CHIBI ANIMATION
+# =================================================================================
+class SpriteSheet:
+    """All frames of one character packed into a single surface, cropped to their shared bounding box.
+    Frames are subsurfaces of the sheet; `anchor` is the crop's offset from the original frame centre."""
+    STATES = ('normal', 'blush')
+    # Pack folders without a sheet.png use the original one-file-per-frame layout
+    FRAME_FILES = {'normal': ['open.png', 'half.png', 'off.png'],
+                   'blush':  ['blushOpen.png', 'blushhalf.png', 'blushClose.png']}
+
+    def __init__(self, frames_by_state, scale=1.0):
+        first = frames_by_state[self.STATES[0]][0]
+        fw, fh = first.get_size()
+        crop = None
+        for frames in frames_by_state.values():
+            for frame in frames:
+                if frame.get_size() != (fw, fh):
+                    raise ValueError("all frames of a character must be the same size")
+                box = frame.get_bounding_rect()
+                crop = box if crop is None else crop.union(box)
+        # Cells are rasterized at the UI scale once here, never per frame
+        cw, ch = max(1, int(round(crop.width * scale))), max(1, int(round(crop.height * scale)))
+        cols = max(len(frames) for frames in frames_by_state.values())
+        self.surface = pygame.Surface((cw * cols, ch * len(frames_by_state)), pygame.SRCALPHA)
+        self.frames = {}
+        for row, (state, frames) in enumerate(frames_by_state.items()):
+            self.frames[state] = []
+            for col, frame in enumerate(frames):
+                cell = pygame.Rect(col * cw, row * ch, cw, ch)
+                if (cw, ch) == crop.size:
+                    self.surface.blit(frame, cell.topleft, crop)
+                else:
+                    self.surface.blit(pygame.transform.smoothscale(frame.subsurface(crop), cell.size), cell.topleft)
+                self.frames[state].append(self.surface.subsurface(cell))
+        self.anchor = (int(round((crop.x - fw // 2) * scale)), int(round((crop.y - fh // 2) * scale)))
+
+    @classmethod
+    def load(cls, directory, scale=1.0):
+        """sheet.png + sheet.json ({"frame_size": [w, h], "states": {"normal": row, "blush": row}})
+        when present, otherwise the individual frame files."""
+        meta_path = os.path.join(directory, 'sheet.json')
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            sheet = pygame.image.load(os.path.join(directory, 'sheet.png')).convert_alpha()
+            fw, fh = meta["frame_size"]
+            cols = sheet.get_width() // fw
+            frames = {state: [sheet.subsurface((col * fw, meta["states"][state] * fh, fw, fh)) for col in range(cols)]
+                      for state in cls.STATES}
+        else:
+            frames = {state: [pygame.image.load(os.path.join(directory, name)).convert_alpha() for name in names]
+                      for state, names in cls.FRAME_FILES.items()}
+        if any(len(frames[state]) < 3 for state in cls.STATES):
+            raise ValueError("each state needs open, half-closed and closed frames")
+        return cls(frames, scale)
+
+
+class CharacterLibrary:
+    """Character packs by name: 'default' is the assets folder itself, others are folders in
+    characters_dir. Packs are only read from disk the first time they are asked for, per scale."""
+    def __init__(self, default_dir, packs_dir, scale=1.0):
+        self.default_dir = default_dir
+        self.packs_dir = packs_dir
+        self.scale = scale
+        self._sheets = {}
+
+    def names(self):
+        try:
+            packs = sorted(name for name in os.listdir(self.packs_dir)
+                           if os.path.isdir(os.path.join(self.packs_dir, name)))
+        except OSError:
+            packs = []
+        return ['default'] + [name for name in packs if name != 'default']
+
+    def get(self, name):
+        """SpriteSheet for a pack, or None if it is missing or broken (the caller falls back to 'default')."""
+        key = (name, self.scale)
+        if key not in self._sheets:
+            directory = self.default_dir if name == 'default' else os.path.join(self.packs_dir, name)
+            try:
+                self._sheets[key] = SpriteSheet.load(directory, self.scale)
+            except Exception as e:
+                if name == 'default':
+                    raise
+                print(f"Warning: could not load character pack '{name}': {e}")
+                self._sheets[key] = None
+        return self._sheets[key]
+
+    def surfaces(self):
+        return [sheet.surface for sheet in self._sheets.values() if sheet is not None]
+
+
+class SpriteAnimator:
+    """Blink/blush state machine plus the idle bob. update() advances it and returns the screen
+    rect that changed this frame (None when the sprite looks exactly as it did last frame)."""
+    BLINK_SEQUENCE = [0, 1, 2, 1, 0]
+    BLINK_FRAME_MS = 75
+    BOB_AMPLITUDE = 5
+    BOB_PERIOD_MS = 2000 * math.pi   # same motion as sin(now * 0.001)
+    BOB_STEPS = 60                   # table entries per period; whole-pixel offsets, so most steps change nothing
+
+    def __init__(self, sheet, center):
+        self.sheet = sheet
+        self.center = center
+        self.bob_table = [px(math.sin(2 * math.pi * i / self.BOB_STEPS) * self.BOB_AMPLITUDE)
+                          for i in range(self.BOB_STEPS)]
+        self.state = 'normal'
+        self.frame_index = 0
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        self._in_blink = False
+        self._blink_step = 0
+        self._last_blink = 0
+        self._next_blink_delay = random.randint(2000, 5000)
+        self._last_frame_update = 0
+        self._next_state_change = 0
+        self._drawn = None   # (sheet, state, frame, topleft) of the last frame reported
+
+    def set_sheet(self, sheet):
+        self.sheet = sheet
+
+    def poke(self, now):
+        """Petting: blush for a few seconds and blink right away."""
+        self.state = 'blush'
+        self._next_state_change = now + random.randint(4000, 6000)
+        self._in_blink = True
+        self._blink_step = 0
+        self._last_blink = now
+
+    def bob_offset(self, now):
+        return self.bob_table[int((now % self.BOB_PERIOD_MS) * self.BOB_STEPS / self.BOB_PERIOD_MS)]
+
+    @property
+    def image(self):
+        return self.sheet.frames[self.state][self.frame_index]
+
+    def update(self, now):
+        if now > self._next_state_change:
+            self.state = 'blush' if self.state == 'normal' and random.random() < 0.4 else 'normal'
+            self._next_state_change = now + random.randint(5000 if self.state == 'blush' else 10000,
+                                                           8000 if self.state == 'blush' else 20000)
+        if not self._in_blink and now - self._last_blink > self._next_blink_delay:
+            self._in_blink = True; self._blink_step = 0
+            self._last_blink = now; self._next_blink_delay = random.randint(2000, 5000)
+        if self._in_blink and now - self._last_frame_update > self.BLINK_FRAME_MS:
+            self.frame_index = self.BLINK_SEQUENCE[self._blink_step]
+            self._blink_step += 1; self._last_frame_update = now
+            if self._blink_step >= len(self.BLINK_SEQUENCE):
+                self._in_blink = False; self._blink_step = 0
+
+        ax, ay = self.sheet.anchor
+        topleft = (self.center[0] + ax, self.center[1] + self.bob_offset(now) + ay)
+        drawn = (self.sheet, self.state, self.frame_index, topleft)
+        if drawn == self._drawn:
+            return None
+        previous = self.rect
+        self.rect = self.image.get_rect(topleft=topleft)
+        self._drawn = drawn
+        return self.rect.union(previous) if previous.width else self.rect.copy()
+
+    def draw(self, surface):
+        surface.blit(self.image, self.rect)
+
+
 # =================================================================================
 # 4. LOAD ASSETS & DEFINE THEMES
 # =================================================================================
 try:
-    chibi_frames = {
-        'normal': [
-            pygame.image.load(os.path.join(assets_dir, 'open.png')).convert_alpha(),
-            pygame.image.load(os.path.join(assets_dir, 'half.png')).convert_alpha(),
-            pygame.image.load(os.path.join(assets_dir, 'off.png')).convert_alpha()
-        ],
-        'blush': [
-            pygame.image.load(os.path.join(assets_dir, 'blushOpen.png')).convert_alpha(),
-            pygame.image.load(os.path.join(assets_dir, 'blushhalf.png')).convert_alpha(),
-            pygame.image.load(os.path.join(assets_dir, 'blushClose.png')).convert_alpha()
-        ]
-    }
+    character_library = CharacterLibrary(assets_dir, characters_dir, UI_SCALE)
+    character_library.get('default')
 
-    _temp_raw_backgrounds = {}
-    _temp_raw_backgrounds['bg1'] = pygame.transform.scale(
-        pygame.image.load(os.path.join(assets_dir, 'bg.jpg')).convert_alpha(), (WIDTH, HEIGHT)
-    )
+    backgrounds = BackgroundStore((WIDTH, HEIGHT), CORNER_RADIUS)
+    backgrounds.add('bg1', os.path.join(assets_dir, 'bg.jpg'))
     try:
-        _temp_raw_backgrounds['bg2'] = pygame.transform.scale(
-            pygame.image.load(os.path.join(assets_dir, 'bg_2.jpeg')).convert_alpha(), (WIDTH, HEIGHT)
-        )
+        backgrounds.add('bg2', os.path.join(assets_dir, 'bg_2.jpeg'))
     except FileNotFoundError:
         print("Warning: 'bg_2.jpeg' not found. Using 'bg1.jpg' as a fallback.")
-    raw_backgrounds = _temp_raw_backgrounds
 
     # ICONS (customizable): gear.png (required), weather.png (optional), pomodoro.png (optional)
-    settings_icon = pygame.transform.scale(
-        pygame.image.load(os.path.join(assets_dir, 'gear.png')).convert_alpha(), (30, 30)
-    )
+    settings_icon = scaled_assets.image(os.path.join(assets_dir, 'gear.png'), (30, 30), smooth=False)
     weather_png = None
     pomodoro_png = None
     try:
-        weather_png = pygame.image.load(os.path.join(assets_dir, 'weather.png')).convert_alpha()
-        weather_png = pygame.transform.smoothscale(weather_png, (30, 30))
+        weather_png = scaled_assets.image(os.path.join(assets_dir, 'weather.png'), (30, 30))
     except Exception:
         weather_png = None
     try:
-        pomodoro_png = pygame.image.load(os.path.join(assets_dir, 'pomodoro.png')).convert_alpha()
-        pomodoro_png = pygame.transform.smoothscale(pomodoro_png, (30, 30))
+        pomodoro_png = scaled_assets.image(os.path.join(assets_dir, 'pomodoro.png'), (30, 30))
     except Exception:
         pomodoro_png = None
 
     # To-Do icons (placeholder)
-    add_task_icon = pygame.Surface((20, 20), pygame.SRCALPHA)
-    pygame.draw.circle(add_task_icon, (100, 255, 100), (10, 10), 9)
-    pygame.draw.line(add_task_icon, (0, 0, 0), (10, 5), (10, 15), 2)
-    pygame.draw.line(add_task_icon, (0, 0, 0), (5, 10), (15, 10), 2)
+    add_task_icon = pygame.Surface((px(20), px(20)), pygame.SRCALPHA)
+    pygame.draw.circle(add_task_icon, (100, 255, 100), (px(10), px(10)), px(9))
+    pygame.draw.line(add_task_icon, (0, 0, 0), (px(10), px(5)), (px(10), px(15)), px(2))
+    pygame.draw.line(add_task_icon, (0, 0, 0), (px(5), px(10)), (px(15), px(10)), px(2))
 
-    delete_task_icon = pygame.Surface((20, 20), pygame.SRCALPHA)
-    pygame.draw.circle(delete_task_icon, (255, 100, 100), (10, 10), 9)
-    pygame.draw.line(delete_task_icon, (0, 0, 0), (5, 5), (15, 15), 2)
-    pygame.draw.line(delete_task_icon, (0, 0, 0), (5, 15), (15, 5), 2)
+    delete_task_icon = pygame.Surface((px(20), px(20)), pygame.SRCALPHA)
+    pygame.draw.circle(delete_task_icon, (255, 100, 100), (px(10), px(10)), px(9))
+    pygame.draw.line(delete_task_icon, (0, 0, 0), (px(5), px(5)), (px(15), px(15)), px(2))
+    pygame.draw.line(delete_task_icon, (0, 0, 0), (px(5), px(15)), (px(15), px(5)), px(2))
 
     # Fonts (keep paths to compute dynamic sizes)
     FONT_BOLD_PATH = os.path.join(fonts_dir, 'Doto_Rounded-Bold.ttf')
     FONT_REG_PATH  = os.path.join(fonts_dir, 'Doto_Rounded-Regular.ttf')
 
-    font_bold = pygame.font.Font(FONT_BOLD_PATH, 150)  # main clock
-    font_regular = pygame.font.Font(FONT_REG_PATH, 36)
-    font_small = pygame.font.Font(FONT_REG_PATH, 24)
-    font_tiny = pygame.font.Font(FONT_REG_PATH, 18)
-    font_weather_big  = pygame.font.Font(FONT_BOLD_PATH, 96)
-    font_pomo_big     = pygame.font.Font(FONT_BOLD_PATH, 96)
-    font_sys_big = pygame.font.Font(FONT_BOLD_PATH, 80) # --- NEW ---
+    # Sizes are in layout units; scaled_assets rasterizes them at the UI scale
+    font_bold = scaled_assets.font(FONT_BOLD_PATH, 150)  # main clock
+    font_regular = scaled_assets.font(FONT_REG_PATH, 36)
+    font_small = scaled_assets.font(FONT_REG_PATH, 24)
+    font_tiny = scaled_assets.font(FONT_REG_PATH, 18)
+    font_weather_big  = scaled_assets.font(FONT_BOLD_PATH, 96)
+    font_pomo_big     = scaled_assets.font(FONT_BOLD_PATH, 96)
+    font_sys_big = scaled_assets.font(FONT_BOLD_PATH, 80) # --- NEW ---
 
 except Exception as e:
     print(f"FATAL ERROR: Could not load essential assets: {e}. Please check your assets folder and font files.")
@@ -161,91 +676,226 @@ DIGIT_COLORS = {"White": (255, 255, 255), "Black": (0, 0, 0), "Gray": (200, 200,
 # =================================================================================
 # 5. SETTINGS & PERSISTENCE
 # =================================================================================
+class Histogram:
+    """Observation counts per upper bound (cumulative on read, as Prometheus histograms are), plus
+    their sum. observe() takes a lock only long enough to bump two numbers, so any thread may call it."""
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.bounds) + 1)   # the last slot is +Inf
+        self._sum = 0.0
+
+    def observe(self, value):
+        slot = bisect.bisect_left(self.bounds, value)   # bounds are inclusive ("le")
+        with self._lock:
+            self._counts[slot] += 1
+            self._sum += value
+
+    def snapshot(self):
+        """(cumulative count per bound with +Inf last, sum of observations)."""
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        return list(itertools.accumulate(counts)), total
+
+# Seconds spent writing each persisted file, including any fsync or rename
+WRITE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+write_latency = {name: Histogram(WRITE_BUCKETS)
+                 for name in ("settings", "tasks", "pomodoro_state", "pomodoro_log", "metrics_history")}
+
+@contextlib.contextmanager
+def timed_write(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        write_latency[name].observe(time.perf_counter() - start)
+
 current_background_key = 'bg1'
 current_theme_color = THEMES["Purple"]
 current_digit_color = DIGIT_COLORS["White"]
+current_character = 'default'
 custom_background_path = None
 tasks = []
 is_focus_mode = False # --- NEW ---
 
-weather_config = {"api_key": "", "city": "Dhaka", "units": "metric", "refresh_minutes": 15}
+# idle_refresh_minutes: polling interval while no view showing weather is on screen
+weather_config = {"api_key": "", "city": "Dhaka", "units": "metric", "refresh_minutes": 15,
+                  "idle_refresh_minutes": 60}
 pomodoro_config = {"focus_minutes": 25, "short_break_minutes": 5, "long_break_minutes": 15,
                    "sessions_before_long": 4, "auto_advance": True}
+# Session lengths and sessions per long break are kept within the adjust sliders' ranges;
+# a zero-length session would never end and zero sessions would divide by zero
+POMODORO_MINUTES_RANGE = (1, 180)
+POMODORO_SESSIONS_RANGE = (1, 10)
 # volume control uses gain_percent 0..200 (100 = normal)
-sound_config = {"enabled": True, "path": None, "gain_percent": 100}
-
-def save_settings():
+# path is the default file; events maps a SoundManager event to its own file (None = default)
+sound_config = {"enabled": True, "path": None, "gain_percent": 100,
+                "events": {"focus_end": None, "break_end": None, "long_break": None,
+                           "weather_alert": None, "system_threshold": None}}
+# sampler: 'auto' | 'proc' | 'psutil' ('auto' prefers /proc on Linux)
+# self_log_seconds: how often the app logs its own overhead (0 = never)
+# alert_*_percent: play the system alert when sustained usage crosses it (0 disables)
+# idle_refresh_seconds: sampling interval while the System views are closed (0 = pause sampling)
+system_config = {"sampler": "auto", "refresh_seconds": 2, "self_log_seconds": 60,
+                 "alert_cpu_percent": 90, "alert_ram_percent": 90, "idle_refresh_seconds": 30}
+# CPU/RAM history kept on disk; max_kb caps both rollup files together
+history_config = {"enabled": True, "max_kb": 1024}
+# frame_budget_ms: a frame still running after this long has the main thread's stack logged (0 = off)
+# log_file rotates at log_max_kb, keeping log_backups old files
+watchdog_config = {"frame_budget_ms": 250, "log_file": "watchdog.log", "log_max_kb": 256, "log_backups": 3}
+# enabled serves Prometheus text metrics at /metrics on host:port, or on unix_socket (a path) when that is set;
+# host stays a loopback address unless the scraper runs on another machine
+metrics_config = {"enabled": False, "host": "127.0.0.1", "port": 9464, "unix_socket": ""}
+
+def settings_snapshot():
+    """Everything config.json holds, as it would be saved now."""
     # --- MODIFIED: Added focus_mode ---
     theme_name = [name for name, color in THEMES.items() if color == current_theme_color][0]
     digit_color_name = [name for name, color in DIGIT_COLORS.items() if color == current_digit_color][0]
-    with open(CONFIG_FILE, 'w') as f:
-        json.dump({
-            'background': current_background_key,
-            'theme_name': theme_name,
-            'digit_color_name': digit_color_name,
-            'weather': weather_config,
-            'pomodoro': pomodoro_config,
-            'sound': sound_config,
-            'custom_background_path': custom_background_path,
-            'focus_mode': is_focus_mode # --- NEW ---
-        }, f, indent=4)
-
-def load_settings():
-    global current_theme_color, current_background_key, current_digit_color
-    global custom_background_path, weather_config, pomodoro_config, sound_config
-    global is_focus_mode # --- NEW ---
-    try:
-        with open(CONFIG_FILE, 'r') as f:
-            settings = json.load(f)
-
-        custom_background_path = settings.get("custom_background_path") or None
-        if custom_background_path and os.path.exists(custom_background_path):
-            try:
-                img = pygame.image.load(custom_background_path).convert_alpha()
-                img = pygame.transform.scale(img, (WIDTH, HEIGHT))
-                temp = img.copy(); temp.blit(overlay, (0, 0))
-                raw_backgrounds["custom"] = img
-                rounded_backgrounds["custom"] = apply_rounded_corners(temp, CORNER_RADIUS)
-            except Exception as e:
-                print(f"Warning: failed to load custom background at startup: {e}")
-                custom_background_path = None
-
-        loaded_bg_key = settings.get('background', current_background_key)
-        current_background_key = loaded_bg_key if loaded_bg_key in raw_backgrounds else 'bg1'
+    return {
+        'background': current_background_key,
+        'theme_name': theme_name,
+        'digit_color_name': digit_color_name,
+        'weather': weather_config,
+        'pomodoro': pomodoro_config,
+        'sound': sound_config,
+        'system': system_config,
+        'history': history_config,
+        'watchdog': watchdog_config,
+        'metrics': metrics_config,
+        'display': display_config,
+        'custom_background_path': custom_background_path,
+        'character': current_character,
+        'focus_mode': is_focus_mode # --- NEW ---
+    }
 
-        current_theme_color = THEMES.get(settings.get('theme_name', "Purple"), THEMES["Purple"])
-        current_digit_color = DIGIT_COLORS.get(settings.get('digit_color_name', "White"), DIGIT_COLORS["White"])
-        is_focus_mode = bool(settings.get('focus_mode', False)) # --- NEW ---
+# sha1 of the last few contents of config.json that are already in effect (written by this app, or
+# applied by the config watcher); more than one, as the app may save again before the watcher reads
+config_digests = collections.deque(maxlen=8)
 
-        wc = settings.get("weather", {})
-        weather_config.update({
+def save_settings():
+    text = json.dumps(settings_snapshot(), indent=4)
+    with timed_write("settings"), open(CONFIG_FILE, 'w') as f:
+        f.write(text)
+    config_digests.append(hashlib.sha1(text.encode()).hexdigest())
+
+def parse_settings(settings):
+    """config.json contents as settings_snapshot() will report them once adopted: unknown names
+    fall back and numbers are clamped, exactly as at startup. Nothing is changed here, so a file
+    with a bad value raises (ValueError / TypeError) before any setting has been touched."""
+    def section(name):
+        value = settings.get(name) or {}
+        if not isinstance(value, dict):
+            raise ValueError(f"'{name}' must be an object")
+        return value
+    if not isinstance(settings, dict):
+        raise ValueError("config.json must hold an object")
+
+    custom_path = settings.get("custom_background_path") or None
+    background = settings.get('background', current_background_key)
+    if background not in backgrounds and not (background == "custom" and custom_path and os.path.exists(custom_path)):
+        background = 'bg1'
+    theme_name = settings.get('theme_name', "Purple")
+    digit_color_name = settings.get('digit_color_name', "White")
+
+    wc = section("weather")
+    pc = section("pomodoro")
+    sc = dict(section("sound"))
+    if "gain_percent" not in sc and "volume" in sc:
+        sc["gain_percent"] = int(float(sc["volume"]) * 100)
+    events = sc.get("events") or {}
+    syc = section("system")
+    hc = section("history")
+    wdc = section("watchdog")
+    mc = section("metrics")
+    dc = section("display")
+    def minutes(key):
+        lo, hi = POMODORO_MINUTES_RANGE
+        return max(lo, min(hi, int(pc.get(key, pomodoro_config[key]))))
+    return {
+        'background': background,
+        'theme_name': theme_name if theme_name in THEMES else "Purple",
+        'digit_color_name': digit_color_name if digit_color_name in DIGIT_COLORS else "White",
+        'weather': {
             "api_key": wc.get("api_key", weather_config["api_key"]),
             "city": wc.get("city", weather_config["city"]),
             "units": wc.get("units", weather_config["units"]),
             "refresh_minutes": int(wc.get("refresh_minutes", weather_config["refresh_minutes"])),
-        })
-
-        pc = settings.get("pomodoro", {})
-        pomodoro_config.update({
-            "focus_minutes": int(pc.get("focus_minutes", pomodoro_config["focus_minutes"])),
-            "short_break_minutes": int(pc.get("short_break_minutes", pomodoro_config["short_break_minutes"])),
-            "long_break_minutes": int(pc.get("long_break_minutes", pomodoro_config["long_break_minutes"])),
+            "idle_refresh_minutes": int(wc.get("idle_refresh_minutes", weather_config["idle_refresh_minutes"])),
+        },
+        'pomodoro': {
+            "focus_minutes": minutes("focus_minutes"),
+            "short_break_minutes": minutes("short_break_minutes"),
+            "long_break_minutes": minutes("long_break_minutes"),
             # --- FIX: Corrected pomDoro_config typo to pomodoro_config ---
-            "sessions_before_long": int(pc.get("sessions_before_long", pomodoro_config["sessions_before_long"])),
+            "sessions_before_long": max(POMODORO_SESSIONS_RANGE[0], min(POMODORO_SESSIONS_RANGE[1],
+                                        int(pc.get("sessions_before_long", pomodoro_config["sessions_before_long"])))),
             "auto_advance": bool(pc.get("auto_advance", pomodoro_config["auto_advance"])),
-        })
-
-        sc = settings.get("sound", {})
-        if "gain_percent" not in sc and "volume" in sc:
-            sc["gain_percent"] = int(float(sc["volume"]) * 100)
-        sound_config.update({
+        },
+        'sound': {
             "enabled": bool(sc.get("enabled", sound_config["enabled"])),
             "path": sc.get("path", sound_config["path"]),
-            "gain_percent": int(sc.get("gain_percent", sound_config["gain_percent"]))
-        })
+            "gain_percent": int(sc.get("gain_percent", sound_config["gain_percent"])),
+            "events": {event: events.get(event) or None for event in sound_config["events"]},
+        },
+        'system': {
+            "sampler": str(syc.get("sampler", system_config["sampler"])),
+            "refresh_seconds": max(1, int(syc.get("refresh_seconds", system_config["refresh_seconds"]))),
+            "self_log_seconds": max(0, int(syc.get("self_log_seconds", system_config["self_log_seconds"]))),
+            "alert_cpu_percent": max(0, int(syc.get("alert_cpu_percent", system_config["alert_cpu_percent"]))),
+            "alert_ram_percent": max(0, int(syc.get("alert_ram_percent", system_config["alert_ram_percent"]))),
+            "idle_refresh_seconds": max(0, int(syc.get("idle_refresh_seconds", system_config["idle_refresh_seconds"]))),
+        },
+        'history': {
+            "enabled": bool(hc.get("enabled", history_config["enabled"])),
+            "max_kb": max(64, int(hc.get("max_kb", history_config["max_kb"]))),
+        },
+        'watchdog': {
+            "frame_budget_ms": max(0, int(wdc.get("frame_budget_ms", watchdog_config["frame_budget_ms"]))),
+            "log_file": str(wdc.get("log_file", watchdog_config["log_file"])),
+            "log_max_kb": max(16, int(wdc.get("log_max_kb", watchdog_config["log_max_kb"]))),
+            "log_backups": max(0, int(wdc.get("log_backups", watchdog_config["log_backups"]))),
+        },
+        'metrics': {
+            "enabled": bool(mc.get("enabled", metrics_config["enabled"])),
+            "host": str(mc.get("host", metrics_config["host"])),
+            "port": min(65535, max(1, int(mc.get("port", metrics_config["port"])))),
+            "unix_socket": str(mc.get("unix_socket") or ""),
+        },
+        'display': {"ui_scale": dc.get("ui_scale", display_config["ui_scale"])},
+        'custom_background_path': custom_path,
+        'character': str(settings.get('character', 'default')),
+        'focus_mode': bool(settings.get('focus_mode', False)), # --- NEW ---
+    }
+
+def adopt_settings(parsed):
+    """Make parsed settings current: the globals and the config dicts the services were built from."""
+    global current_theme_color, current_background_key, current_digit_color
+    global custom_background_path, is_focus_mode, current_character
+    custom_background_path = parsed['custom_background_path']
+    if custom_background_path and os.path.exists(custom_background_path):
+        backgrounds.add("custom", custom_background_path)  # decoded when first shown
+    current_background_key = parsed['background']
+    current_theme_color = THEMES[parsed['theme_name']]
+    current_digit_color = DIGIT_COLORS[parsed['digit_color_name']]
+    is_focus_mode = parsed['focus_mode']
+    current_character = parsed['character']
+    for name, config in (('weather', weather_config), ('pomodoro', pomodoro_config), ('system', system_config),
+                         ('history', history_config), ('watchdog', watchdog_config), ('metrics', metrics_config),
+                         ('display', display_config)):
+        config.update(parsed[name])
+    sound_config.update({key: value for key, value in parsed['sound'].items() if key != "events"})
+    sound_config["events"].update(parsed['sound']["events"])
 
+def load_settings():
+    try:
+        with open(CONFIG_FILE, 'r') as f:
+            settings = json.load(f)
+        adopt_settings(parse_settings(settings))
     except (FileNotFoundError, json.JSONDecodeError):
         save_settings()
+    except (ValueError, TypeError) as e:
+        print(f"Warning: config.json has an invalid value ({e}); using the defaults for this run.")
 
 def load_tasks():
     global tasks
@@ -264,7 +914,7 @@ def load_tasks():
     tasks.sort(key=lambda t: t['completed'])
 
 def save_tasks():
-    with open(TODO_FILE, 'w') as f:
+    with timed_write("tasks"), open(TODO_FILE, 'w') as f:
         json.dump(tasks, f, indent=4)
 
 
@@ -280,40 +930,42 @@ def apply_rounded_corners(image_surface, radius):
 
 def draw_text_with_shadow(surface, text, font, color, position, shadow_color=(0,0,0)):
     x, y = position
-    sh = font.render(text, True, shadow_color); surface.blit(sh, (x+3, y+3))
+    sh = font.render(text, True, shadow_color); surface.blit(sh, (x+px(3), y+px(3)))
     tx = font.render(text, True, color); surface.blit(tx, (x, y))
 
 # --- NEW: Helper for drawing progress bars ---
 def draw_progress_bar(surface, rect, progress, color, bg_color=(55,57,68)):
-    pygame.draw.rect(surface, bg_color, rect, border_radius=8)
+    pygame.draw.rect(surface, bg_color, rect, border_radius=px(8))
     if progress > 0:
         bar_rect = pygame.Rect(rect.x, rect.y, int(rect.width * progress), rect.height)
-        pygame.draw.rect(surface, color, bar_rect, border_radius=8)
-    pygame.draw.rect(surface, color, rect, 2, border_radius=8)
+        pygame.draw.rect(surface, color, bar_rect, border_radius=px(8))
+    pygame.draw.rect(surface, color, rect, px(2), border_radius=px(8))
+
+def format_bytes(count):
+    """Human-readable size, e.g. '1.4 MB'."""
+    value = float(count)
+    for unit in ("B", "KB", "MB"):
+        if abs(value) < 1024:
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GB"
+
+def format_rate(bytes_per_sec):
+    """Human-readable transfer rate, e.g. '1.4 MB/s'."""
+    return format_bytes(bytes_per_sec) + "/s"
 
 
 def ease_out_quad(t): return t*(2-t)
 def ease_in_out_quad(t): return t*t*2 if t<0.5 else (-2*t*t)+(4*t)-1
 
-overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-overlay.fill((0, 0, 0, 80))
-rounded_backgrounds = {}
-for key, bg_image in raw_backgrounds.items():
-    tmp = bg_image.copy(); tmp.blit(overlay, (0,0))
-    rounded_backgrounds[key] = apply_rounded_corners(tmp, CORNER_RADIUS)
-
-# --- MODIFIED: To-Do UI (added scroll state) ---
-add_task_button_rect = pygame.Rect(WIDTH - 50, HEIGHT - 50, 30, 30)
-task_input_active = False
-task_input_text = ""
-input_box_rect = pygame.Rect(WIDTH // 2 - 150, HEIGHT - 80, 300, 40)
-task_rects = {}
-task_scroll_offset = 0 # --- NEW ---
+# --- To-Do UI layout ---
+add_task_button_rect = px_rect(BASE_WIDTH - 50, BASE_HEIGHT - 50, 30, 30)
+input_box_rect = px_rect(BASE_WIDTH // 2 - 150, BASE_HEIGHT - 80, 300, 40)
 MAX_TASKS_DISPLAY = 6  # --- NEW ---
-tasks_area_rect = pygame.Rect(40, HEIGHT // 2 + 100, WIDTH - 80, 180) # --- NEW ---
+tasks_area_rect = px_rect(40, BASE_HEIGHT // 2 + 100, BASE_WIDTH - 80, 180) # --- NEW ---
 
 
-# --- Load settings & tasks after helpers (needs overlay above) ---
+# --- Load settings & tasks after helpers ---
 load_settings()
 load_tasks()
 
@@ -338,69 +990,373 @@ def add_custom_background():
         except Exception: pass
     if not file_path: return
     try:
-        img = pygame.image.load(file_path).convert_alpha()
-        img = pygame.transform.scale(img, (WIDTH, HEIGHT))
-        temp_surface = img.copy(); temp_surface.blit(overlay, (0, 0))
-        raw_backgrounds["custom"] = img
-        rounded_backgrounds["custom"] = apply_rounded_corners(temp_surface, CORNER_RADIUS)
-        custom_background_path = os.path.abspath(file_path)
-        current_background_key = "custom"
-        save_settings()
-        print(f"[INFO] Custom background loaded: {custom_background_path}")
+        backgrounds.add("custom", file_path)
+        backgrounds.display("custom")  # decode now: it is about to be shown, and a bad file is reported here
     except Exception as e:
         print(f"Error loading custom background: {e}")
+        return
+    if "custom" not in backgrounds:
+        return
+    custom_background_path = os.path.abspath(file_path)
+    current_background_key = "custom"
+    save_settings()
+    print(f"[INFO] Custom background loaded: {custom_background_path}")
 
 
 # =================================================================================
-# 6.6 SOUND MANAGER  (0–200% via overlapping copies when >100)
+# 6.6 SOUND MANAGER  (synthesized default tone; 0–200% gain applied to the samples)
 # =================================================================================
 class SoundManager:
+    """Sound bank: one preloaded sound and one reserved mixer channel per notification event. Files
+    too long to preload stream through mixer.music instead, one at a time."""
+    # event -> label shown in Settings (order = reserved channel index)
+    EVENTS = {"focus_end": "Focus end", "break_end": "Break end", "long_break": "Long break",
+              "weather_alert": "Weather alert", "system_threshold": "System alert"}
+    # Built-in tone per event: [(frequency Hz, duration ms), ...] played back to back (0 Hz = rest)
+    TONES = {"focus_end":        [(880, 160), (1320, 240)],
+             "break_end":        [(1320, 160), (880, 240)],
+             "long_break":       [(660, 140), (880, 140), (1320, 280)],
+             "weather_alert":    [(988, 120), (0, 80), (988, 120), (0, 80), (988, 200)],
+             "system_threshold": [(440, 200), (0, 60), (440, 200)]}
+    TONE_AMPLITUDE = 0.45
+    FADE_IN_MS, FADE_OUT_MS = 8, 60
+    GAIN_STEP = 5             # matches the volume slider; amplified buffers are cached per step
+    GAIN_CACHE_SIZE = 6       # every event's copy at one step, plus one
+    SOFT_CLIP_KNEE = 0.75     # above this level (fraction of full scale) peaks are compressed, not clipped
+    STREAM_MIN_SECONDS = 20   # longer files stream through mixer.music instead of being decoded into RAM
+    COMPRESSED_BYTES_PER_SEC = 16000  # ~128 kbps; estimates the length of non-WAV files from their size
+    SOUND_CACHE_FILES = 16    # pre-converted clips kept in SOUND_CACHE_DIR
+
     def __init__(self, cfg):
         self.enabled = bool(cfg.get("enabled", True))
-        self.path    = cfg.get("path")
+        self.path    = cfg.get("path")   # default file for events without their own
+        self.event_paths = {e: p for e, p in (cfg.get("events") or {}).items() if e in self.EVENTS and p}
         self.gain_percent = int(cfg.get("gain_percent", 100))  # 0..200
-        self.sound   = None
         self.mixer_ok = False
+        self.channels = {}
+        self._lock = threading.Lock()
+        self._bank = {}        # event -> ("sound", Sound) | ("stream", path); missing = built-in tone
+        self._generation = {event: 0 for event in self.EVENTS}
+        self._tone_cache = {}
+        self._gain_cache = collections.OrderedDict()  # (path or tone name, gain step) -> Sound
+        self._gain_pending = threading.Event()         # the gain thread has copies to build
+        self._stream_lock = threading.Lock()           # mixer.music is a single stream
+        self._tone_lock = threading.Lock()             # one synthesis per tone
         try:
             pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=512)
+            # One channel per event, kept out of automatic allocation, so rapid events never cut each other off
+            pygame.mixer.set_reserved(len(self.EVENTS))
+            self.channels = {event: pygame.mixer.Channel(i) for i, event in enumerate(self.EVENTS)}
             self.mixer_ok = True
         except Exception as e:
             print("Audio init failed:", e)
-        self._load_sound()
+        if self.mixer_ok:
+            threading.Thread(target=self._gain_loop, name="sound-gain", daemon=True).start()
+        self._reload(list(self.EVENTS))
 
-    def _load_sound(self):
-        self.sound = None
-        if not (self.mixer_ok and self.path):
+    def path_for(self, event):
+        return self.event_paths.get(event) or self.path
+
+    # --- Background loading ---
+    def _reload(self, events):
+        """Decode the given events' sounds (and their fallback tones) on a worker thread."""
+        if not self.mixer_ok:
             return
+        with self._lock:
+            jobs = []
+            for event in events:
+                self._generation[event] += 1
+                jobs.append((event, self._generation[event], self.path_for(event)))
+        threading.Thread(target=self._load_jobs, args=(jobs,), daemon=True).start()
+
+    def _load_jobs(self, jobs):
+        for event, generation, path in jobs:
+            self._tone(event)
+            entry = None
+            if path:
+                try:
+                    entry = self._prepare(path)
+                except Exception as e:
+                    print(f"Failed to load sound for {event}:", e)
+            with self._lock:
+                if self._generation[event] != generation:
+                    continue  # reassigned while loading; the newer job wins
+                if entry: self._bank[event] = entry
+                else: self._bank.pop(event, None)
+                # The file may have changed on disk; copies built from the old contents go
+                for cache_key in [k for k in self._gain_cache if k[0] == path]:
+                    del self._gain_cache[cache_key]
+        self._gain_pending.set()
+
+    def _prepare(self, path):
+        if self._estimated_seconds(path) > self.STREAM_MIN_SECONDS:
+            return ("stream", path)
+        return ("sound", self._load_cached(path))
+
+    def _estimated_seconds(self, path):
+        """Clip length without decoding it: exact for WAV headers, estimated from file size otherwise."""
+        if path.lower().endswith(".wav"):
+            try:
+                with wave.open(path, 'rb') as w:
+                    return w.getnframes() / float(w.getframerate())
+            except (wave.Error, EOFError):
+                pass  # compressed or unusual WAV; fall through to the size estimate
+        return os.path.getsize(path) / self.COMPRESSED_BYTES_PER_SEC
+
+    # --- Pre-converted clip cache ---
+    def _cache_path(self, path):
+        st = os.stat(path)
+        ident = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}|{pygame.mixer.get_init()}"
+        return os.path.join(SOUND_CACHE_DIR, hashlib.sha1(ident.encode()).hexdigest()[:20] + ".wav")
+
+    def _load_cached(self, path):
+        """Load a short clip, decoding it only the first time; later loads read mixer-format PCM from disk."""
+        cache_path = self._cache_path(path)
+        if os.path.exists(cache_path):
+            try:
+                sound = pygame.mixer.Sound(cache_path)
+            except Exception:
+                pass  # unreadable cache entry; decode the original again
+            else:
+                try: os.utime(cache_path)  # mtime = last use, so eviction drops the least recently used
+                except OSError: pass
+                return sound
+        sound = pygame.mixer.Sound(path)
         try:
-            s = pygame.mixer.Sound(self.path)
-            self.sound = s
-        except Exception as e:
-            print("Failed to load sound:", e)
+            self._write_cache(cache_path, sound)
+        except (OSError, wave.Error) as e:
+            print(f"Warning: could not cache converted sound: {e}")
+        return sound
+
+    def _write_cache(self, cache_path, sound):
+        rate, size, channels = pygame.mixer.get_init()
+        if size != -16:
+            return
+        os.makedirs(SOUND_CACHE_DIR, exist_ok=True)
+        tmp_path = cache_path + ".tmp"
+        with wave.open(tmp_path, 'wb') as w:
+            w.setnchannels(channels); w.setsampwidth(2); w.setframerate(rate)
+            w.writeframes(sound.get_raw())
+        os.replace(tmp_path, cache_path)
+        # Oldest mtime first: entries are touched on every load, not only when converted
+        cached = sorted((os.path.join(SOUND_CACHE_DIR, name) for name in os.listdir(SOUND_CACHE_DIR)
+                         if name.endswith(".wav")), key=os.path.getmtime)
+        for old_path in cached[:-self.SOUND_CACHE_FILES]:
+            try: os.remove(old_path)
+            except OSError: pass
 
     def set_path(self, path: str):
+        """Change the default file; reloads every event that has no file of its own."""
         self.path = path
-        self._load_sound()
+        self._reload([e for e in self.EVENTS if not self.event_paths.get(e)])
+
+    def set_event_path(self, event, path):
+        """Assign a file to one event (None returns it to the default file / built-in tone)."""
+        if path: self.event_paths[event] = path
+        else: self.event_paths.pop(event, None)
+        self._reload([event])
 
     def set_gain_percent(self, pct: int):
         self.gain_percent = max(0, min(200, int(pct)))
+        self._gain_pending.set()
+
+    # --- Synthesized tones ---
+    def _tone(self, name):
+        """Synthesized tone as a cached mixer Sound (None if the mixer is unavailable). Synthesizes it
+        on first use, so it is called from worker threads only; play() uses _cached_tone()."""
+        if not self.mixer_ok:
+            return None
+        with self._tone_lock:
+            with self._lock:
+                if name in self._tone_cache:
+                    return self._tone_cache[name]
+            try:
+                tone = self._synthesize(self.TONES[name])
+            except Exception as e:
+                print("Tone synthesis failed:", e)
+                tone = None
+            with self._lock:
+                self._tone_cache[name] = tone
+            return tone
+
+    def _cached_tone(self, event):
+        """(name, Sound) of the event's tone if the loader has synthesized it yet, else of any tone
+        that is ready; (name, None) if none is."""
+        with self._lock:
+            if self._tone_cache.get(event) is not None:
+                return event, self._tone_cache[event]
+            return next(((name, tone) for name, tone in self._tone_cache.items() if tone is not None),
+                        (event, None))
+
+    def _envelope(self, i, n, rate):
+        fade_in = max(1, rate * self.FADE_IN_MS // 1000)
+        fade_out = max(1, rate * self.FADE_OUT_MS // 1000)
+        return min(1.0, i / fade_in, (n - i) / fade_out)
+
+    def _synthesize(self, notes):
+        rate, size, channels = pygame.mixer.get_init()
+        if size != -16:
+            raise ValueError(f"unsupported mixer sample format {size}")
+        amp = self.TONE_AMPLITUDE * 32767
+        if numpy is not None:
+            parts = []
+            for freq, ms in notes:
+                n = rate * ms // 1000
+                i = numpy.arange(n)
+                env = numpy.minimum(1.0, numpy.minimum(i / max(1, rate * self.FADE_IN_MS // 1000),
+                                                       (n - i) / max(1, rate * self.FADE_OUT_MS // 1000)))
+                parts.append(numpy.sin(2 * math.pi * freq * i / rate) * env * amp)
+            mono = numpy.concatenate(parts).astype(numpy.int16)
+            samples = mono if channels == 1 else numpy.ascontiguousarray(numpy.repeat(mono[:, None], channels, axis=1))
+            return pygame.sndarray.make_sound(samples)
+        # Pure-Python path: interleaved native-endian int16, same layout as the mixer
+        buf = array('h')
+        for freq, ms in notes:
+            n = rate * ms // 1000
+            step = 2 * math.pi * freq / rate
+            for i in range(n):
+                v = int(math.sin(step * i) * self._envelope(i, n, rate) * amp)
+                buf.extend((v,) * channels)
+        return pygame.mixer.Sound(buffer=buf.tobytes())
+
+    # --- Gain ---
+    @classmethod
+    def _soft_clip(cls, x):
+        """Linear up to the knee, then tanh-compressed toward full scale (x is in -1..1 units)."""
+        knee = cls.SOFT_CLIP_KNEE
+        mag = abs(x)
+        if mag <= knee:
+            return x
+        y = knee + (1.0 - knee) * math.tanh((mag - knee) / (1.0 - knee))
+        return y if x > 0 else -y
+
+    def _amplify(self, sound, gain):
+        """New Sound with gain applied to the int16 sample data, soft-clipped instead of wrapped."""
+        if numpy is not None:
+            x = pygame.sndarray.array(sound).astype(numpy.float32) * (gain / 32768.0)
+            knee = self.SOFT_CLIP_KNEE
+            mag = numpy.abs(x)
+            over = mag > knee
+            x[over] = numpy.sign(x[over]) * (knee + (1.0 - knee) * numpy.tanh((mag[over] - knee) / (1.0 - knee)))
+            return pygame.sndarray.make_sound(numpy.ascontiguousarray((x * 32767.0).astype(numpy.int16)))
+        samples = array('h', sound.get_raw())
+        clip = self._soft_clip
+        scale = gain / 32768.0
+        out = array('h', (int(clip(v * scale) * 32767.0) for v in samples))
+        return pygame.mixer.Sound(buffer=out.tobytes())
+
+    def _gain_step(self):
+        return int(round(self.gain_percent / self.GAIN_STEP)) * self.GAIN_STEP
+
+    def _gained(self, key, sound):
+        """(Sound, channel volume) for the current gain. Up to 100% only the channel volume changes;
+        above it the amplified copy built by the gain thread is played, or the clip at full volume
+        if that copy is not ready yet. Only looks the copy up, so play() never amplifies."""
+        step = self._gain_step()
+        if step <= 100:
+            return sound, step / 100.0
+        cache_key = (key, step)
+        with self._lock:
+            amplified = self._gain_cache.get(cache_key)
+            if amplified is not None:
+                self._gain_cache.move_to_end(cache_key)
+                return amplified, 1.0
+        self._gain_pending.set()
+        return sound, 1.0
+
+    def _gain_loop(self):
+        """Build each event's amplified copy for the current gain step after a gain change or reload."""
+        while True:
+            self._gain_pending.wait()
+            self._gain_pending.clear()
+            step = self._gain_step()
+            if step <= 100:
+                continue
+            with self._lock:
+                bank = dict(self._bank)
+            sources = {}
+            for event in self.EVENTS:
+                kind, value = bank.get(event, ("tone", None))
+                if kind == "sound":
+                    sources[self.path_for(event)] = value
+                elif kind == "tone" and self._tone(event) is not None:
+                    sources["tone:" + event] = self._tone(event)
+            for key, sound in sources.items():
+                if self._gain_step() != step:
+                    break  # moved again; the pending flag brings another pass for the new step
+                with self._lock:
+                    if (key, step) in self._gain_cache:
+                        continue
+                try:
+                    amplified = self._amplify(sound, step / 100.0)
+                except Exception as e:
+                    print(f"Sound gain failed ({key}):", e)
+                    continue
+                with self._lock:
+                    self._gain_cache[(key, step)] = amplified
+                    while len(self._gain_cache) > self.GAIN_CACHE_SIZE:
+                        self._gain_cache.popitem(last=False)
 
-    def play(self):
+    def buffers(self):
+        """Every decoded Sound held: the event bank, synthesized tones and amplified copies."""
+        with self._lock:
+            sounds = [entry[1] for entry in self._bank.values() if entry and entry[0] == "sound"]
+            sounds += [s for s in self._tone_cache.values() if s is not None]
+            sounds += list(self._gain_cache.values())
+        return sounds
+
+    def play(self, event="focus_end"):
+        """Play an event's sound on its own channel. Never loads or decodes a file on the caller's thread:
+        clips are decoded ahead of time and long files, which stream, are opened on a worker thread."""
         if not self.enabled:
             return
-        if self.sound:
-            base = min(1.0, self.gain_percent / 100.0)
+        if event not in self.EVENTS:
+            event = "focus_end"
+        if self.mixer_ok:
+            with self._lock:
+                kind, value = self._bank.get(event, ("tone", None))
             try:
-                self.sound.set_volume(base)
-                self.sound.play()
-                # Overclock: add overlapping copies for >100%
-                extra = max(0, (self.gain_percent - 100) // 50)  # 101–150% → 1 copy, 151–200% → 2 copies
-                for _ in range(extra):
-                    self.sound.play()
-                return
+                if kind == "stream":
+                    threading.Thread(target=self._play_stream, args=(event, value), name="sound-stream",
+                                     daemon=True).start()
+                    return
+                if kind == "sound":
+                    key, sound = self.path_for(event), value
+                else:
+                    name, sound = self._cached_tone(event)
+                    key = "tone:" + name
+                if self._play_on_channel(event, key, sound):
+                    return
             except Exception as e:
-                print("Sound play failed:", e)
-        # Fallback simple beep on Windows (not volume-controlled; double-beep if overclocking)
+                print(f"Sound play failed ({event}):", e)
+        # No mixer at all: Windows beep on a worker thread so the render loop never waits on it
+        threading.Thread(target=self._beep, daemon=True).start()
+
+    def _play_on_channel(self, event, key, sound):
+        if sound is None:
+            return False
+        playable, volume = self._gained(key, sound)
+        channel = self.channels[event]
+        channel.set_volume(volume)
+        channel.play(playable)
+        return True
+
+    def _play_stream(self, event, path):
+        """Open and start a long file on mixer.music. There is only one such stream, so an event arriving
+        while another file streams plays its built-in tone instead of cutting that file off."""
+        try:
+            with self._stream_lock:
+                if not pygame.mixer.music.get_busy():
+                    pygame.mixer.music.load(path)
+                    # Streams cannot be amplified sample-wise; they top out at 100%
+                    pygame.mixer.music.set_volume(min(1.0, self.gain_percent / 100.0))
+                    pygame.mixer.music.play()
+                    return
+            self._play_on_channel(event, "tone:" + event, self._tone(event))
+        except Exception as e:
+            print(f"Sound play failed ({event}):", e)
+
+    def _beep(self):
         try:
             import winsound
             winsound.Beep(880, 400)
@@ -411,14 +1367,43 @@ class SoundManager:
 
 sound_manager = SoundManager(sound_config)
 
-def choose_custom_sound():
-    """Pick a small audio file (≤15s recommended) for notifications."""
+def pomodoro_sound_event(prev_mode, new_mode):
+    """Sound bank event for a pomodoro transition."""
+    if prev_mode == 'focus':
+        return 'long_break' if new_mode == 'long_break' else 'focus_end'
+    return 'break_end'
+
+def run_gain_benchmark():
+    """Micro-benchmark: cost of building the amplified buffer at each gain level (on the gain thread)."""
+    if not sound_manager.mixer_ok:
+        print("Gain benchmark: mixer unavailable"); return
+    path = sound_manager.path_for("focus_end")
+    sound = None
+    if path:
+        entry = sound_manager._prepare(path)
+        if entry[0] == "sound":
+            key, sound = path, entry[1]
+    if sound is None:
+        key, sound = "tone:focus_end", sound_manager._tone("focus_end")
+    if sound is None:
+        print("Gain benchmark: no sound to amplify"); return
+    backend = "numpy" if numpy is not None else "pure Python"
+    print(f"Gain cache-miss latency ({backend}, {sound.get_length():.2f} s clip: {key})")
+    for pct in range(100 + SoundManager.GAIN_STEP, 201, SoundManager.GAIN_STEP):
+        start = time.perf_counter()
+        sound_manager._amplify(sound, pct / 100.0)
+        print(f"  {pct:>3}%  {(time.perf_counter() - start) * 1000:8.2f} ms")
+
+def choose_custom_sound(event=None):
+    """Pick an audio file (≤15s recommended) for one event, or as the default when event is None.
+    Longer files are streamed, not loaded."""
     if filedialog is None:
         print("File picker unavailable (tkinter missing)."); return
+    label = SoundManager.EVENTS.get(event, "Notification")
     try:
         root = tk.Tk(); root.withdraw(); root.attributes("-topmost", True)
         file_path = filedialog.askopenfilename(
-            title="Choose Notification Sound (≤15s recommended)",
+            title=f"Choose {label} Sound (≤15s recommended)",
             filetypes=[("Audio Files", "*.wav;*.ogg;*.mp3")]
         )
     finally:
@@ -426,129 +1411,396 @@ def choose_custom_sound():
         except Exception: pass
     if not file_path: return
     abs_path = os.path.abspath(file_path)
-    sound_manager.set_path(abs_path)
-    sound_config["path"] = abs_path
+    if event is None:
+        sound_manager.set_path(abs_path)
+        sound_config["path"] = abs_path
+    else:
+        sound_manager.set_event_path(event, abs_path)
+        sound_config["events"][event] = abs_path
+    save_settings()
+
+def clear_custom_sound(event=None):
+    """Drop an event's own file (or the default file when event is None)."""
+    if event is None:
+        sound_manager.set_path(None)
+        sound_config["path"] = None
+    else:
+        sound_manager.set_event_path(event, None)
+        sound_config["events"][event] = None
     save_settings()
 
 
 # =================================================================================
 # 6.7 WEATHER SERVICE
 # =================================================================================
+def parse_weather(data, units="metric", city=""):
+    """Snapshot for the views from a weatherapi.com forecast.json response. Tolerates missing
+    sections, so a current-only response (such as assets/Output.json) parses too."""
+    current = data.get("current", {})
+    fdays = (data.get("forecast", {}) or {}).get("forecastday", [])[:3]
+
+    metric = (units == "metric")
+    temp = current.get("temp_c") if metric else current.get("temp_f")
+    feels = current.get("feelslike_c") if metric else current.get("feelslike_f")
+    wind = current.get("wind_kph") if metric else current.get("wind_mph")
+    temp_unit = "°C" if metric else "°F"
+    wind_unit = "kph" if metric else "mph"
+
+    today = fdays[0]["day"] if fdays else {}
+    pop_today = today.get("daily_chance_of_rain")
+    high = today.get("maxtemp_c") if metric else today.get("maxtemp_f")
+    low  = today.get("mintemp_c") if metric else today.get("mintemp_f")
+
+    mini = []
+    for fd in fdays:
+        d = fd.get("date")
+        dd = fd.get("day", {})
+        mini.append({
+            "date": d,
+            "cond": (dd.get("condition") or {}).get("text", ""),
+            "cond_code": (dd.get("condition") or {}).get("code"), # --- NEW ---
+            "high": dd.get("maxtemp_c") if metric else dd.get("maxtemp_f"),
+            "low":  dd.get("mintemp_c") if metric else dd.get("mintemp_f"),
+            "pop":  dd.get("daily_chance_of_rain"),
+        })
+
+    # --- MODIFIED: Added condition 'code' ---
+    return {
+        "ok": True,
+        "city": (data.get("location") or {}).get("name", city),
+        "country": (data.get("location") or {}).get("country", ""),
+        "temp": temp, "feels": feels, "temp_unit": temp_unit,
+        "condition": (current.get("condition") or {}).get("text", ""),
+        "condition_code": (current.get("condition") or {}).get("code"), # --- NEW ---
+        "is_day": bool(current.get("is_day", 1)), # --- NEW ---
+        "humidity": current.get("humidity"),
+        "wind": wind, "wind_unit": wind_unit,
+        "precip_mm": current.get("precip_mm"),
+        "uv": current.get("uv"), "cloud": current.get("cloud"),
+        "pop_today": pop_today, "high": high, "low": low,
+        "alerts": data.get("alerts", {}), "mini": mini
+    }
+
+
 class WeatherService:
+    RETRY_SECS = 1      # delay before the first retry after a failed fetch while active; doubles per failure
+    RETRY_MAX_SECS = 300
+    LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 6, 10)   # seconds; requests time out at 6
+
     def __init__(self, config, on_update=None):
-        self.city = config.get("city", "Dhaka")
-        self.api_key = config.get("api_key", "")
-        self.units = config.get("units", "metric")
-        self.refresh_secs = max(60, int(config.get("refresh_minutes", 15)) * 60)
+        self._configure(config)
+        self._target = 0    # bumped by retarget(); fetches begun for an older target are not published
         self._lock = threading.Lock()
         self._last_fetch = 0
         self._snapshot = {"ok": False, "reason": "Not fetched yet."}
+        self.version = 0    # bumped whenever the snapshot's content changes; views redraw on that
+        self._pinned = False
+        self.failures = 0   # consecutive snapshots that were not ok; sets the retry backoff
+        self.fetches = self.fetch_errors = 0   # HTTP requests made / raised
+        self.fetch_latency = Histogram(self.LATENCY_BUCKETS)
         self._running = True
+        self._active = True
+        self._wake = threading.Event()
         self._on_update = on_update
         self._thread = threading.Thread(target=self._loop, daemon=True)
         self._thread.start()
 
-    def stop(self): self._running = False
+    def _configure(self, config):
+        self.city = config.get("city", "Dhaka")
+        self.api_key = config.get("api_key", "")
+        self.units = config.get("units", "metric")
+        self.refresh_secs = max(60, int(config.get("refresh_minutes", 15)) * 60)
+        self.idle_refresh_secs = max(self.refresh_secs, int(config.get("idle_refresh_minutes", 60)) * 60)
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+
+    def retarget(self, config):
+        """Adopt a new city, key, units or intervals and fetch right away. The old target's snapshot
+        stays on screen until then, and a fetch for it still in flight is discarded."""
+        with self._lock:
+            self._configure(config)
+            self._target += 1
+            self._last_fetch = 0
+            self.failures = 0
+        self._wake.set()
+
+    def pin(self, snapshot):
+        """Stop fetching and show this snapshot from now on (--render injects its weather here)."""
+        self.stop()
+        with self._lock:
+            self._pinned = True
+            self._snapshot = snapshot
+            self.version += 1
+
+    def set_active(self, active):
+        """Poll every refresh_minutes while a view showing weather is on screen, else every idle_refresh_minutes."""
+        if active != self._active:
+            self._active = active
+            self._wake.set()   # re-plan now: a stale snapshot is fetched as soon as it is shown again
+
+    def backoff_secs(self):
+        """Delay before the next retry while failing (0 while the last fetch was ok)."""
+        if not self.failures:
+            return 0
+        return min(self.RETRY_MAX_SECS, self.RETRY_SECS * 2 ** min(self.failures - 1, 16))
 
     def _loop(self):
         while self._running:
-            now = time.time()
-            if now - self._last_fetch >= self.refresh_secs or not self._snapshot.get("ok", False):
+            if self._active:
+                interval = self.backoff_secs() or self.refresh_secs
+            else:
+                interval = self.idle_refresh_secs
+            wait = self._last_fetch + interval - time.time()
+            if wait <= 0:
                 self._fetch_once()
-            time.sleep(1)
+                continue
+            self._wake.wait(wait)
+            self._wake.clear()
 
     def _fetch_once(self):
+        with self._lock:
+            target, city, api_key, units = self._target, self.city, self.api_key, self.units
         if requests is None:
-            snap = {"ok": False, "reason": "Install 'requests' to enable weather."}
-            with self._lock:
-                self._snapshot = snap; self._last_fetch = time.time()
+            self._publish({"ok": False, "reason": "Install 'requests' to enable weather."}, target)
             return
-        if not self.api_key:
-            snap = {"ok": False, "reason": "Set weather.api_key in config.json."}
-            with self._lock:
-                self._snapshot = snap; self._last_fetch = time.time()
+        if not api_key:
+            self._publish({"ok": False, "reason": "Set weather.api_key in config.json."}, target)
             return
-        url = f"http://api.weatherapi.com/v1/forecast.json?key={self.api_key}&q={self.city}&days=3&aqi=no&alerts=yes"
+        url = f"http://api.weatherapi.com/v1/forecast.json?key={api_key}&q={city}&days=3&aqi=no&alerts=yes"
+        self.fetches += 1
+        started = time.perf_counter()
         try:
-            r = requests.get(url, timeout=6); r.raise_for_status()
-            data = r.json()
-            current = data.get("current", {})
-            fdays = (data.get("forecast", {}) or {}).get("forecastday", [])[:3]
-
-            metric = (self.units == "metric")
-            temp = current.get("temp_c") if metric else current.get("temp_f")
-            feels = current.get("feelslike_c") if metric else current.get("feelslike_f")
-            wind = current.get("wind_kph") if metric else current.get("wind_mph")
-            temp_unit = "°C" if metric else "°F"
-            wind_unit = "kph" if metric else "mph"
-
-            today = fdays[0]["day"] if fdays else {}
-            pop_today = today.get("daily_chance_of_rain")
-            high = today.get("maxtemp_c") if metric else today.get("maxtemp_f")
-            low  = today.get("mintemp_c") if metric else today.get("mintemp_f")
-
-            mini = []
-            for fd in fdays:
-                d = fd.get("date")
-                dd = fd.get("day", {})
-                mini.append({
-                    "date": d,
-                    "cond": (dd.get("condition") or {}).get("text", ""),
-                    "cond_code": (dd.get("condition") or {}).get("code"), # --- NEW ---
-                    "high": dd.get("maxtemp_c") if metric else dd.get("maxtemp_f"),
-                    "low":  dd.get("mintemp_c") if metric else dd.get("mintemp_f"),
-                    "pop":  dd.get("daily_chance_of_rain"),
-                })
-
-            # --- MODIFIED: Added condition 'code' ---
-            snapshot = {
-                "ok": True,
-                "city": (data.get("location") or {}).get("name", self.city),
-                "country": (data.get("location") or {}).get("country", ""),
-                "temp": temp, "feels": feels, "temp_unit": temp_unit,
-                "condition": (current.get("condition") or {}).get("text", ""),
-                "condition_code": (current.get("condition") or {}).get("code"), # --- NEW ---
-                "is_day": bool(current.get("is_day", 1)), # --- NEW ---
-                "humidity": current.get("humidity"),
-                "wind": wind, "wind_unit": wind_unit,
-                "precip_mm": current.get("precip_mm"),
-                "uv": current.get("uv"), "cloud": current.get("cloud"),
-                "pop_today": pop_today, "high": high, "low": low,
-                "alerts": data.get("alerts", {}), "mini": mini
-            }
-            with self._lock:
-                self._snapshot = snapshot; self._last_fetch = time.time()
-            if self._on_update: self._on_update(snapshot)
+            try:
+                r = requests.get(url, timeout=6); r.raise_for_status()
+                data = r.json()
+            finally:
+                self.fetch_latency.observe(time.perf_counter() - started)
+            snapshot = parse_weather(data, units, city)
+            if self._publish(snapshot, target) and self._on_update:
+                self._on_update(snapshot)
         except Exception as e:
-            with self._lock:
-                self._snapshot = {"ok": False, "reason": f"{type(e).__name__}: {e}"}
-                self._last_fetch = time.time()
+            self.fetch_errors += 1
+            self._publish({"ok": False, "reason": f"{type(e).__name__}: {e}"}, target)
+
+    def _publish(self, snapshot, target):
+        """Make snapshot current unless pinned or retargeted since its fetch began; True if it was."""
+        with self._lock:
+            if self._pinned or target != self._target:
+                return False
+            if snapshot != self._snapshot:
+                self._snapshot = snapshot
+                self.version += 1
+            self._last_fetch = time.time()
+            self.failures = 0 if snapshot.get("ok") else self.failures + 1
+            return True
 
     def get_snapshot(self):
         with self._lock:
             return dict(self._snapshot)
 
-weather_service = WeatherService(weather_config)
+_seen_weather_alerts = set()
+
+def on_weather_update(snapshot):
+    """Play the weather alert sound once for each alert headline not seen before."""
+    alerts = (snapshot.get("alerts") or {}).get("alert") or []
+    headlines = {a.get("headline") or a.get("event") for a in alerts} - {None, ""}
+    fresh = headlines - _seen_weather_alerts
+    _seen_weather_alerts.update(headlines)
+    if fresh:
+        sound_manager.play("weather_alert")
+
+weather_service = WeatherService(weather_config, on_update=on_weather_update)
 
 
 # =================================================================================
 # 6.8 POMODORO TIMER
 # =================================================================================
+class PomodoroHistory:
+    """Append-only log of finished sessions, plus daily/weekly rollups updated as each one is logged.
+    The rollups are written back by a daemon thread shortly after; if that write is lost, the
+    log_bytes check below rebuilds them from the log on the next start."""
+    # end (epoch s), seconds spent, mode index, outcome index -> 12 bytes
+    RECORD = struct.Struct("<IIBB2x")
+    MODES = ('focus', 'short_break', 'long_break')
+    OUTCOMES = ('completed', 'skipped')
+    SAVE_DELAY_SECS = 2.0   # sessions logged close together (skip, skip, ...) share one rollup write
+
+    def __init__(self, log_path, rollup_path):
+        self.log_path = log_path
+        self.rollup_path = rollup_path
+        self._lock = threading.Lock()        # the log and the in-memory rollups
+        self._save_lock = threading.Lock()   # the rollup file
+        self._save_pending = threading.Event()
+        try:
+            with open(rollup_path, 'r') as f:
+                self.rollups = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.rollups = None
+        log_bytes = os.path.getsize(log_path) if os.path.exists(log_path) else 0
+        # Rollups out of step with the log (first run, crash, hand edit) are rebuilt from it once
+        if not self.rollups or self.rollups.get("log_bytes") != log_bytes:
+            self._rebuild()
+        threading.Thread(target=self._save_loop, name="pomodoro-rollups", daemon=True).start()
+
+    @staticmethod
+    def _empty_rollups():
+        return {"log_bytes": 0, "days": {}, "weeks": {},
+                "streak": {"last_day": None, "current": 0, "best": 0}}
+
+    def _rebuild(self):
+        self.rollups = self._empty_rollups()
+        try:
+            with open(self.log_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+        usable = len(data) - len(data) % self.RECORD.size
+        for fields in self.RECORD.iter_unpack(data[:usable]):
+            self._apply(*fields)
+        self.rollups["log_bytes"] = usable
+        if usable != len(data):  # drop a torn trailing record
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(usable)
+        self._save_rollups()
+
+    def _apply(self, end_ts, seconds, mode_idx, outcome_idx):
+        day = datetime.fromtimestamp(end_ts).date()
+        iso = day.isocalendar()
+        is_focus = self.MODES[mode_idx] == 'focus'
+        completed = self.OUTCOMES[outcome_idx] == 'completed'
+        for table, key in ((self.rollups["days"], day.isoformat()),
+                           (self.rollups["weeks"], f"{iso[0]}-W{iso[1]:02d}")):
+            entry = table.setdefault(key, {"focus_sec": 0, "focus_done": 0, "breaks": 0, "skipped": 0})
+            if is_focus:
+                entry["focus_sec"] += seconds
+                entry["focus_done"] += int(completed)
+            elif completed:
+                entry["breaks"] += 1
+            entry["skipped"] += int(not completed)
+        if is_focus and completed:
+            streak = self.rollups["streak"]
+            last = streak["last_day"]
+            if last != day.isoformat():
+                if last == (day - timedelta(days=1)).isoformat():
+                    streak["current"] += 1
+                elif last is None or last < day.isoformat():
+                    streak["current"] = 1
+                else:
+                    return  # an older day (clock change); never rewinds the streak
+                streak["last_day"] = day.isoformat()
+                streak["best"] = max(streak["best"], streak["current"])
+
+    def _save_rollups(self):
+        with self._lock:
+            text = json.dumps(self.rollups)
+        tmp_path = self.rollup_path + ".tmp"
+        with self._save_lock, timed_write("pomodoro_log"):
+            with open(tmp_path, 'w') as f:
+                f.write(text)
+            os.replace(tmp_path, self.rollup_path)
+
+    def _save_loop(self):
+        while True:
+            self._save_pending.wait()
+            time.sleep(self.SAVE_DELAY_SECS)
+            self.flush()
+
+    def flush(self):
+        """Write the rollups now if a logged session has not been saved yet (also called at exit)."""
+        if not self._save_pending.is_set():
+            return
+        self._save_pending.clear()
+        try:
+            self._save_rollups()
+        except OSError as e:
+            print(f"Warning: could not save pomodoro rollups: {e}")
+
+    def record(self, mode, seconds, outcome, end_ts=None):
+        fields = (int(end_ts if end_ts is not None else time.time()), max(0, int(seconds)),
+                  self.MODES.index(mode), self.OUTCOMES.index(outcome))
+        with self._lock:
+            try:
+                with timed_write("pomodoro_log"), open(self.log_path, 'ab') as f:
+                    f.write(self.RECORD.pack(*fields))
+            except OSError as e:
+                print(f"Warning: could not log pomodoro session: {e}")
+                return
+            self._apply(*fields)
+            self.rollups["log_bytes"] += self.RECORD.size
+        self._save_pending.set()
+
+    # --- Queries (cost scales with the days asked for, not with the number of sessions) ---
+    def day(self, day):
+        return self.rollups["days"].get(day.isoformat(), {})
+
+    def week(self, day):
+        iso = day.isocalendar()
+        return self.rollups["weeks"].get(f"{iso[0]}-W{iso[1]:02d}", {})
+
+    def focus_minutes_by_day(self, days, today=None):
+        """[(date, focus minutes)] for the last `days` days, oldest first."""
+        today = today or datetime.now().date()
+        return [(d, self.day(d).get("focus_sec", 0) / 60.0)
+                for d in (today - timedelta(days=i) for i in range(days - 1, -1, -1))]
+
+    def streaks(self, today=None):
+        """(current, best) streak of days with at least one completed focus session."""
+        today = today or datetime.now().date()
+        streak = self.rollups["streak"]
+        alive = streak["last_day"] in (today.isoformat(), (today - timedelta(days=1)).isoformat())
+        return (streak["current"] if alive else 0), streak["best"]
+
+
 class PomodoroTimer:
-    def __init__(self, cfg, on_session_complete=None):
-        self.focus_minutes = int(cfg.get("focus_minutes", 25))
-        self.short_break_minutes = int(cfg.get("short_break_minutes", 5))
-        self.long_break_minutes  = int(cfg.get("long_break_minutes", 15))
-        self.sessions_before_long = int(cfg.get("sessions_before_long", 4))
-        self.auto_advance = bool(cfg.get("auto_advance", True))
+    """Counts down to an absolute monotonic deadline. Completion is scheduled on a timer thread, so it
+    fires on time regardless of frame rate; running state is persisted so a restart resumes the session.
+    Nothing touches the disk while the lock is held: the views read remaining_ms through it every frame."""
+    def __init__(self, cfg, on_session_complete=None, state_file=None, history=None,
+                 clock=time.monotonic, wall_clock=time.time):
+        self._set_config(cfg)
+        self._clock = clock            # drives the countdown; immune to wall-clock changes
+        self._wall_clock = wall_clock  # only used to persist the deadline across restarts
+        self._lock = threading.RLock()
+        self._timer = None
 
         self.mode = 'focus'  # 'focus' | 'short_break' | 'long_break'
         self.sessions_completed = 0
         self.running = False
-        self.remaining_ms = self._duration_for(self.mode) * 1000
-        self._last_tick_ms = pygame.time.get_ticks()
+        self._deadline = None  # clock() value at which the running session ends
+        self._paused_ms = self._duration_for(self.mode) * 1000
 
         self.cb_complete = on_session_complete
+        self.state_file = state_file
+        self.history = history
+        self._unlogged = []              # finished sessions waiting for _flush_log()
+        self._pending_state = None       # newest snapshot waiting for the state thread
+        self._state_pending = threading.Event()
+        self._write_lock = threading.Lock()
+        self._restore_state()
+        self._flush_log()
+        if state_file:
+            threading.Thread(target=self._state_loop, name="pomodoro-state", daemon=True).start()
+
+    def _set_config(self, cfg):
+        lo, hi = POMODORO_MINUTES_RANGE
+        self.focus_minutes = max(lo, min(hi, int(cfg.get("focus_minutes", 25))))
+        self.short_break_minutes = max(lo, min(hi, int(cfg.get("short_break_minutes", 5))))
+        self.long_break_minutes  = max(lo, min(hi, int(cfg.get("long_break_minutes", 15))))
+        self.sessions_before_long = max(POMODORO_SESSIONS_RANGE[0], min(POMODORO_SESSIONS_RANGE[1],
+                                                                      int(cfg.get("sessions_before_long", 4))))
+        self.auto_advance = bool(cfg.get("auto_advance", True))
+
+    def configure(self, cfg):
+        """Adopt new durations without disturbing the session in progress. A session that has not
+        been started yet takes its new length; one that is running or paused keeps its own."""
+        with self._lock:
+            untouched = not self.running and self._paused_ms == self._duration_for(self.mode) * 1000
+            self._set_config(cfg)
+            if untouched:
+                self._paused_ms = self._duration_for(self.mode) * 1000
+            self.save_state()
 
     def _duration_for(self, mode):
         if mode == 'focus': return self.focus_minutes * 60
@@ -556,50 +1808,208 @@ class PomodoroTimer:
         if mode == 'long_break': return self.long_break_minutes * 60
         return 1500
 
+    @property
+    def remaining_ms(self):
+        with self._lock:
+            if self.running and self._deadline is not None:
+                return max(0, int((self._deadline - self._clock()) * 1000))
+            return self._paused_ms
+
+    # --- Scheduling ---
+    def _start(self, deadline=None):
+        """Run from now (or toward an explicit deadline) and arm the completion timer."""
+        self.running = True
+        self._deadline = deadline if deadline is not None else self._clock() + self._paused_ms / 1000.0
+        self._arm_timer()
+
+    def _stop(self):
+        if self.running:
+            self._paused_ms = self.remaining_ms
+        self.running = False
+        self._deadline = None
+        self._cancel_timer()
+
+    def _arm_timer(self):
+        self._cancel_timer()
+        delay = max(0.0, self._deadline - self._clock())
+        self._timer = threading.Timer(delay, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _on_timer(self):
+        with self._lock:
+            if self._timer is threading.current_thread():
+                self._timer = None
+        self._check_deadline()
+
+    def _check_deadline(self):
+        """Complete the session if its deadline has passed; called by the timer thread and by update()."""
+        with self._lock:
+            if not self.running or self._deadline is None:
+                return
+            if self._clock() < self._deadline:
+                if self._timer is None:
+                    self._arm_timer()  # woke early; wait for the rest
+                return
+            prev, finished_at = self.mode, self._deadline
+            self.running = False
+            self._deadline = None
+            self._log_session(prev, self._duration_for(prev), 'completed',
+                              self._wall_clock() - (self._clock() - finished_at))
+            self._advance_mode()
+            if self.auto_advance:
+                # Chain from the old deadline, not from "now", so sessions never drift
+                self._start(finished_at + self._duration_for(self.mode))
+            self.save_state()
+            new = self.mode
+        self._flush_log()
+        if self.cb_complete:
+            try:
+                self.cb_complete(prev, new)
+            except Exception as e:
+                print(f"Pomodoro completion callback failed: {e}")
+
+    # --- Controls ---
     def toggle(self):
-        self.running = not self.running
-        self._last_tick_ms = pygame.time.get_ticks()
+        with self._lock:
+            if self.running: self._stop()
+            else: self._start()
+            self.save_state()
 
     def reset(self):
-        self.running = False
-        self.remaining_ms = self._duration_for(self.mode) * 1000
+        with self._lock:
+            self._stop()
+            self._paused_ms = self._duration_for(self.mode) * 1000
+            self.save_state()
 
     def skip(self):
-        self.running = False
-        self._advance_mode()
-        if self.auto_advance:
-            self.running = True
-        self._last_tick_ms = pygame.time.get_ticks()
+        with self._lock:
+            self._stop()
+            spent_ms = self._duration_for(self.mode) * 1000 - self._paused_ms
+            self._log_session(self.mode, spent_ms // 1000, 'skipped')
+            self._advance_mode()
+            if self.auto_advance:
+                self._start()
+            self.save_state()
+        self._flush_log()
+
+    def _next_mode(self, mode, completed):
+        """(phase after `mode`, focus sessions completed once it ends) given `completed` before it."""
+        if mode == 'focus':
+            completed += 1
+            return ('long_break' if completed % self.sessions_before_long == 0 else 'short_break'), completed
+        return 'focus', completed
 
     def _advance_mode(self):
-        if self.mode == 'focus':
-            self.sessions_completed += 1
-            if self.sessions_completed % self.sessions_before_long == 0:
-                self.mode = 'long_break'
-            else:
-                self.mode = 'short_break'
-        else:
-            self.mode = 'focus'
-        self.remaining_ms = self._duration_for(self.mode) * 1000
+        self.mode, self.sessions_completed = self._next_mode(self.mode, self.sessions_completed)
+        self._paused_ms = self._duration_for(self.mode) * 1000
+
+    def _log_session(self, mode, seconds, outcome, end_ts=None):
+        """Note a finished session; _flush_log() records it once the caller has released the lock."""
+        if self.history:
+            self._unlogged.append((mode, seconds, outcome, end_ts if end_ts is not None else self._wall_clock()))
+
+    def _flush_log(self):
+        with self._lock:
+            pending, self._unlogged = self._unlogged, []
+        for entry in pending:
+            self.history.record(*entry)
 
     def update(self):
-        if not self.running:
-            self._last_tick_ms = pygame.time.get_ticks()
+        # Backstop only: the timer thread normally completes sessions on its own
+        if self.running:
+            self._check_deadline()
+
+    # --- Persistence ---
+    def save_state(self):
+        """Snapshot the state for the state thread to write (safe to call with the lock held)."""
+        if not self.state_file:
             return
-        now = pygame.time.get_ticks()
-        delta = now - self._last_tick_ms
-        self._last_tick_ms = now
-        self.remaining_ms = max(0, self.remaining_ms - delta)
-        if self.remaining_ms == 0:
-            prev = self.mode
-            self.running = False
-            self._advance_mode()
+        with self._lock:
+            state = {"mode": self.mode, "sessions_completed": self.sessions_completed,
+                     "running": self.running, "remaining_ms": self.remaining_ms}
+            if self.running:
+                state["deadline_epoch"] = self._wall_clock() + (self._deadline - self._clock())
+            self._pending_state = state
+        self._state_pending.set()
+
+    def _state_loop(self):
+        while True:
+            self._state_pending.wait()
+            self._state_pending.clear()
+            self._write_state()
+
+    def _write_state(self):
+        with self._write_lock:
+            with self._lock:
+                state, self._pending_state = self._pending_state, None
+            if state is None:
+                return
             try:
-                if self.cb_complete:
-                    self.cb_complete(prev, self.mode)
-            finally:
-                if self.auto_advance:
-                    self.running = True
+                with timed_write("pomodoro_state"), open(self.state_file, 'w') as f:
+                    json.dump(state, f, indent=4)
+            except OSError as e:
+                print(f"Warning: could not save pomodoro state: {e}")
+
+    def _restore_state(self):
+        if not self.state_file:
+            return
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        mode = state.get("mode", 'focus')
+        self.mode = mode if mode in ('focus', 'short_break', 'long_break') else 'focus'
+        self.sessions_completed = max(0, int(state.get("sessions_completed", 0)))
+        self._paused_ms = max(0, min(int(state.get("remaining_ms", self._paused_ms)),
+                                     self._duration_for(self.mode) * 1000))
+        if not state.get("running") or "deadline_epoch" not in state:
+            return
+        deadline_epoch = float(state["deadline_epoch"])
+        overrun = self._wall_clock() - deadline_epoch
+        if overrun < 0:
+            self._start(self._clock() - overrun)
+            return
+        # The session that ran out while the app was closed is logged; without auto-advance the next
+        # one waits to be started
+        self._log_session(self.mode, self._duration_for(self.mode), 'completed', deadline_epoch)
+        self._advance_mode()
+        if not self.auto_advance:
+            return
+        # Auto-advance would have chained more sessions meanwhile. Nobody worked them, so they are
+        # neither logged nor counted: whole cycles are skipped at once, then the phase reached is
+        # found within one cycle on a scratch copy of the long-break position. It keeps running only
+        # if it is still the session right after the one that ran out; otherwise it waits at its
+        # full length, so no unworked time reaches the history through skip() or completion
+        n = self.sessions_before_long
+        cycle = n * self.focus_minutes * 60 + (n - 1) * self.short_break_minutes * 60 + self.long_break_minutes * 60
+        cycles, overrun = divmod(overrun, cycle)
+        mode, position = self.mode, self.sessions_completed
+        chained = cycles > 0
+        while overrun >= self._duration_for(mode):
+            overrun -= self._duration_for(mode)
+            mode, position = self._next_mode(mode, position)
+            chained = True
+        if not chained:
+            self._paused_ms = int((self._duration_for(mode) - overrun) * 1000)
+            self._start()
+            return
+        self.mode = mode
+        self._paused_ms = self._duration_for(mode) * 1000
+
+    def shutdown(self):
+        with self._lock:
+            self._cancel_timer()
+            self.save_state()
+        self._flush_log()
+        if self.state_file:
+            self._write_state()   # the state thread is a daemon; this write must not be lost
 
     def set_auto(self, on): self.auto_advance = bool(on)
     def format_mmss(self):
@@ -610,51 +2020,978 @@ class PomodoroTimer:
         dur = self._duration_for(self.mode) * 1000
         return 1.0 - (self.remaining_ms / dur) if dur > 0 else 0.0
 
-pomodoro_timer = PomodoroTimer(pomodoro_config, on_session_complete=lambda prev, new: sound_manager.play())
+pomodoro_history = PomodoroHistory(POMODORO_LOG_FILE, POMODORO_ROLLUP_FILE)
+# A render stops the countdown at the injected moment
+pomodoro_clocks = {} if render_epoch is None else {"clock": lambda: render_epoch, "wall_clock": lambda: render_epoch}
+pomodoro_timer = PomodoroTimer(pomodoro_config,
+                               on_session_complete=lambda prev, new: sound_manager.play(pomodoro_sound_event(prev, new)),
+                               state_file=POMODORO_STATE_FILE, history=pomodoro_history, **pomodoro_clocks)
+
+
+# =================================================================================
+# 6.84 METRICS HISTORY (1-minute / 1-hour rollups on disk)
+# =================================================================================
+class MetricsBucket:
+    """min/max/avg of CPU and RAM percent over one fixed time bucket."""
+    # start (epoch s), cpu min/max/avg, ram min/max/avg, sample count -> 32 bytes
+    RECORD = struct.Struct("<I6fH2x")
+    __slots__ = ("start", "cpu_min", "cpu_max", "cpu_sum", "ram_min", "ram_max", "ram_sum", "count")
+
+    def __init__(self, start):
+        self.start = int(start)
+        self.cpu_min = self.ram_min = float("inf")
+        self.cpu_max = self.ram_max = float("-inf")
+        self.cpu_sum = self.ram_sum = 0.0
+        self.count = 0
+
+    def add(self, cpu, ram):
+        self.cpu_min = min(self.cpu_min, cpu); self.cpu_max = max(self.cpu_max, cpu); self.cpu_sum += cpu
+        self.ram_min = min(self.ram_min, ram); self.ram_max = max(self.ram_max, ram); self.ram_sum += ram
+        self.count += 1
+
+    def merge(self, row):
+        """Fold a finer-grained bucket row (see as_row) into this one, weighted by its sample count."""
+        _, cpu_min, cpu_max, cpu_avg, ram_min, ram_max, ram_avg, count = row
+        self.cpu_min = min(self.cpu_min, cpu_min); self.cpu_max = max(self.cpu_max, cpu_max)
+        self.ram_min = min(self.ram_min, ram_min); self.ram_max = max(self.ram_max, ram_max)
+        self.cpu_sum += cpu_avg * count; self.ram_sum += ram_avg * count
+        self.count += count
+
+    def as_row(self):
+        n = max(1, self.count)
+        return (self.start, self.cpu_min, self.cpu_max, self.cpu_sum / n,
+                self.ram_min, self.ram_max, self.ram_sum / n, min(self.count, 0xFFFF))
+
+    def pack(self):
+        return self.RECORD.pack(*self.as_row())
+
+
+class RollupFile:
+    """Append-only file of fixed-width, time-ordered bucket records, memory-mapped for reads."""
+    def __init__(self, path, max_records):
+        self.path = path
+        self.max_records = max(16, int(max_records))
+        self.record_size = MetricsBucket.RECORD.size
+        self._map = None
+        self._mapped_size = 0
+        # Drop a torn trailing record left by a crash mid-write
+        if os.path.exists(path):
+            size = os.path.getsize(path)
+            if size % self.record_size:
+                with open(path, "r+b") as f:
+                    f.truncate(size - size % self.record_size)
+        self._file = open(path, "ab")
+
+    def __len__(self):
+        return self._file.tell() // self.record_size
+
+    def append(self, bucket):
+        with timed_write("metrics_history"):
+            self._file.write(bucket.pack())
+            self._file.flush()
+            if len(self) > self.max_records:
+                self._compact()
+
+    def _compact(self):
+        """Keep the newest three quarters of the cap so compaction stays rare."""
+        keep = self.max_records * 3 // 4
+        self._release_map()
+        self._file.close()
+        with open(self.path, "rb") as f:
+            f.seek(-keep * self.record_size, os.SEEK_END)
+            tail = f.read()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(tail)
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, "ab")
+
+    def _release_map(self):
+        if self._map is not None:
+            self._map.close()
+        self._map = None
+        self._mapped_size = 0
+
+    def _mapped(self):
+        size = len(self) * self.record_size
+        if size == 0:
+            return None
+        if self._map is None or self._mapped_size != size:
+            self._release_map()
+            with open(self.path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+            self._mapped_size = size
+        return self._map
+
+    def last_start(self):
+        mm = self._mapped()
+        if mm is None:
+            return None
+        return MetricsBucket.RECORD.unpack_from(mm, self._mapped_size - self.record_size)[0]
+
+    def rows_since(self, start_ts):
+        """Rows with start >= start_ts; binary search, then unpack only the matching tail."""
+        mm = self._mapped()
+        if mm is None:
+            return []
+        unpack_from, size = MetricsBucket.RECORD.unpack_from, self.record_size
+        lo, hi = 0, self._mapped_size // size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if unpack_from(mm, mid * size)[0] < start_ts: lo = mid + 1
+            else: hi = mid
+        return [unpack_from(mm, i * size) for i in range(lo, self._mapped_size // size)]
+
+    def close(self):
+        self._release_map()
+        self._file.close()
+
+
+class MetricsHistory:
+    """Rolls raw CPU/RAM samples into 1-minute and 1-hour buckets persisted under HISTORY_DIR."""
+    # range key -> (seconds shown, resolution read)
+    RANGES = {"1H": (3600, "minute"), "1D": (86400, "hour"), "1W": (7 * 86400, "hour")}
+    BUCKET_SECS = {"minute": 60, "hour": 3600}
+
+    def __init__(self, directory, max_kb):
+        os.makedirs(directory, exist_ok=True)
+        budget_records = max_kb * 1024 // MetricsBucket.RECORD.size
+        self._lock = threading.Lock()
+        self._files = {
+            "minute": RollupFile(os.path.join(directory, "metrics_1m.bin"), budget_records * 3 // 5),
+            "hour":   RollupFile(os.path.join(directory, "metrics_1h.bin"), budget_records * 2 // 5),
+        }
+        self._closed = False
+        self._query_cache = {}
+        # A bucket already on disk must not be written twice after a quick restart
+        self._skip_until = {res: f.last_start() for res, f in self._files.items()}
+        self._open = {"minute": None, "hour": None}
+        self._rebuild_hours()
+
+    def _rebuild_hours(self):
+        """Roll the minutes written since the last hour record into hours: those that ended while the
+        app was closed (or were in progress at shutdown) are appended, the current one stays open."""
+        hour_start = int(time.time()) // 3600 * 3600
+        last_hour = self._skip_until["hour"]
+        hour = None
+        for row in self._files["minute"].rows_since(0 if last_hour is None else last_hour + 3600):
+            start = row[0] // 3600 * 3600
+            if hour is not None and hour.start != start:
+                self._files["hour"].append(hour)
+                hour = None
+            if hour is None:
+                hour = MetricsBucket(start)
+            hour.merge(row)
+        if hour is not None:
+            if hour.start < hour_start:
+                self._files["hour"].append(hour)
+            else:
+                self._open["hour"] = hour
+        self._skip_until["hour"] = self._files["hour"].last_start()
+
+    def add_sample(self, ts, cpu, ram_pct):
+        with self._lock:
+            if self._closed:
+                return
+            minute_start = int(ts) // 60 * 60
+            last = self._skip_until["minute"]
+            if last is not None and minute_start <= last:
+                return
+            bucket = self._open["minute"]
+            if bucket is not None and bucket.start != minute_start:
+                self._flush_minute()
+                bucket = None
+            if bucket is None:
+                bucket = self._open["minute"] = MetricsBucket(minute_start)
+            bucket.add(cpu, ram_pct)
+
+    def _flush_minute(self):
+        minute = self._open["minute"]
+        self._open["minute"] = None
+        if minute is None or not minute.count:
+            return
+        self._files["minute"].append(minute)
+        hour_start = minute.start // 3600 * 3600
+        hour = self._open["hour"]
+        if hour is not None and hour.start != hour_start:
+            if hour.count and (self._skip_until["hour"] is None or hour.start > self._skip_until["hour"]):
+                self._files["hour"].append(hour)
+            hour = None
+        if hour is None:
+            hour = self._open["hour"] = MetricsBucket(hour_start)
+        hour.merge(minute.as_row())
+
+    def query(self, range_key):
+        """Rows (start, cpu min/max/avg, ram min/max/avg, count) covering the range, newest bucket included."""
+        span, resolution = self.RANGES[range_key]
+        with self._lock:
+            rollup = self._files[resolution]
+            open_bucket = self._open[resolution]
+            live_minute = self._open["minute"]
+            key = (len(rollup), open_bucket.count if open_bucket else 0,
+                   live_minute.count if live_minute else 0, int(time.time()) // 60)
+            cached = self._query_cache.get(range_key)
+            if cached and cached[0] == key:
+                return cached[1]
+            since = int(time.time()) - span
+            rows = rollup.rows_since(since)
+            if open_bucket is not None and open_bucket.count:
+                rows.append(open_bucket.as_row())
+            if resolution == "hour" and live_minute is not None and live_minute.count:
+                # Fold the unfinished minute into the unfinished hour so the newest point is live
+                live = MetricsBucket(live_minute.start // 3600 * 3600)
+                if rows and rows[-1][0] == live.start:
+                    live.merge(rows.pop())
+                live.merge(live_minute.as_row())
+                rows.append(live.as_row())
+            self._query_cache[range_key] = (key, rows)
+            return rows
+
+    def close(self):
+        """Persist the unfinished minute; the unfinished hour is rebuilt from minutes on the next start."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            minute = self._open["minute"]
+            if minute is not None and minute.count:
+                self._files["minute"].append(minute)
+            for f in self._files.values():
+                f.close()
+
+metrics_history = None
+if history_config["enabled"]:
+    try:
+        metrics_history = MetricsHistory(HISTORY_DIR, history_config["max_kb"])
+    except OSError as e:
+        print(f"Warning: metrics history disabled: {e}")
 
 
 # =================================================================================
 # --- NEW: 6.85 SYSTEM MONITOR ---
 # =================================================================================
-class SystemMonitor:
+class SystemSampler:
+    """Shared base for SystemMonitor backends. Each subclass defines sample(), returning one stats dict:
+    cpu / ram_pct (percent), ram_total / ram_used (GB), disk_read / disk_write / net_rx / net_tx (bytes/s)."""
+    name = "none"
+
     def __init__(self):
-        self.refresh_secs = 2
+        self._prev_counters = None
+        self._prev_time = None
+        self._prev_self_cpu = None
+
+    @classmethod
+    def available(cls):
+        return False
+
+    def sample_self(self):
+        """This process's own cost: cpu (percent of one core), rss (bytes), threads, fds (None if unknown)."""
+        t = os.times()
+        return {"cpu": self._self_cpu_percent(t.user + t.system), "rss": None,
+                "threads": threading.active_count(), "fds": None}
+
+    def _self_cpu_percent(self, cpu_seconds):
+        now = time.monotonic()
+        prev, self._prev_self_cpu = self._prev_self_cpu, (cpu_seconds, now)
+        if prev is None or now <= prev[1]:
+            return 0.0
+        return max(0.0, 100.0 * (cpu_seconds - prev[0]) / (now - prev[1]))
+
+    def close(self):
+        pass
+
+    def _rates(self, counters):
+        """Turn cumulative byte counters into per-second rates since the previous call."""
+        now = time.monotonic()
+        prev, prev_time = self._prev_counters, self._prev_time
+        self._prev_counters, self._prev_time = counters, now
+        if prev is None or now <= prev_time:
+            return {key: 0.0 for key in counters}
+        dt = now - prev_time
+        return {key: max(0, value - prev.get(key, value)) / dt for key, value in counters.items()}
+
+
+class ProcSampler(SystemSampler):
+    """Linux backend: parses /proc directly through persistent handles that are rewound, not reopened."""
+    name = "proc"
+    PATHS = {"stat": "/proc/stat", "meminfo": "/proc/meminfo",
+             "diskstats": "/proc/diskstats", "net": "/proc/net/dev"}
+    SKIP_DISK_PREFIXES = (b"loop", b"ram", b"zram", b"dm-", b"md")
+
+    def __init__(self):
+        super().__init__()
+        self._files = {}
+        for key, path in self.PATHS.items():
+            self._files[key] = open(path, "rb", buffering=0)
+        self._files["self_stat"] = open("/proc/self/stat", "rb", buffering=0)
+        self._files["self_statm"] = open("/proc/self/statm", "rb", buffering=0)
+        self._clk_tck = os.sysconf("SC_CLK_TCK")
+        self._page_size = os.sysconf("SC_PAGE_SIZE")
+        self._prev_cpu = None
+        # Whole disks only; partitions would double-count their parent's traffic
+        try:
+            self._disks = {name.encode() for name in os.listdir("/sys/block")
+                           if not name.encode().startswith(self.SKIP_DISK_PREFIXES)}
+        except OSError:
+            self._disks = None
+
+    @classmethod
+    def available(cls):
+        return sys.platform.startswith("linux") and all(os.access(p, os.R_OK) for p in cls.PATHS.values())
+
+    def close(self):
+        for f in self._files.values():
+            try: f.close()
+            except Exception: pass
+        self._files = {}
+
+    def _read(self, key):
+        f = self._files[key]
+        f.seek(0)
+        return f.read()
+
+    def _cpu_percent(self):
+        # First line: "cpu  user nice system idle iowait irq softirq steal guest guest_nice"
+        fields = self._read("stat").split(b"\n", 1)[0].split()[1:9]
+        values = [int(v) for v in fields]
+        total = sum(values)
+        idle = values[3] + values[4]
+        prev, self._prev_cpu = self._prev_cpu, (total, idle)
+        if prev is None or total <= prev[0]:
+            return 0.0
+        d_total = total - prev[0]
+        return max(0.0, min(100.0, 100.0 * (d_total - (idle - prev[1])) / d_total))
+
+    def _memory(self):
+        mem = {}
+        for line in self._read("meminfo").splitlines():
+            key, _, rest = line.partition(b":")
+            if key in (b"MemTotal", b"MemAvailable", b"MemFree", b"Buffers", b"Cached"):
+                mem[key] = int(rest.split()[0]) * 1024
+        total = mem.get(b"MemTotal", 0)
+        available = mem.get(b"MemAvailable")
+        if available is None:  # kernels before 3.14
+            available = mem.get(b"MemFree", 0) + mem.get(b"Buffers", 0) + mem.get(b"Cached", 0)
+        used = max(0, total - available)
+        return total, used
+
+    def _io_counters(self):
+        read_bytes = write_bytes = 0
+        for line in self._read("diskstats").splitlines():
+            parts = line.split()
+            if len(parts) < 10:
+                continue
+            name = parts[2]
+            if self._disks is not None:
+                if name not in self._disks:
+                    continue
+            elif name.startswith(self.SKIP_DISK_PREFIXES):
+                continue
+            read_bytes += int(parts[5]) * 512     # sectors are always 512 bytes here
+            write_bytes += int(parts[9]) * 512
+        rx = tx = 0
+        for line in self._read("net").splitlines()[2:]:
+            iface, _, rest = line.partition(b":")
+            if iface.strip() == b"lo":
+                continue
+            parts = rest.split()
+            if len(parts) >= 9:
+                rx += int(parts[0]); tx += int(parts[8])
+        return {"disk_read": read_bytes, "disk_write": write_bytes, "net_rx": rx, "net_tx": tx}
+
+    def sample_self(self):
+        # Fields after the "(comm)" part: state is [0], utime [11], stime [12], num_threads [17]
+        fields = self._read("self_stat").rsplit(b")", 1)[1].split()
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / self._clk_tck
+        rss = int(self._read("self_statm").split()[1]) * self._page_size
+        try:
+            fds = len(os.listdir("/proc/self/fd"))
+        except OSError:
+            fds = None
+        return {"cpu": self._self_cpu_percent(cpu_seconds), "rss": rss,
+                "threads": int(fields[17]), "fds": fds}
+
+    def sample(self):
+        cpu = self._cpu_percent()
+        total, used = self._memory()
+        snap = {"cpu": cpu,
+                "ram_pct": 100.0 * used / total if total else 0.0,
+                "ram_total": total / (1024**3), "ram_used": used / (1024**3)}
+        snap.update(self._rates(self._io_counters()))
+        return snap
+
+
+class PsutilSampler(SystemSampler):
+    """Portable fallback backend built on psutil."""
+    name = "psutil"
+
+    def __init__(self):
+        super().__init__()
+        psutil.cpu_percent(interval=None)  # prime the non-blocking CPU delta
+        self._process = psutil.Process()
+        self._process.cpu_percent(interval=None)
+
+    @classmethod
+    def available(cls):
+        return psutil is not None
+
+    def sample(self):
+        cpu = psutil.cpu_percent(interval=None)
+        ram = psutil.virtual_memory()
+        counters = {"disk_read": 0, "disk_write": 0, "net_rx": 0, "net_tx": 0}
+        disk = psutil.disk_io_counters()
+        if disk is not None:
+            counters["disk_read"], counters["disk_write"] = disk.read_bytes, disk.write_bytes
+        net = psutil.net_io_counters()
+        if net is not None:
+            counters["net_rx"], counters["net_tx"] = net.bytes_recv, net.bytes_sent
+        snap = {"cpu": cpu, "ram_pct": ram.percent,
+                "ram_total": ram.total / (1024**3), "ram_used": ram.used / (1024**3)}
+        snap.update(self._rates(counters))
+        return snap
+
+    def sample_self(self):
+        proc = self._process
+        with proc.oneshot():
+            if hasattr(proc, "num_fds"):
+                fds = proc.num_fds()
+            else:  # Windows
+                fds = proc.num_handles()
+            return {"cpu": proc.cpu_percent(interval=None), "rss": proc.memory_info().rss,
+                    "threads": proc.num_threads(), "fds": fds}
+
+
+SYSTEM_SAMPLERS = {"proc": ProcSampler, "psutil": PsutilSampler}
+
+def make_system_sampler(preferred="auto"):
+    """Build the preferred sampler backend, falling back to any other available one (None if none work)."""
+    order = list(SYSTEM_SAMPLERS)
+    if preferred in SYSTEM_SAMPLERS:
+        order.remove(preferred); order.insert(0, preferred)
+    for name in order:
+        cls = SYSTEM_SAMPLERS[name]
+        if not cls.available():
+            continue
+        try:
+            return cls()
+        except Exception as e:
+            print(f"Warning: system sampler '{name}' failed to start: {e}")
+    return None
+
+
+class FrameStats:
+    """Rolling main-loop timing: fed once per frame, read from the monitor thread. Every frame's
+    work time also goes into a histogram since start, for the metrics endpoint."""
+    BUCKETS = (0.002, 0.004, 0.008, 0.0167, 0.025, 0.0333, 0.05, 0.1, 0.25, 1.0)   # seconds
+
+    def __init__(self, window=120):
+        self._lock = threading.Lock()
+        self._frames = collections.deque(maxlen=window)  # (frame end time, work ms)
+        self.histogram = Histogram(self.BUCKETS)
+
+    def record(self, work_ms):
+        with self._lock:
+            self._frames.append((time.perf_counter(), work_ms))
+        self.histogram.observe(work_ms / 1000)
+
+    def summary(self):
+        """Returns (fps, average frame work time in ms) over the window."""
+        with self._lock:
+            frames = list(self._frames)
+        if len(frames) < 2:
+            return 0.0, 0.0
+        span = frames[-1][0] - frames[0][0]
+        fps = (len(frames) - 1) / span if span > 0 else 0.0
+        return fps, sum(ms for _, ms in frames) / len(frames)
+
+
+class SystemMonitor:
+    ALERT_SAMPLES = 3            # consecutive samples over a threshold before on_threshold fires
+    ALERT_COOLDOWN_SECS = 300
+    COST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1)   # seconds
+
+    def __init__(self, cfg, history=None, on_threshold=None):
+        self.configure(cfg)
+        self._on_threshold = on_threshold
+        self._over_count = 0
+        self._last_alert = None
+        self._last_self_log = time.monotonic()
+        self.frame_stats = FrameStats()
+        self.sample_cost = Histogram(self.COST_BUCKETS)   # sample() + sample_self(), per round
+        self.history = history
         self._lock = threading.Lock()
         self._snapshot = {"cpu": 0.0, "ram_pct": 0.0, "ram_total": 0.0, "ram_used": 0.0}
         self._running = True
+        self._pinned = False
+        self._active = True
+        self._wake = threading.Event()
+        self.sampler = make_system_sampler(cfg.get("sampler", "auto"))
         self._thread = threading.Thread(target=self._loop, daemon=True)
-        if psutil:
+        if self.sampler:
+            self._snapshot["backend"] = self.sampler.name
             self._thread.start()
         else:
             self._snapshot = {"cpu": -1.0, "ram_pct": -1.0}
 
-    def stop(self): self._running = False
+    def configure(self, cfg):
+        """Intervals (from the next sample on), alert thresholds and self-logging; the sampler
+        backend is fixed at startup."""
+        self.refresh_secs = max(1, int(cfg.get("refresh_seconds", 2)))
+        self.idle_refresh_secs = max(0, int(cfg.get("idle_refresh_seconds", 30)))
+        self.alert_cpu = int(cfg.get("alert_cpu_percent", 0))
+        self.alert_ram = int(cfg.get("alert_ram_percent", 0))
+        self.self_log_secs = max(0, int(cfg.get("self_log_seconds", 60)))
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        if self.history:
+            self.history.close()
+
+    def pin(self, snapshot):
+        """Stop sampling and report this snapshot from now on (--render injects its readings here)."""
+        self._running = False
+        self._wake.set()
+        with self._lock:
+            self._pinned = True
+            self._snapshot = snapshot
+
+    def set_active(self, active):
+        """Sample every refresh_seconds while a System view is open, else every idle_refresh_seconds
+        (history and threshold alerts keep running, just coarser); 0 pauses sampling entirely."""
+        if active != self._active:
+            self._active = active
+            self._wake.set()
+
+    def _interval(self):
+        if self._active:
+            return self.refresh_secs
+        return self.idle_refresh_secs or None   # None: sleep until shown again
 
     def _loop(self):
         while self._running:
             try:
-                cpu = psutil.cpu_percent(interval=None) # Use interval=None for non-blocking
-                ram = psutil.virtual_memory()
-                ram_pct = ram.percent
-                ram_total = ram.total / (1024**3) # in GB
-                ram_used = ram.used / (1024**3) # in GB
+                started = time.perf_counter()
+                snap = self.sampler.sample()
+                snap["backend"] = self.sampler.name
+                own = self.sampler.sample_self()
+                self.sample_cost.observe(time.perf_counter() - started)
+                own["fps"], own["frame_ms"] = self.frame_stats.summary()
+                snap["self"] = own
                 with self._lock:
-                    self._snapshot = {"cpu": cpu, "ram_pct": ram_pct, "ram_total": ram_total, "ram_used": ram_used}
+                    if self._pinned:
+                        break
+                    self._snapshot = snap
+                if self.history:
+                    self.history.add_sample(time.time(), snap["cpu"], snap["ram_pct"])
+                self._maybe_log_self(own)
+                self._check_threshold(snap)
             except Exception as e:
                 print(f"Error in SystemMonitor: {e}")
                 with self._lock:
                     self._snapshot = {"cpu": -1.0, "ram_pct": -1.0} # Indicate error
-            time.sleep(self.refresh_secs)
+            self._wake.wait(self._interval())
+            self._wake.clear()
+        self.sampler.close()
+
+    def _check_threshold(self, snap):
+        over = ((self.alert_cpu and snap["cpu"] >= self.alert_cpu) or
+                (self.alert_ram and snap["ram_pct"] >= self.alert_ram))
+        self._over_count = self._over_count + 1 if over else 0
+        if self._over_count < self.ALERT_SAMPLES or not self._on_threshold:
+            return
+        now = time.monotonic()
+        if self._last_alert is None or now - self._last_alert >= self.ALERT_COOLDOWN_SECS:
+            self._last_alert = now
+            self._on_threshold(snap)
+
+    def _maybe_log_self(self, own):
+        if not self.self_log_secs or time.monotonic() - self._last_self_log < self.self_log_secs:
+            return
+        self._last_self_log = time.monotonic()
+        print("[SELF] " + "  ".join(format_self_stats(own)))
 
     def get_snapshot(self):
         with self._lock:
             return dict(self._snapshot)
 
-system_monitor = SystemMonitor()
+def format_self_stats(own):
+    """The app's own overhead as (process line, frame line), shared by the view and the periodic log."""
+    parts = [f"CPU {own['cpu']:.1f}%"]
+    if own.get("rss") is not None: parts.append(f"RSS {own['rss'] / (1024**2):.1f} MB")
+    parts.append(f"{own['threads']} threads")
+    if own.get("fds") is not None: parts.append(f"{own['fds']} fds")
+    frame_line = f"{own.get('fps', 0.0):.1f} FPS  frame {own.get('frame_ms', 0.0):.1f} ms"
+    return "  ".join(parts), frame_line
+
+def run_sampler_benchmark(samples):
+    """Micro-benchmark: per-sample cost of every SystemSampler backend on this machine."""
+    print(f"System sampler benchmark ({samples} samples per backend)")
+    for name, cls in SYSTEM_SAMPLERS.items():
+        if not cls.available():
+            print(f"  {name:<8} unavailable")
+            continue
+        sampler = cls()
+        try:
+            sampler.sample(); sampler.sample_self()  # warm-up: primes the CPU and I/O deltas
+            start = time.perf_counter()
+            for _ in range(samples):
+                sampler.sample()
+            per_sample = (time.perf_counter() - start) / samples
+            start = time.perf_counter()
+            for _ in range(samples):
+                sampler.sample_self()
+            per_self = (time.perf_counter() - start) / samples
+        finally:
+            sampler.close()
+        print(f"  {name:<8} {per_sample * 1e6:9.1f} us/sample  {per_self * 1e6:9.1f} us/self-sample")
+
+# --render keeps the sandbox history empty: samples taken while starting up would differ per run
+system_monitor = SystemMonitor(system_config, metrics_history if render_epoch is None else None,
+                               on_threshold=lambda snap: sound_manager.play("system_threshold"))
 
 
 # =================================================================================
-# 6.9 UI HELPERS (icons, tooltips, weather & pomodoro views)
+# 6.87 FRAME WATCHDOG (main-thread stacks of frames over budget)
+# =================================================================================
+class FrameWatchdog:
+    """Daemon thread that notices when the main loop stops coming back. The loop calls beat() at
+    the start of every frame; a frame still running after frame_budget_ms has the main thread's
+    stack (from sys._current_frames()) written to a rotating log, and its full length is logged
+    once the loop returns. Each stalled frame is reported once, however long it lasts."""
+    def __init__(self, config, main_thread_id):
+        self.budget = config.get("frame_budget_ms", 250) / 1000.0
+        self.stalls = 0
+        self._main_id = main_thread_id
+        self._beat = (0, None)     # (frame number, monotonic start); replaced whole, never mutated
+        self._running = self.budget > 0
+        if not self._running:
+            return
+        self.log = logging.getLogger("trife.watchdog")
+        self.log.propagate = False
+        self.log.setLevel(logging.INFO)
+        handler = logging.handlers.RotatingFileHandler(config["log_file"], maxBytes=config["log_max_kb"] * 1024,
+                                                       backupCount=config["log_backups"], encoding="utf-8", delay=True)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        self.log.addHandler(handler)
+        self.log_path = handler.baseFilename
+        threading.Thread(target=self._loop, name="frame-watchdog", daemon=True).start()
+
+    def beat(self):
+        self._beat = (self._beat[0] + 1, time.monotonic())
+
+    def stop(self):
+        self._running = False
+
+    def _loop(self):
+        stalled = None     # (frame, start) of the frame last reported
+        while self._running:
+            time.sleep(self.budget / 4)
+            if not self._running:
+                break
+            frame, started = self._beat
+            if stalled is not None and stalled[0] != frame:
+                self.log.warning("frame %d finished after %.0f ms", stalled[0], (started - stalled[1]) * 1000)
+                stalled = None
+            if started is None or stalled is not None:
+                continue
+            elapsed = time.monotonic() - started
+            if elapsed < self.budget:
+                continue
+            stalled = (frame, started)
+            self.stalls += 1
+            stack = sys._current_frames().get(self._main_id)
+            where = "".join(traceback.format_stack(stack)) if stack is not None else "  (main thread not found)\n"
+            self.log.warning("frame %d over the %.0f ms budget, %.0f ms so far; main thread:\n%s",
+                             frame, self.budget * 1000, elapsed * 1000, where.rstrip("\n"))
+            print(f"[WATCHDOG] frame {frame} stalled for {elapsed * 1000:.0f} ms; stack written to {self.log_path}")
+
+watchdog = FrameWatchdog(watchdog_config, threading.main_thread().ident)
+
+
+# =================================================================================
+# 6.875 SAMPLING PROFILER (collapsed stacks for flame graphs)
+# =================================================================================
+class SamplingProfiler:
+    """Samples the main thread's stack from a daemon thread, only while a session is open. Identical
+    stacks are counted as tuples of (code object, line) and named only when the session is written,
+    as collapsed stacks ("root;caller;callee count" per line) that flamegraph.pl or speedscope read.
+    Lines are kept because the main loop itself runs at module level."""
+    def __init__(self, hz, main_thread_id, out_dir):
+        self.interval = 1.0 / max(1, min(1000, hz))
+        self.out_dir = out_dir
+        self._main_id = main_thread_id
+        self._session = None    # (label, stop event, thread) while sampling
+
+    @property
+    def active(self):
+        return self._session is not None
+
+    def start(self, label, seconds=None):
+        """Open a session; it ends after `seconds`, or at stop()."""
+        if self._session is not None:
+            return
+        stop = threading.Event()
+        thread = threading.Thread(target=self._run, args=(label, stop, seconds), name="profiler", daemon=True)
+        self._session = (label, stop, thread)
+        thread.start()
+
+    def stop(self, wait=False):
+        """End the session; the sampler thread writes it out (wait=True blocks until it has)."""
+        session, self._session = self._session, None
+        if session is not None:
+            session[1].set()
+            if wait:
+                session[2].join()
+
+    def toggle(self, label):
+        if self.active:
+            self.stop()
+        else:
+            self.start(label)
+
+    def _run(self, label, stop, seconds):
+        counts = collections.Counter()
+        cost = 0.0
+        began = time.perf_counter()
+        deadline = began + seconds if seconds else None
+        while not stop.wait(self.interval):
+            t0 = time.perf_counter()
+            frame = sys._current_frames().get(self._main_id)
+            stack = []
+            while frame is not None:
+                stack.append((frame.f_code, frame.f_lineno))
+                frame = frame.f_back
+            if stack:
+                counts[tuple(reversed(stack))] += 1
+            cost += time.perf_counter() - t0
+            if deadline is not None and t0 >= deadline:
+                break
+        if self._session is not None and self._session[1] is stop:
+            self._session = None    # ended by its own deadline
+        self._write(label, counts, time.perf_counter() - began, cost)
+
+    @staticmethod
+    def _name(site):
+        code, line = site
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{line})"
+
+    def _write(self, label, counts, elapsed, cost):
+        os.makedirs(self.out_dir, exist_ok=True)
+        path = os.path.join(self.out_dir, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{label}.folded")
+        with open(path, 'w') as f:
+            for stack, count in counts.most_common():
+                f.write(";".join(self._name(site) for site in stack) + f" {count}\n")
+        samples = sum(counts.values())
+        print(f"[PROFILE] {label}: {samples} samples over {elapsed:.1f} s, sampler cost "
+              f"{cost * 1000 / max(1, samples):.3f} ms/sample -> {path}")
+
+profiler = SamplingProfiler(cli_args.profile_hz, threading.main_thread().ident, PROFILE_DIR)
+
+
+# =================================================================================
+# 6.88 CLOCK MODEL (wall-clock fields, formatted once per boundary)
+# =================================================================================
+class ClockModel:
+    """Wall-clock fields for the UI, formatted only when they change. tick() runs every frame but
+    only compares the epoch second; on a new second it refreshes the fields that rolled over and
+    calls the subscribers of each unit that did ('second', then 'minute', then 'day')."""
+    UNITS = ('second', 'minute', 'day')
+
+    def __init__(self, source=time.time):
+        self.source = source
+        self.epoch_second = None
+        self.moment = None
+        self.hhmm = self.ampm = self.seconds = self.date = ""
+        self.today = None
+        self._subscribers = {unit: [] for unit in self.UNITS}
+
+    def subscribe(self, unit, callback):
+        """Call callback(clock) at every `unit` boundary, and right away if the clock has ticked,
+        so a view built mid-session starts with the current fields."""
+        self._subscribers[unit].append(callback)
+        if self.moment is not None:
+            callback(self)
+
+    def tick(self):
+        second = int(self.source())
+        if second == self.epoch_second:
+            return
+        self.epoch_second = second
+        previous, self.moment = self.moment, datetime.fromtimestamp(second)
+        rolled = ['second']
+        self.seconds = self.moment.strftime("%S")
+        if previous is None or previous.replace(second=0) != self.moment.replace(second=0):
+            self.hhmm = self.moment.strftime("%I:%M")
+            self.ampm = self.moment.strftime("%p")
+            rolled.append('minute')
+        if previous is None or previous.date() != self.moment.date():
+            self.today = self.moment.date()
+            self.date = self.moment.strftime("%A, %B %d")
+            rolled.append('day')
+        for unit in rolled:
+            for callback in self._subscribers[unit]:
+                callback(self)
+
+clock_model = ClockModel()
+
+
+# =================================================================================
+# 6.89 CONFIG HOT-RELOAD (watch config.json, apply only what changed)
+# =================================================================================
+class ConfigWatcher:
+    """Notices edits to config.json from a daemon thread: inotify on Linux (through ctypes; the
+    directory is watched, as editors often save by renaming a new file over the old one), else a
+    once-a-second mtime poll. The thread only reads and decodes the file; poll(), called by the
+    main loop, applies it, so settings only ever change between frames."""
+    POLL_SECS = 1.0
+    SETTLE_SECS = 0.1    # editors may write a file in several steps
+    IN_CLOSE_WRITE, IN_MOVED_TO, IN_CREATE = 0x008, 0x080, 0x100
+    EVENT = struct.Struct("iIII")   # struct inotify_event, followed by `len` bytes of name
+
+    def __init__(self, path, enabled=True):
+        self.path = os.path.abspath(path)
+        self._lock = threading.Lock()
+        self._pending = None     # (text, settings or the JSON error) for poll()
+        self._running = enabled
+        if enabled:
+            threading.Thread(target=self._loop, name="config-watcher", daemon=True).start()
+
+    def stop(self):
+        self._running = False
+
+    def _open_inotify(self):
+        """inotify descriptor watching the config file's directory, or None where there is none."""
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        if libc.inotify_add_watch(fd, os.path.dirname(self.path).encode(), mask) < 0:
+            os.close(fd)
+            return None
+        return fd
+
+    def _names_config(self, buffer):
+        name, offset = os.fsencode(os.path.basename(self.path)), 0
+        while offset + self.EVENT.size <= len(buffer):
+            length = self.EVENT.unpack_from(buffer, offset)[3]
+            start = offset + self.EVENT.size
+            if buffer[start:start + length].rstrip(b"\0") == name:
+                return True
+            offset = start + length
+        return False
+
+    def _stamp(self):
+        try:
+            st = os.stat(self.path)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def _loop(self):
+        fd = self._open_inotify()
+        last = self._stamp()
+        while self._running:
+            if fd is not None:
+                ready, _, _ = select.select([fd], [], [], self.POLL_SECS)
+                if not ready or not self._names_config(os.read(fd, 4096)):
+                    continue
+            else:
+                time.sleep(self.POLL_SECS)
+                stamp = self._stamp()
+                if stamp == last:
+                    continue
+                last = stamp
+            time.sleep(self.SETTLE_SECS)
+            self._read()
+        if fd is not None:
+            os.close(fd)
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                text = f.read()
+        except OSError:
+            return   # mid-replace or deleted; the write that restores it brings another event
+        try:
+            settings = json.loads(text)
+        except json.JSONDecodeError as e:
+            settings = e
+        with self._lock:
+            self._pending = (text, settings)
+
+    def poll(self):
+        """Apply the latest edit, if there is one; called once per frame."""
+        if self._pending is None:
+            return
+        with self._lock:
+            (text, settings), self._pending = self._pending, None
+        digest = hashlib.sha1(text.encode()).hexdigest()
+        if digest in config_digests:
+            return   # this app's own write, or an edit already applied
+        config_digests.append(digest)
+        if isinstance(settings, Exception):
+            print(f"[CONFIG] config.json not applied, keeping the current settings: {settings}")
+            return
+        reload_settings(settings)
+
+
+RESTART_SECTIONS = ('history', 'watchdog', 'metrics', 'display')   # read once at startup
+
+def reload_settings(settings):
+    """Adopt an edited config.json, acting only on the parts that changed. A file with any invalid
+    value is rejected whole and the settings in use are kept."""
+    try:
+        parsed = parse_settings(settings)
+    except (ValueError, TypeError) as e:
+        print(f"[CONFIG] config.json not applied, keeping the current settings: {e}")
+        return
+    before = json.loads(json.dumps(settings_snapshot()))   # a copy: the config dicts are updated in place
+    changed = {name for name in parsed if parsed[name] != before.get(name)}
+    if not changed:
+        return
+    adopt_settings(parsed)
+
+    # Theme and digit colour need nothing here: each view repaints only its widgets that use them
+    if changed & {'background', 'custom_background_path'}:
+        backgrounds.preload(current_background_key)   # decoded off-thread; the old one stays up meanwhile
+    if 'weather' in changed:
+        weather_service.retarget(weather_config)
+    if 'pomodoro' in changed:
+        pomodoro_timer.configure(pomodoro_config)
+    if 'sound' in changed:
+        sound_manager.enabled = sound_config["enabled"]
+        sound_manager.set_gain_percent(sound_config["gain_percent"])
+        if sound_manager.path != sound_config["path"]:
+            sound_manager.set_path(sound_config["path"])
+        for event, path in sound_config["events"].items():
+            if sound_manager.event_paths.get(event) != path:
+                sound_manager.set_event_path(event, path)
+    if 'system' in changed:
+        system_monitor.configure(system_config)
+    if 'character' in changed and 'main' in views.built():
+        views['main'].set_character(current_character)
+    if 'focus_mode' in changed:
+        focus_button.image = focus_icons[is_focus_mode]
+
+    print(f"[CONFIG] applied changes to {', '.join(sorted(changed))}")
+    restart = sorted(changed.intersection(RESTART_SECTIONS))
+    if before['system']['sampler'] != parsed['system']['sampler']:
+        restart.append('system.sampler')
+    if restart:
+        print(f"[CONFIG] changes to {', '.join(restart)} apply after a restart")
+
+config_watcher = ConfigWatcher(CONFIG_FILE, enabled=not HEADLESS)
+
+
+# =================================================================================
+# 6.9 UI HELPERS (icon painters, weather summary, history graph)
 # =================================================================================
 def draw_weather_icon(surface, rect, color=(255,255,255), accent=(255,255,255)):
     """Draws the default cloud icon for the weather button."""
@@ -663,19 +3000,19 @@ def draw_weather_icon(surface, rect, color=(255,255,255), accent=(255,255,255)):
     pygame.draw.circle(icon, color, (int(w*0.35), int(h*0.55)), int(h*0.22))
     pygame.draw.circle(icon, color, (int(w*0.55), int(h*0.50)), int(h*0.27))
     pygame.draw.circle(icon, color, (int(w*0.70), int(h*0.60)), int(h*0.20))
-    pygame.draw.rect(icon, color, (int(w*0.25), int(h*0.60), int(w*0.55), int(h*0.18)), border_radius=8)
+    pygame.draw.rect(icon, color, (int(w*0.25), int(h*0.60), int(w*0.55), int(h*0.18)), border_radius=px(8))
     for x in (0.35, 0.55, 0.75):
-        pygame.draw.line(icon, accent, (int(w*x)-3, int(h*0.82)), (int(w*x), int(h*0.90)), 2)
+        pygame.draw.line(icon, accent, (int(w*x)-px(3), int(h*0.82)), (int(w*x), int(h*0.90)), px(2))
     surface.blit(icon, rect.topleft)
 
 def draw_tomato_icon(surface, rect):
     icon = pygame.Surface(rect.size, pygame.SRCALPHA)
     w, h = rect.size
-    pygame.draw.ellipse(icon, (220, 50, 50), (2, 6, w-4, h-6))
+    pygame.draw.ellipse(icon, (220, 50, 50), (px(2), px(6), w-px(4), h-px(6)))
     cx, cy = w//2, int(h*0.25)
-    pygame.draw.polygon(icon, (40, 160, 70), [(cx, 0), (cx-6, cy), (cx+6, cy)])
-    pygame.draw.polygon(icon, (40, 160, 70), [(cx-6, cy), (cx-12, cy+6), (cx, cy+4)])
-    pygame.draw.polygon(icon, (40, 160, 70), [(cx+6, cy), (cx+12, cy+6), (cx, cy+4)])
+    pygame.draw.polygon(icon, (40, 160, 70), [(cx, 0), (cx-px(6), cy), (cx+px(6), cy)])
+    pygame.draw.polygon(icon, (40, 160, 70), [(cx-px(6), cy), (cx-px(12), cy+px(6)), (cx, cy+px(4))])
+    pygame.draw.polygon(icon, (40, 160, 70), [(cx+px(6), cy), (cx+px(12), cy+px(6)), (cx, cy+px(4))])
     surface.blit(icon, rect.topleft)
 
 # --- NEW: Draw system monitor icon (bar graph) ---
@@ -693,31 +3030,22 @@ def draw_focus_icon(surface, rect, color=(255,255,255), active=False):
     w, h = rect.size
     cx, cy = w//2, h//2
     # Draw eyelid shape
-    pygame.draw.ellipse(icon, color, (int(w*0.1), int(h*0.25), int(w*0.8), int(h*0.5)), 2)
+    pygame.draw.ellipse(icon, color, (int(w*0.1), int(h*0.25), int(w*0.8), int(h*0.5)), px(2))
     # Draw pupil
     pygame.draw.circle(icon, color, (cx, cy), int(h*0.18))
     if active: # Draw line through it
-        pygame.draw.line(icon, (255,100,100), (int(w*0.2), int(h*0.8)), (int(w*0.8), int(h*0.2)), 3)
+        pygame.draw.line(icon, (255,100,100), (int(w*0.2), int(h*0.8)), (int(w*0.8), int(h*0.2)), px(3))
     surface.blit(icon, rect.topleft)
 
 
-def draw_tooltip(surface, text, anchor_rect, font, alpha, bg=(30, 32, 40), fg=(255, 255, 255)):
-    if alpha <= 0: return
-    pad_x, pad_y = 10, 6
-    text_surf = font.render(text, True, fg)
-    w = text_surf.get_width() + pad_x * 2
-    h = text_surf.get_height() + pad_y * 2
-    x = max(8, min(anchor_rect.centerx - w // 2, surface.get_width() - w - 8))
-    y = anchor_rect.bottom + 8
-    tooltip_rect = pygame.Rect(x, y, w, h)
-    bg_surf = pygame.Surface((w, h), pygame.SRCALPHA)
-    pygame.draw.rect(bg_surf, (*bg, int(alpha)), bg_surf.get_rect(), border_radius=8)
-    surface.blit(bg_surf, tooltip_rect.topleft)
-    surface.blit(text_surf, (tooltip_rect.x + pad_x, tooltip_rect.y + pad_y))
-
-def draw_weather_summary_inline(surface, pos, fonts, theme_color):
+def paint_icon(painter, rect, **kwargs):
+    """Run one of the draw_*_icon painters once into an icon-sized surface."""
+    icon = pygame.Surface(rect.size, pygame.SRCALPHA)
+    painter(icon, icon.get_rect(), **kwargs)
+    return icon
+
+def draw_weather_summary_inline(surface, pos, fonts, theme_color, snap):
     font_small, font_tiny = fonts
-    snap = weather_service.get_snapshot()
     x, y = pos
     if not snap.get("ok"):
         txt = snap.get("reason", "Weather loading…")
@@ -752,7 +3080,7 @@ def draw_simple_weather_icon(surface, rect, code, is_day):
                 y1 = cy + math.sin(angle) * h * 0.35
                 x2 = cx + math.cos(angle) * h * 0.45
                 y2 = cy + math.sin(angle) * h * 0.45
-                pygame.draw.line(icon, SUN, (x1, y1), (x2, y2), 3)
+                pygame.draw.line(icon, SUN, (x1, y1), (x2, y2), px(3))
         else: # Moon
             pygame.draw.circle(icon, MOON, (cx, cy), int(h*0.3))
             pygame.draw.circle(icon, (0,0,0,0), (cx+int(w*0.1), cy-int(h*0.05)), int(h*0.25))
@@ -762,7 +3090,7 @@ def draw_simple_weather_icon(surface, rect, code, is_day):
         pygame.draw.circle(icon, CLOUD, (int(cx*0.7), int(cy*1.1)), int(h*0.25))
         pygame.draw.circle(icon, CLOUD, (cx, int(cy*0.9)), int(h*0.3))
         pygame.draw.circle(icon, CLOUD, (int(cx*1.3), int(cy*1.15)), int(h*0.22))
-        pygame.draw.rect(icon, CLOUD, (int(w*0.2), int(h*0.6), int(w*0.6), int(h*0.2)), border_radius=8)
+        pygame.draw.rect(icon, CLOUD, (int(w*0.2), int(h*0.6), int(w*0.6), int(h*0.2)), border_radius=px(8))
 
     # Rain/Snow/Sleet (1063, 1066, 1072, 1150, 1153, 1168, 1171, 1180, 1183, 1186, 1189, 1192, 1195, 1198, 1201, 1204, 1207, 1240, 1243, 1246, 1249, 1252)
     elif code >= 1063:
@@ -772,356 +3100,1917 @@ def draw_simple_weather_icon(surface, rect, code, is_day):
         pygame.draw.circle(icon, (180,180,185), (int(cx*1.3), int(cy*0.85)), int(h*0.22))
         # Rain drops
         for x in (0.35, 0.55, 0.75):
-            pygame.draw.line(icon, RAIN, (int(w*x)-3, int(h*0.82)), (int(w*x), int(h*0.95)), 3)
+            pygame.draw.line(icon, RAIN, (int(w*x)-px(3), int(h*0.82)), (int(w*x), int(h*0.95)), px(3))
             
     # Default (Mist/Fog/etc)
     else:
-        pygame.draw.line(icon, CLOUD, (int(w*0.2), int(h*0.4)), (int(w*0.8), int(h*0.4)), 3)
-        pygame.draw.line(icon, CLOUD, (int(w*0.2), int(h*0.6)), (int(w*0.8), int(h*0.6)), 3)
-        pygame.draw.line(icon, CLOUD, (int(w*0.2), int(h*0.8)), (int(w*0.8), int(h*0.8)), 3)
+        pygame.draw.line(icon, CLOUD, (int(w*0.2), int(h*0.4)), (int(w*0.8), int(h*0.4)), px(3))
+        pygame.draw.line(icon, CLOUD, (int(w*0.2), int(h*0.6)), (int(w*0.8), int(h*0.6)), px(3))
+        pygame.draw.line(icon, CLOUD, (int(w*0.2), int(h*0.8)), (int(w*0.8), int(h*0.8)), px(3))
         
     surface.blit(icon, rect.topleft)
 
 
-def draw_weather_view(surface, theme_color, digit_color, fonts):
-    """Full-screen weather card."""
-    font_small, font_tiny, font_regular, font_bold, font_weather_big = fonts
-    panel = pygame.Rect(24, 70, WIDTH-48, HEIGHT-110)
-    pygame.draw.rect(surface, (35,37,45,210), panel, border_radius=16)
-    pygame.draw.rect(surface, theme_color, panel, 2, border_radius=16)
-
-    pad = 20
-    x = panel.x + pad
-    y = panel.y + pad
+def draw_history_graph(surface, rect, rows, span, value_index, color, font, end=None):
+    """Min/max band plus average line for one metric; x is time (ending at `end`), y is 0–100%."""
+    pygame.draw.rect(surface, (55,57,68), rect, border_radius=px(8))
+    pygame.draw.rect(surface, color, rect, px(2), border_radius=px(8))
+    if not rows:
+        msg = font.render("No history yet", True, (200,200,200))
+        surface.blit(msg, msg.get_rect(center=rect.center))
+        return
+    inner = rect.inflate(-px(12), -px(12))
+    if end is None:
+        end = time.time()
+    def to_xy(ts, pct):
+        tx = inner.x + (1.0 - (end - ts) / span) * inner.width
+        ty = inner.bottom - max(0.0, min(100.0, pct)) / 100.0 * inner.height
+        return int(max(inner.x, min(inner.right, tx))), int(ty)
+    band_color = tuple(c // 2 for c in color)
+    avg_points = []
+    for row in rows:
+        lo_pt = to_xy(row[0], row[value_index])
+        hi_pt = to_xy(row[0], row[value_index + 1])
+        pygame.draw.line(surface, band_color, lo_pt, hi_pt, px(3))
+        avg_points.append(to_xy(row[0], row[value_index + 2]))
+    if len(avg_points) > 1:
+        pygame.draw.lines(surface, color, False, avg_points, px(2))
+    else:
+        pygame.draw.circle(surface, color, avg_points[0], px(3))
 
-    # Header
-    draw_text_with_shadow(surface, "Weather", font_regular, (255,255,255), (x, y))
-    y += 50
 
-    snap = weather_service.get_snapshot()
-    if not snap.get("ok"):
-        surface.blit(font_small.render(snap.get("reason","Weather unavailable"), True, (230,230,230)), (x, y))
-        return
+# =================================================================================
+# 6.91 RETAINED WIDGETS (cached surfaces, invalidation, tree hit-testing)
+# =================================================================================
+def ui_color(color):
+    """Resolve the symbolic colours 'theme' and 'digit' against the current settings."""
+    if color == "theme": return current_theme_color
+    if color == "digit": return current_digit_color
+    return color
+
+
+class GlyphAtlas:
+    """Glyphs of one font in one colour, rendered once, with the font's advances and pair kerning.
+    Text drawn from a small fixed set of characters (the clock) is then composed by blitting.
+    Characters outside the preloaded set are rendered the first time they are asked for."""
+    CLOCK_CHARS = "0123456789:APM"
+    hits = misses = 0   # glyph lookups across all atlases
+
+    def __init__(self, font, color, chars=CLOCK_CHARS):
+        self.font, self.color = font, color
+        self._glyphs, self._advances, self._kerning = {}, {}, {}
+        for ch in chars:
+            self.glyph(ch)
+
+    def glyph(self, ch):
+        surface = self._glyphs.get(ch)
+        if surface is None:
+            GlyphAtlas.misses += 1
+            surface = self._glyphs[ch] = self.font.render(ch, True, self.color)
+            self._advances[ch] = self.font.size(ch)[0]
+        else:
+            GlyphAtlas.hits += 1
+        return surface
+
+    def kerning(self, a, b):
+        pair = a + b
+        if pair not in self._kerning:
+            self.glyph(a); self.glyph(b)
+            self._kerning[pair] = self.font.size(pair)[0] - self._advances[a] - self._advances[b]
+        return self._kerning[pair]
+
+    def layout(self, text):
+        """x offset of every character, and the width of the whole string."""
+        offsets, x = [], 0
+        for i, ch in enumerate(text):
+            self.glyph(ch)
+            offsets.append(x)
+            x += self._advances[ch] + (self.kerning(ch, text[i + 1]) if i + 1 < len(text) else 0)
+        return offsets, x
+
+_glyph_atlases = {}
+
+def glyph_atlas(font, color):
+    """Shared atlas per (font, colour); a font object already fixes face and size."""
+    key = (font, tuple(color))
+    if key not in _glyph_atlases:
+        _glyph_atlases[key] = GlyphAtlas(font, color)
+    return _glyph_atlases[key]
+
+
+class Widget:
+    """Node of the retained UI tree.
+
+    A widget paints itself into a cached surface the size of its rect and blits that cache every
+    frame; paint() runs again only after invalidate(). set() invalidates only when a value really
+    changes, so views can push model state into their widgets every frame at no cost.
+    """
+    repaints = 0        # cache repaints since start, across all widgets
+    cache_hits = 0      # draws that blitted a cache without repainting it
+    cached = True       # False for containers and widgets that draw straight onto the target
+    scrollable = False
+    palette = ()        # attributes that may hold a symbolic colour ('theme' / 'digit')
+    look = frozenset()  # look parts paint() reads straight from the settings
+
+    def __init__(self, rect=(0, 0, 0, 0), on_click=None):
+        self.rect = pygame.Rect(rect)
+        self.on_click = on_click
+        self.children = []
+        self.visible = True
+        self.enabled = True
+        self.alpha = 255
+        self._cache = None
+        self._dirty = True
+
+    def add(self, widget):
+        self.children.append(widget)
+        return widget
+
+    def invalidate(self):
+        self._dirty = True
+
+    def invalidate_all(self):
+        self._dirty = True
+        for child in self.children:
+            child.invalidate_all()
+
+    def invalidate_look(self, changed):
+        """Repaint only the widgets whose pixels depend on one of the changed look parts."""
+        if changed & (self.look | {getattr(self, name) for name in self.palette}):
+            self._dirty = True
+        for child in self.children:
+            child.invalidate_look(changed)
+
+    def set(self, **state):
+        """Assign attributes; re-layout and repaint only if one of them actually changed."""
+        changed = False
+        for name, value in state.items():
+            if getattr(self, name) != value:
+                setattr(self, name, value)
+                changed = True
+        if changed:
+            self.layout()
+            self.invalidate()
+        return changed
+
+    def layout(self):
+        """Recompute rect and sub-rects from the current state."""
+
+    def paint(self, surface):
+        """Draw into the cache; (0, 0) is self.rect.topleft."""
+
+    def repaint(self, cache):
+        """Bring an invalidated cache up to date: clear it and paint everything."""
+        cache.fill((0, 0, 0, 0))
+        self.paint(cache)
+
+    def update(self, now, mouse):
+        """Per-frame hook for animations; call invalidate() (or set()) when the look changes."""
+
+    def update_tree(self, now, mouse):
+        if not self.visible:
+            return
+        self.update(now, mouse)
+        for child in self.children:
+            child.update_tree(now, mouse)
 
-    # --- MODIFIED: Added dynamic icon ---
-    icon_rect = pygame.Rect(panel.right - 130 - pad, panel.y + pad + 50, 130, 130)
-    draw_simple_weather_icon(surface, icon_rect, snap.get("condition_code"), snap.get("is_day", 1))
-
-    # Big temperature
-    temp = snap.get("temp"); unit = snap.get("temp_unit","°C")
-    if temp is not None:
-        big = font_weather_big.render(f"{round(temp)}{unit}", True, digit_color)
-        surface.blit(big, (x, y))
-        y += big.get_height() + 8
-
-    # Condition
-    cond = snap.get("condition","")
-    if cond:
-        surface.blit(font_small.render(cond, True, (225,225,225)), (x, y))
-        y += 30
-
-    # Details row
-    feels = snap.get("feels"); hum = snap.get("humidity")
-    wind = snap.get("wind"); wind_u = snap.get("wind_unit","kph")
-    high = snap.get("high"); low = snap.get("low"); pop = snap.get("pop_today")
-    bits = []
-    if feels is not None: bits.append(f"Feels {round(feels)}{unit}")
-    if hum is not None:   bits.append(f"Humidity {hum}%")
-    if wind is not None:  bits.append(f"Wind {round(wind)} {wind_u}")
-    if high is not None and low is not None: bits.append(f"Today H {round(high)} / L {round(low)}{unit}")
-    if pop is not None: bits.append(f"Rain {pop}%")
-    info = "  •  ".join(bits)
-    surface.blit(font_small.render(info, True, (210,210,210)), (x, y))
-
-    # Mini forecast (bottom area)
-    mini = snap.get("mini", [])
-    col_w = (panel.width - 2*pad)//3
-    bottom_y = panel.bottom - 120
-    surface.blit(font_small.render("Next 3 days", True, (230,230,230)), (x, bottom_y - 28))
-    for i, d in enumerate(mini[:3]):
-        cx = x + i*col_w; dy = bottom_y
-        date_str = d.get("date","")
-        try: mmdd = date_str[5:7] + "/" + date_str[8:10]
-        except: mmdd = date_str
-        surface.blit(font_small.render(mmdd, True, (230,230,230)), (cx, dy)); dy += 26
-        
-        # --- NEW: Mini icon ---
-        mini_icon_rect = pygame.Rect(cx + 60, dy - 20, 40, 40)
-        draw_simple_weather_icon(surface, mini_icon_rect, d.get("cond_code"), True) # Assume day for forecast
-        
-        hi, lo = d.get("high"), d.get("low")
-        if hi is not None and lo is not None:
-            surface.blit(font_tiny.render(f"{round(hi)}/{round(lo)}{unit}", True, (210,210,210)), (cx, dy)); dy += 20
-        popd = d.get("pop")
-        if popd is not None:
-            surface.blit(font_tiny.render(f"Rain {popd}%", True, (200,200,200)), (cx, dy)); dy += 18
-        cond2 = d.get("cond","")
-        if cond2: surface.blit(font_tiny.render(cond2, True, (190,190,190)), (cx, dy))
-
-
-# --- Pomodoro buttons/adjust state ---
-pomo_buttons = {}
-pomo_adjust_buttons = {}
-pomo_sliders = {}
-pomo_active_slider = None
-pomo_sliders_initialized = False
-
-# --- Slider class for Adjust view ---
-class Slider:
-    def __init__(self, rect, min_val, max_val, value, step=1, unit="min"):
-        self.track_rect = pygame.Rect(rect)
+    def draw(self, target):
+        if not self.visible:
+            return
+        if self.cached and self.rect.width > 0 and self.rect.height > 0:
+            if self._cache is None or self._cache.get_size() != self.rect.size:
+                self._cache = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+                self._dirty = True
+            if self._dirty:
+                self.repaint(self._cache)
+                self._dirty = False
+                Widget.repaints += 1
+            else:
+                Widget.cache_hits += 1
+            self._cache.set_alpha(self.alpha)
+            self.blit_cache(target)
+        for child in self.children:
+            child.draw(target)
+
+    def blit_cache(self, target):
+        target.blit(self._cache, self.rect)
+
+    # --- Hit-testing walks the tree front to back ---
+    def find(self, pos, test):
+        """Front-most visible widget under pos for which test(widget, pos) holds."""
+        if not self.visible:
+            return None
+        for child in reversed(self.children):
+            found = child.find(pos, test)
+            if found is not None:
+                return found
+        return self if test(self, pos) else None
+
+    def accepts(self, pos):
+        return self.enabled and self.on_click is not None and self.rect.collidepoint(pos)
+
+    def hit(self, pos):
+        return self.find(pos, lambda widget, p: widget.accepts(p))
+
+    def press(self, pos):
+        self.on_click()
+
+    def drag(self, pos):
+        pass
+
+    def release(self):
+        pass
+
+    def scroll(self, dy):
+        return False
+
+
+class Label(Widget):
+    """One line of text placed by anchor ('topleft', 'center', 'midleft', ...), optionally with the drop shadow."""
+    palette = ("color",)
+
+    def __init__(self, pos, text, font, color=(255,255,255), anchor="topleft", shadow=False):
+        super().__init__()
+        self.pos, self.text, self.font, self.color = pos, text, font, color
+        self.anchor, self.shadow = anchor, shadow
+        self.layout()
+
+    def layout(self):
+        self.text_rect = pygame.Rect((0, 0), self.font.size(self.text))
+        setattr(self.text_rect, self.anchor, self.pos)
+        extra = px(3) if self.shadow else 0
+        self.rect = pygame.Rect(self.text_rect.topleft, (self.text_rect.width + extra, self.text_rect.height + extra))
+
+    def paint(self, surface):
+        if self.shadow:
+            draw_text_with_shadow(surface, self.text, self.font, ui_color(self.color), (0, 0))
+        else:
+            surface.blit(self.font.render(self.text, True, ui_color(self.color)), (0, 0))
+
+
+class GlyphText(Widget):
+    """Label composed from a GlyphAtlas. When the text changes but the layout does not (a new
+    minute, the next second) only the cells of the characters that changed are cleared and
+    blitted again; the rest of the cache is left alone."""
+    palette = ("color",)
+
+    def __init__(self, pos, text, font, color=(255,255,255), anchor="topleft", shadow=False):
+        super().__init__()
+        self.pos, self.text, self.font, self.color = pos, text, font, color
+        self.anchor, self.shadow = anchor, shadow
+        self._painted = None    # (cache, atlas, text, offsets) of the last repaint
+        self.layout()
+
+    def layout(self):
+        self.offsets, width = glyph_atlas(self.font, (0, 0, 0)).layout(self.text)  # advances are the same in any colour
+        self.text_rect = pygame.Rect((0, 0), (width, self.font.get_height()))
+        setattr(self.text_rect, self.anchor, self.pos)
+        extra = px(3) if self.shadow else 0
+        self.rect = pygame.Rect(self.text_rect.topleft, (self.text_rect.width + extra, self.text_rect.height + extra))
+
+    def _blit_text(self, surface, atlas):
+        if self.shadow:
+            shade = glyph_atlas(self.font, (0, 0, 0))
+            for ch, x in zip(self.text, self.offsets):
+                surface.blit(shade.glyph(ch), (x + px(3), px(3)))
+        for ch, x in zip(self.text, self.offsets):
+            surface.blit(atlas.glyph(ch), (x, 0))
+
+    def repaint(self, cache):
+        atlas = glyph_atlas(self.font, ui_color(self.color))
+        previous = self._painted
+        self._painted = (cache, atlas, self.text, self.offsets)
+        if previous is None or previous[:2] != (cache, atlas) or previous[3] != self.offsets:
+            cache.fill((0, 0, 0, 0))
+            self._blit_text(cache, atlas)
+            return
+        extra = px(3) if self.shadow else 0
+        for old, new, x in zip(previous[2], self.text, self.offsets):
+            if old == new:
+                continue
+            width = max(atlas.glyph(old).get_width(), atlas.glyph(new).get_width()) + extra
+            cell = pygame.Rect(x, 0, width, cache.get_height())
+            # Neighbouring glyphs may overhang the cell, so everything is redrawn clipped to it
+            cache.set_clip(cell)
+            cache.fill((0, 0, 0, 0))
+            self._blit_text(cache, atlas)
+            cache.set_clip(None)
+
+
+class Box(Widget):
+    """Rounded panel. Drawn straight onto the target rather than cached: pygame.draw writes a
+    translucent fill over the pixels below, which blitting a cache would blend instead."""
+    cached = False
+
+    def __init__(self, rect, fill=None, border=None, radius=0):
+        super().__init__(rect)
+        self.fill, self.border, self.radius = fill, border, radius
+
+    def draw(self, target):
+        if not self.visible:
+            return
+        if self.fill is not None:
+            pygame.draw.rect(target, ui_color(self.fill), self.rect, border_radius=self.radius)
+        if self.border is not None:
+            pygame.draw.rect(target, ui_color(self.border), self.rect, px(2), border_radius=self.radius)
+        super().draw(target)
+
+
+class Button(Widget):
+    """Rounded push button. selected=True is the filled theme look (primary and active buttons);
+    a disabled button is greyed out and skipped by hit-testing."""
+    look = frozenset({"theme"})
+
+    def __init__(self, rect, text, font, on_click, radius=None, selected=False):
+        super().__init__(rect, on_click)
+        self.text, self.font, self.selected = text, font, selected
+        self.radius = px(10) if radius is None else radius
+
+    def paint(self, surface):
+        r = surface.get_rect()
+        if self.selected:
+            pygame.draw.rect(surface, current_theme_color, r, border_radius=self.radius)
+            text_color = (20,20,24)
+        else:
+            pygame.draw.rect(surface, (55,57,68), r, border_radius=self.radius)
+            text_color = (240,240,240) if self.enabled else (130,130,140)
+        pygame.draw.rect(surface, current_theme_color if self.enabled else (90,90,100), r, px(2), border_radius=self.radius)
+        label = self.font.render(self.text, True, text_color)
+        surface.blit(label, label.get_rect(center=r.center))
+
+
+class PlusButton(Widget):
+    """Outlined tile with a '+' (add a background, open the sound settings)."""
+    def paint(self, surface):
+        r = surface.get_rect()
+        pygame.draw.rect(surface, (255,255,255), r, px(2), border_radius=px(8))
+        pygame.draw.line(surface, (255,255,255), (r.centerx - px(15), r.centery), (r.centerx + px(15), r.centery), px(3))
+        pygame.draw.line(surface, (255,255,255), (r.centerx, r.centery - px(15)), (r.centerx, r.centery + px(15)), px(3))
+
+
+class Swatch(Widget):
+    """Colour or background choice: shrinks when clicked and eases back over FEEDBACK_MS,
+    outlined while selected. Background previews are scaled once, not every frame."""
+    FEEDBACK_MS = 200
+    palette = ("outline",)
+
+    def __init__(self, rect, on_click, fill=None, image=None, label=None, font=None, label_color=(255,255,255),
+                 press_scale=0.8, outline=(255,255,255), outline_radius=None):
+        super().__init__(rect, on_click)
+        self.fill, self.image = fill, image
+        self.label, self.font, self.label_color = label, font, label_color
+        self.press_scale, self.outline = press_scale, outline
+        self.outline_radius = px(8) if outline_radius is None else outline_radius
+        self.preview = image if image is None or image.get_size() == self.rect.size else \
+            pygame.transform.scale(image, self.rect.size)
+        self.selected = False
+        self.scale = 1.0
+        self._pressed_at = None
+        self._pressed = False
+
+    def press(self, pos):
+        self._pressed = True    # the feedback starts on the next frame's clock
+        self.on_click()
+
+    def update(self, now, mouse):
+        if self._pressed:
+            self._pressed, self._pressed_at = False, now
+        if self._pressed_at is None:
+            return
+        elapsed = max(0, now - self._pressed_at)
+        if elapsed < self.FEEDBACK_MS:
+            scale = self.press_scale + ease_out_quad(elapsed / self.FEEDBACK_MS) * (1 - self.press_scale)
+        else:
+            scale, self._pressed_at = 1.0, None
+        self.set(scale=scale)
+
+    def paint(self, surface):
+        r = surface.get_rect()
+        inner = r.inflate((r.width*self.scale)-r.width, (r.height*self.scale)-r.height)
+        if self.image is not None:
+            preview = self.preview if inner.size == r.size else pygame.transform.scale(self.image, inner.size)
+            surface.blit(preview, inner)
+        else:
+            pygame.draw.rect(surface, self.fill, inner, border_radius=px(8))
+        if self.selected:
+            pygame.draw.rect(surface, ui_color(self.outline), r, px(2), border_radius=self.outline_radius)
+        if self.label:
+            text = self.font.render(self.label, True, self.label_color)
+            surface.blit(text, text.get_rect(center=r.center))
+
+
+class Canvas(Widget):
+    """Widget drawn by painter(surface, state). The view pushes a state key with set(state=...)
+    and the cache is repainted only when that key changes."""
+    look = frozenset({"theme", "digit"})   # painters read the colours straight from the settings
+
+    def __init__(self, rect, painter, on_click=None):
+        super().__init__(rect, on_click)
+        self.painter = painter
+        self.state = None
+
+    def paint(self, surface):
+        self.painter(surface, self.state)
+
+
+class Card(Canvas):
+    """Translucent rounded panel and everything painted on it, as one cache. Blitting would blend the
+    panel with the background below, so the panel's pixels are put in place of the target's instead:
+    the same result as drawing a Box straight onto the target and the content over it."""
+    def __init__(self, rect, painter, fill=(35,37,45,210), border="theme", radius=None):
+        super().__init__(rect, painter)
+        self.fill, self.border = fill, border
+        self.radius = px(16) if radius is None else radius
+        self._punch = None
+
+    def paint(self, surface):
+        r = surface.get_rect()
+        pygame.draw.rect(surface, self.fill, r, border_radius=self.radius)
+        pygame.draw.rect(surface, ui_color(self.border), r, px(2), border_radius=self.radius)
+        self.painter(surface, self.state)
+
+    def blit_cache(self, target):
+        if self._punch is None or self._punch.get_size() != self.rect.size:
+            # Zero inside the panel's shape, identity outside it (the rounded corners)
+            self._punch = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+            self._punch.fill((255, 255, 255, 255))
+            pygame.draw.rect(self._punch, (0, 0, 0, 0), self._punch.get_rect(), border_radius=self.radius)
+        target.blit(self._punch, self.rect, special_flags=pygame.BLEND_RGBA_MULT)
+        target.blit(self._cache, self.rect, special_flags=pygame.BLEND_RGBA_ADD)
+
+
+class Slider(Widget):
+    """Labelled track with a draggable handle; the value snaps to step."""
+    look = frozenset({"theme"})
+
+    def __init__(self, track_rect, label, font, min_val, max_val, value, step=1, unit="min"):
+        super().__init__()
+        self.track_rect = pygame.Rect(track_rect)
+        self.label, self.font = label, font
         self.min = min_val; self.max = max_val; self.step = step
-        self.value = max(self.min, min(self.max, value))
         self.unit = unit
-        self.handle_radius = 9
-        self.dragging = False
-        self.handle_rect = pygame.Rect(0,0,self.handle_radius*2,self.handle_radius*2)
-        self._reposition_handle()
+        self.handle_radius = px(9)
+        self.value = max(self.min, min(self.max, value))
+        self.layout()
 
-    def _reposition_handle(self):
+    def layout(self):
         t = (self.value - self.min) / (self.max - self.min)
-        hx = int(self.track_rect.x + t * self.track_rect.width)
-        self.handle_rect.center = (hx, self.track_rect.centery)
+        r = self.handle_radius
+        self.handle_rect = pygame.Rect(0, 0, r*2, r*2)
+        self.handle_rect.center = (int(self.track_rect.x + t * self.track_rect.width), self.track_rect.centery)
+        top = self.track_rect.y - px(28)
+        value_right = self.track_rect.right - px(120) + self.font.size(self.value_text())[0]
+        self.rect = pygame.Rect(self.track_rect.x - r, top, 0, 0)
+        self.rect.width = max(self.track_rect.right + r, value_right) - self.rect.x
+        self.rect.height = max(self.handle_rect.bottom, top + self.font.get_height()) - top
+
+    def value_text(self):
+        return f"{int(self.value)} {self.unit}"
+
+    def accepts(self, pos):
+        return self.enabled and (self.track_rect.collidepoint(pos) or self.handle_rect.collidepoint(pos))
 
     def set_from_pos(self, x):
         t = (x - self.track_rect.x) / self.track_rect.width
         t = max(0.0, min(1.0, t))
         value = self.min + t*(self.max - self.min)
         value = round(value / self.step) * self.step
-        self.value = max(self.min, min(self.max, value))
-        self._reposition_handle()
-
-    def draw(self, surface, label, font, theme_color, value_color=(235,235,235)):
-        pygame.draw.rect(surface, (70,72,84), self.track_rect, border_radius=6)
-        pygame.draw.rect(surface, theme_color, self.track_rect, 2, border_radius=6)
-        pygame.draw.circle(surface, theme_color, self.handle_rect.center, self.handle_radius)
-        surface.blit(font.render(label, True, (230,230,230)), (self.track_rect.x, self.track_rect.y - 28))
-        surface.blit(font.render(f"{int(self.value)} {self.unit}", True, value_color),
-                     (self.track_rect.right - 120, self.track_rect.y - 28))
-
-def init_pomo_sliders():
-    global pomo_sliders, pomo_sliders_initialized
-    pomo_sliders = {}
-    padx, start_y = 60, 150
-    width = WIDTH - 2*padx
-    gap = 70
-    pomo_sliders["focus"] = Slider(pygame.Rect(padx, start_y, width, 6), 1, 180, pomodoro_config["focus_minutes"], 1, "min")
-    pomo_sliders["short"] = Slider(pygame.Rect(padx, start_y+gap, width, 6), 1, 180, pomodoro_config["short_break_minutes"], 1, "min")
-    pomo_sliders["long"]  = Slider(pygame.Rect(padx, start_y+gap*2, width, 6), 1, 180, pomodoro_config["long_break_minutes"], 1, "min")
-    pomo_sliders["sessions"] = Slider(pygame.Rect(padx, start_y+gap*3, width, 6), 1, 10, pomodoro_config["sessions_before_long"], 1, "sessions")
-    # Volume 0–200%
-    initial_gain = int(sound_config.get("gain_percent", 100))
-    pomo_sliders["volume"] = Slider(pygame.Rect(padx, start_y+gap*4, width, 6), 0, 200, initial_gain, 5, "%")
-    pomo_sliders_initialized = True
-
-
-def draw_pomodoro_view(surface, theme_color, digit_color, fonts):
-    """Pomodoro screen with dynamic ring sizing so time always fits."""
-    font_small, font_tiny, font_regular, font_pomo_big = fonts
-
-    panel = pygame.Rect(24, 70, WIDTH-48, HEIGHT-110)
-    pygame.draw.rect(surface, (35,37,45,210), panel, border_radius=16)
-    pygame.draw.rect(surface, theme_color, panel, 2, border_radius=16)
-
-    pad = 20
-    x = panel.x + pad; y = panel.y + pad
-
-    # Mode label on the left
-    mode_map = {'focus': 'Focus', 'short_break': 'Break', 'long_break': 'Long Break'}
-    draw_text_with_shadow(surface, f"{mode_map.get(pomodoro_timer.mode, 'Focus')}",
-                          font_regular, (255,255,255), (x, y))
-
-    # Adjust button on the right
-    adjust_rect = pygame.Rect(panel.right - 140, y, 120, 32)
-    pygame.draw.rect(surface, theme_color, adjust_rect, border_radius=10)
-    surface.blit(font_tiny.render("Adjust", True, (20,20,24)), (adjust_rect.x + 28, adjust_rect.y + 7))
-    pomo_buttons['adjust'] = adjust_rect
-    y += 54
-
-    # ---------- Fit timer inside ring ----------
-    ring_thickness = 12
-    timer_text = pomodoro_timer.format_mmss()
-
-    # Max outer diameter allowed by layout (leave space for controls below)
-    max_d = min(panel.width - 2*pad, panel.height - 220)
-    max_d = max(220, max_d)
-
-    base_size = 110
-    timer_font = pygame.font.Font(FONT_BOLD_PATH, base_size)
-    t_w, t_h = timer_font.size(timer_text)
-
-    inner_pad = 42
-    needed_inner = max(t_w, t_h) + inner_pad
-    needed_outer = needed_inner + 2*ring_thickness
-
-    if needed_outer <= max_d:
-        diameter = int(min(max_d, needed_outer))
-    else:
-        inner_target = max_d - 2*ring_thickness
-        scale = inner_target / max(1, needed_inner)
-        new_size = max(40, int(base_size * scale))
-        timer_font = pygame.font.Font(FONT_BOLD_PATH, new_size)
+        self.set(value=max(self.min, min(self.max, value)))
+
+    def press(self, pos):
+        self.set_from_pos(pos[0])
+
+    def drag(self, pos):
+        self.set_from_pos(pos[0])
+
+    def paint(self, surface):
+        track = self.track_rect.move(-self.rect.x, -self.rect.y)
+        pygame.draw.rect(surface, (70,72,84), track, border_radius=px(6))
+        pygame.draw.rect(surface, current_theme_color, track, px(2), border_radius=px(6))
+        pygame.draw.circle(surface, current_theme_color, self.handle_rect.move(-self.rect.x, -self.rect.y).center, self.handle_radius)
+        surface.blit(self.font.render(self.label, True, (230,230,230)), (track.x, track.y - px(28)))
+        surface.blit(self.font.render(self.value_text(), True, (235,235,235)), (track.right - px(120), track.y - px(28)))
+
+
+class TaskList(Widget):
+    """Scrollable to-do list: header, rows (struck through when done) each with a delete icon, scrollbar."""
+    scrollable = True
+    look = frozenset({"theme"})
+    ROW_HEIGHT = 30
+
+    def __init__(self, rect, max_rows, font, header_font, on_toggle, on_delete):
+        super().__init__(rect)
+        self.max_rows = max_rows
+        self.font, self.header_font = font, header_font
+        self.on_toggle, self.on_delete = on_toggle, on_delete
+        self.rows = ()      # (id, text, completed) of the rows on screen
+        self.total = 0
+        self.offset = 0
+        self.layout()
+
+    def layout(self):
+        self._rows = []     # (text rect, delete rect) in local coordinates
+        self._hits = []     # (screen rect, task id, is delete icon)
+        y = px(40)
+        for task_id, text, completed in self.rows:
+            text_rect = pygame.Rect((px(10), y), self.font.size(text))
+            delete_rect = delete_task_icon.get_rect(midleft=(text_rect.right + px(10), text_rect.centery))
+            self._rows.append((text_rect, delete_rect))
+            self._hits.append((text_rect.move(self.rect.topleft), task_id, False))
+            self._hits.append((delete_rect.move(self.rect.topleft), task_id, True))
+            y += px(self.ROW_HEIGHT)
+
+    def accepts(self, pos):
+        return self.enabled and any(r.collidepoint(pos) for r, _, _ in self._hits)
+
+    def press(self, pos):
+        for r, task_id, is_delete in self._hits:
+            if r.collidepoint(pos):
+                (self.on_delete if is_delete else self.on_toggle)(task_id)
+                return
+
+    def scroll(self, dy):
+        step = -1 if dy > 0 else 1 if dy < 0 else 0
+        self.set(offset=max(0, min(max(0, self.total - self.max_rows), self.offset + step)))
+        return True
+
+    def paint(self, surface):
+        draw_text_with_shadow(surface, "To-Do List", self.header_font, (220,220,220), (px(10), 0))
+        for (task_id, text, completed), (text_rect, delete_rect) in zip(self.rows, self._rows):
+            color = (150,150,150) if completed else (255,255,255)
+            surface.blit(self.font.render(text, True, color), text_rect)
+            if completed:
+                pygame.draw.line(surface, color, (text_rect.left, text_rect.centery),
+                                 (text_rect.right, text_rect.centery), px(1))
+            surface.blit(delete_task_icon, delete_rect)
+
+        if self.total > self.max_rows:
+            track_h = self.rect.height - px(40)
+            track_rect = pygame.Rect(self.rect.width - px(12), px(40), px(8), track_h)
+            pygame.draw.rect(surface, (60,60,60), track_rect, border_radius=px(4))
+            thumb_h = max(px(20), (self.max_rows / self.total) * track_h)
+            thumb_y = track_rect.y + self.offset / (self.total - self.max_rows) * (track_h - thumb_h)
+            pygame.draw.rect(surface, current_theme_color, pygame.Rect(track_rect.x, thumb_y, px(8), thumb_h), border_radius=px(4))
+
+
+class TextInput(Widget):
+    """Single-line text box with a blinking caret; Enter calls on_submit(text)."""
+    def __init__(self, rect, font, on_submit):
+        super().__init__(rect, on_click=lambda: None)   # clicks inside the box are just swallowed
+        self.font, self.on_submit = font, on_submit
+        self.text = ""
+        self.caret = False
+
+    def update(self, now, mouse):
+        self.set(caret=now % 1000 < 500)
+
+    def key(self, event):
+        if event.key == pygame.K_RETURN:
+            self.on_submit()
+        elif event.key == pygame.K_BACKSPACE:
+            self.set(text=self.text[:-1])
+        elif self.font.size(self.text + event.unicode)[0] < self.rect.width - px(20):
+            self.set(text=self.text + event.unicode)
+
+    def paint(self, surface):
+        r = surface.get_rect()
+        pygame.draw.rect(surface, (60,60,60), r, border_radius=px(8))
+        pygame.draw.rect(surface, (100,100,100), r, px(2), border_radius=px(8))
+        text = self.font.render(self.text, True, (255,255,255))
+        surface.blit(text, (px(10), px(10)))
+        if self.caret:
+            cx = px(10) + text.get_width()
+            pygame.draw.line(surface, (255,255,255), (cx, px(10)), (cx, r.height - px(10)), px(2))
+
+
+class ChibiWidget(Widget):
+    """Hosts the SpriteAnimator. The sprite sheet already holds every frame, so nothing is cached here."""
+    cached = False
+
+    def __init__(self, animator):
+        super().__init__(animator.rect, on_click=self._poke)
+        self.animator = animator
+        self._poked = False
+
+    def _poke(self):
+        self._poked = True
+
+    def update(self, now, mouse):
+        if self._poked:
+            self._poked = False
+            self.animator.poke(now)
+        self.animator.update(now)
+        self.rect = self.animator.rect
+
+    def draw(self, target):
+        if self.visible:
+            self.animator.draw(target)
+
+
+class IconButton(Widget):
+    """Top-bar button with its own fading tooltip. Animated icons grow and tilt while hovered;
+    the rotozoomed copy is remade only while the hover easing is still moving."""
+    cached = False
+
+    def __init__(self, rect, image, on_click, tip, animated=True):
+        super().__init__(rect, on_click)
+        self.image, self.animated = image, animated
+        self.hover = False
+        self.scale, self.angle, self.tip_alpha = 1.0, 0.0, 0.0
+        self._icon_key, self._icon = None, None
+        self._tip_text = font_tiny.render(tip, True, (255,255,255))
+        self._tip_key, self._tip_bg = None, None
+
+    def update(self, now, mouse):
+        self.hover = self.rect.collidepoint(mouse)
+        target_scale, target_angle, target_alpha = (1.2, -15, 255.0) if self.hover else (1.0, 0, 0.0)
+        self.scale += (target_scale - self.scale) * 0.2
+        self.angle += (target_angle - self.angle) * 0.2
+        self.tip_alpha += (target_alpha - self.tip_alpha) * 0.25
+
+    def icon(self):
+        if not self.animated:
+            return self.image
+        key = (id(self.image), round(self.scale, 3), round(self.angle, 2))
+        if key != self._icon_key:
+            self._icon_key = key
+            self._icon = pygame.transform.rotozoom(self.image, self.angle, self.scale)
+        return self._icon
+
+    def draw(self, target):
+        if not self.visible:
+            return
+        icon = self.icon()
+        target.blit(icon, icon.get_rect(center=self.rect.center))
+
+    def draw_tip(self, target):
+        alpha = int(self.tip_alpha)
+        if alpha <= 0: return
+        pad_x, pad_y = px(10), px(6)
+        w = self._tip_text.get_width() + pad_x * 2
+        h = self._tip_text.get_height() + pad_y * 2
+        if self._tip_key != alpha:
+            self._tip_key = alpha
+            self._tip_bg = pygame.Surface((w, h), pygame.SRCALPHA)
+            pygame.draw.rect(self._tip_bg, (30, 32, 40, alpha), self._tip_bg.get_rect(), border_radius=px(8))
+        x = max(px(8), min(self.rect.centerx - w // 2, target.get_width() - w - px(8)))
+        y = self.rect.bottom + px(8)
+        target.blit(self._tip_bg, (x, y))
+        target.blit(self._tip_text, (x + pad_x, y + pad_y))
+
+
+class CloseButton(IconButton):
+    """The 'X' button: an animated label over a background that turns red on hover."""
+    def __init__(self, rect, on_click, tip):
+        super().__init__(rect, font_small.render("X", True, (255,255,255)), on_click, tip)
+        self._backs = {}
+
+    def draw(self, target):
+        if not self.visible:
+            return
+        color = (255, 0, 0, 200) if self.hover else (40, 42, 54, 180)
+        back = self._backs.get(color)
+        if back is None:
+            back = self._backs[color] = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+            pygame.draw.rect(back, color, back.get_rect(), border_radius=px(5))
+        target.blit(back, self.rect.topleft)
+        super().draw(target)
+
+
+class TopBar(Widget):
+    """The icon row shared by every view; tooltips go on last so they sit above all icons."""
+    def draw(self, target):
+        super().draw(target)
+        for button in self.children:
+            button.draw_tip(target)
+
+
+# =================================================================================
+# 6.92 VIEWS (one widget tree per screen)
+# =================================================================================
+def select_theme(name):
+    global current_theme_color
+    current_theme_color = THEMES[name]; save_settings()
+
+def select_digit_color(name):
+    global current_digit_color
+    current_digit_color = DIGIT_COLORS[name]; save_settings()
+
+def select_background(name):
+    global current_background_key
+    current_background_key = name; save_settings()
+
+def add_task(text):
+    tasks.append({'id': str(uuid.uuid4()), 'text': text, 'completed': False})
+    save_tasks(); tasks.sort(key=lambda t: t['completed'])
+
+def toggle_task(task_id):
+    for task in tasks:
+        if task['id'] == task_id:
+            task['completed'] = not task['completed']; save_tasks(); tasks.sort(key=lambda t: t['completed']); break
+
+def delete_task(task_id):
+    tasks[:] = [t for t in tasks if t['id'] != task_id]
+    save_tasks(); tasks.sort(key=lambda t: t['completed'])
+
+def toggle_auto_advance():
+    pomodoro_timer.set_auto(not pomodoro_timer.auto_advance)
+    pomodoro_config["auto_advance"] = pomodoro_timer.auto_advance; save_settings()
+
+def toggle_sound():
+    sound_manager.enabled = not sound_manager.enabled
+    sound_config["enabled"] = sound_manager.enabled; save_settings()
+
+def save_pomodoro_adjustments(values):
+    # Through configure(), as a config reload does, so the values are clamped the same way
+    pomodoro_timer.configure(dict(pomodoro_config, focus_minutes=values["focus"], short_break_minutes=values["short"],
+                                  long_break_minutes=values["long"], sessions_before_long=values["sessions"]))
+    pomodoro_timer.reset()
+    sound_manager.set_gain_percent(values["volume"])
+    pomodoro_config.update(focus_minutes=pomodoro_timer.focus_minutes,
+                           short_break_minutes=pomodoro_timer.short_break_minutes,
+                           long_break_minutes=pomodoro_timer.long_break_minutes,
+                           sessions_before_long=pomodoro_timer.sessions_before_long)
+    sound_config["gain_percent"] = sound_manager.gain_percent
+    save_settings()
+
+
+class View(Widget):
+    """Root widget of one screen. build() creates the tree once; sync() pushes model state into
+    it every frame with set(), so only widgets whose state changed are repainted."""
+    cached = False
+    background = "image"    # the current rounded background, or None when the view paints its own
+    draggable = False       # empty space drags the window (Windows only)
+
+    def __init__(self):
+        super().__init__((0, 0, WIDTH, HEIGHT))
+        self._pressed = None
+        self._look = None
+        self.build()
+
+    def build(self):
+        pass
+
+    def on_show(self):
+        """Called when a flip towards this view starts."""
+
+    def sync(self, now):
+        pass
+
+    @staticmethod
+    def panel_rect():
+        return px_rect(24, 70, BASE_WIDTH-48, BASE_HEIGHT-110)
+
+    def add_panel(self):
+        """The translucent card used by the secondary views; returns its rect."""
+        return self.add(Box(self.panel_rect(), fill=(35,37,45,210), border="theme", radius=px(16))).rect
+
+    def add_back_button(self, panel, target_view):
+        rect = px_rect(0, 0, 140, 40)
+        rect.midbottom = (panel.centerx, panel.bottom - px(14))
+        return self.add(Button(rect, "Back", font_small, lambda: start_flip(target_view)))
+
+    def render(self, target, now, mouse):
+        look = {"theme": current_theme_color, "digit": current_digit_color}   # the background is blitted below, never cached
+        if look != self._look:
+            changed = {part for part in look if self._look is None or self._look[part] != look[part]}
+            self._look = look
+            self.invalidate_look(changed)
+        self.sync(now)
+        self.update_tree(now, mouse)
+        if self.background == "image":
+            target.blit(backgrounds.display(current_background_key), (0, 0))
+        self.draw(target)
+
+    def handle_event(self, event, mouse):
+        """Route an event through the tree. Returns True when a widget took it."""
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            target = self.hit(event.pos)
+            if target is None:
+                return False
+            self._pressed = target
+            target.press(event.pos)
+            return True
+        if event.type == pygame.MOUSEMOTION and self._pressed is not None:
+            self._pressed.drag(event.pos)
+            return True
+        if event.type == pygame.MOUSEBUTTONUP and event.button == 1 and self._pressed is not None:
+            self._pressed.release()
+            self._pressed = None
+            return True
+        if event.type == pygame.MOUSEWHEEL:
+            target = self.find(mouse, lambda widget, p: widget.scrollable and widget.rect.collidepoint(p))
+            return target is not None and target.scroll(event.y)
+        return False
+
+
+class ViewRegistry:
+    """Views by name, each built the first time it is opened. Services attached with the names
+    of the views that show their data are told whether any of those views is on screen, so they
+    can run at full rate only while someone is looking."""
+    def __init__(self):
+        self._factories = {}
+        self._views = {}
+        self._services = []     # (service, consumer view names)
+        self._shown = None
+
+    def register(self, name, factory):
+        self._factories[name] = factory
+
+    def __contains__(self, name):
+        return name in self._factories
+
+    def __getitem__(self, name):
+        view = self._views.get(name)
+        if view is None:
+            view = self._views[name] = self._factories[name]()
+        return view
+
+    def built(self):
+        """Names of the views constructed so far."""
+        return list(self._views)
+
+    def names(self):
+        """Every registered view, built or not."""
+        return list(self._factories)
+
+    def attach(self, service, consumers):
+        self._services.append((service, frozenset(consumers)))
+
+    def show(self, names):
+        """Record the views on screen (both ends of a flip) and switch services accordingly."""
+        names = frozenset(names)
+        if names == self._shown:
+            return
+        self._shown = names
+        for service, consumers in self._services:
+            service.set_active(bool(consumers & names))
+
+
+class MainView(View):
+    """Clock, date, weather line, chibi and the to-do list. Focus mode hides everything but the time."""
+    draggable = True
+
+    @staticmethod
+    def animator(character):
+        return SpriteAnimator(character_library.get(character) or character_library.get('default'),
+                              center=(WIDTH // 2, HEIGHT - px(100)))
+
+    def set_character(self, character):
+        self.chibi.animator = self.animator(character)
+
+    def build(self):
+        self.weather = self.add(Canvas(px_rect(24, 52, 200, 30), lambda surface, snap: draw_weather_summary_inline(
+            surface, (0, 0), (font_small, font_tiny), current_theme_color, snap)))
+        self.chibi = self.add(ChibiWidget(self.animator(current_character)))
+
+        self.time = self.add(GlyphText((WIDTH // 2, HEIGHT // 2 - px(80)), "", font_bold, "digit", anchor="center", shadow=True))
+        self.colon = self.add(GlyphText((0, 0), ":", font_bold, "digit", anchor="center"))   # pulses by alpha only
+        self.ampm = self.add(GlyphText((0, 0), "", font_small))
+        self.seconds = self.add(GlyphText((0, 0), "", font_small))
+        self.date = self.add(Label((WIDTH // 2, HEIGHT // 2 + px(20)), "", font_regular, "theme", anchor="center", shadow=True))
+
+        self.task_list = self.add(TaskList(tasks_area_rect, MAX_TASKS_DISPLAY, font_tiny, font_small, toggle_task, delete_task))
+        self.add_button = self.add(Canvas(add_task_button_rect, lambda surface, state: surface.blit(add_task_icon, (0, 0)),
+                                          on_click=self.toggle_input))
+        self.input = self.add(TextInput(input_box_rect, font_tiny, self.commit_input))
+        self.input.visible = False
+        self.fading = (self.weather, self.date, self.task_list, self.add_button)   # hidden in focus mode
+        self._weather_version = None
+        clock_model.subscribe('second', lambda clock: self.seconds.set(text=clock.seconds))
+        clock_model.subscribe('minute', self.show_time)
+        clock_model.subscribe('day', lambda clock: self.date.set(text=clock.date))
+
+    def show_time(self, clock):
+        if self.time.set(text=clock.hhmm):
+            time_rect = self.time.text_rect
+            self.colon.set(pos=time_rect.center)
+            self.ampm.set(pos=(time_rect.right + px(10), time_rect.top + px(15)))
+            self.seconds.set(pos=(time_rect.right + px(10), time_rect.bottom - px(30)))
+        self.ampm.set(text=clock.ampm)
+
+    def toggle_input(self):
+        if self.input.visible:
+            self.commit_input()
+        else:
+            self.input.visible = True
+
+    def commit_input(self):
+        if self.input.text:
+            add_task(self.input.text)
+            self.input.set(text="")
+        self.input.visible = False
+
+    def sync(self, now):
+        for widget in self.fading:
+            widget.visible = not is_focus_mode
+        if weather_service.version != self._weather_version:
+            self._weather_version = weather_service.version
+            self.weather.set(state=weather_service.get_snapshot())
+
+        # Time, seconds and date arrive through the clock_model subscriptions made in build()
+        self.colon.alpha = int((math.sin(now*0.002)+1)/2*255)
+        secondary_color = (100,100,100) if current_digit_color == DIGIT_COLORS["Black"] else (200,200,200)
+        self.ampm.set(color=secondary_color)
+        self.seconds.set(color=secondary_color)
+
+        offset = min(self.task_list.offset, max(0, len(tasks) - MAX_TASKS_DISPLAY))
+        self.task_list.set(rows=tuple((t['id'], t['text'], t['completed']) for t in tasks[offset:offset + MAX_TASKS_DISPLAY]),
+                           total=len(tasks), offset=offset)
+
+    def handle_event(self, event, mouse):
+        if self.input.visible:
+            if event.type == pygame.KEYDOWN:
+                self.input.key(event)
+                return True
+            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and \
+               self.hit(event.pos) not in (self.input, self.add_button, self.chibi):
+                self.commit_input()
+        return super().handle_event(event, mouse)
+
+
+class SettingsView(View):
+    """Theme, background, digit colour and sound choices."""
+    background = None
+
+    def build(self):
+        self.add(Box((0, 0, WIDTH, HEIGHT), fill=(40,42,54), radius=CORNER_RADIUS))
+        self.add(Label((px(30), px(30)), "Settings", font_regular, shadow=True))
+        for text, y in (("Theme Color", 100), ("Background", 220), ("Digit Color", 340), ("Sound", 460)):
+            self.add(Label((px(50), px(y)), text, font_small, (220,220,220), shadow=True))
+
+        self.themes = {}
+        x = 50
+        for name, color in THEMES.items():
+            self.themes[name] = self.add(Swatch(px_rect(x, 140, 80, 40), lambda name=name: select_theme(name), fill=color))
+            x += 100
+
+        self.background_row = self.add(Widget())
+        self.backgrounds = {}
+        self._backgrounds_version = None
+
+        self.digit_colors = {}
+        x = 50
+        for name, color in DIGIT_COLORS.items():
+            self.digit_colors[name] = self.add(Swatch(
+                px_rect(x, 380, 80, 40), lambda name=name: select_digit_color(name),
+                fill=color if name != "Black" else (80,80,80), label=name, font=font_small,
+                label_color=(0,0,0) if name == "White" else (255,255,255)))
+            x += 100
+
+        choose = self.add(PlusButton(px_rect(50, 500, 100, 60), lambda: start_flip('sound_settings')))
+        self.sound_preview = self.add(Label((choose.rect.right + px(12), choose.rect.centery), "", font_tiny,
+                                            (230,230,230), anchor="midleft"))
+
+    def build_backgrounds(self):
+        """(Re)build the background previews; runs again after a custom background is added."""
+        self.background_row.children = []
+        self.backgrounds = {}
+        x = 50
+        for name in backgrounds.keys():
+            thumbnail = backgrounds.thumbnail(name)
+            if thumbnail is None:
+                continue
+            self.backgrounds[name] = self.background_row.add(Swatch(
+                px_rect(x, 260, *BackgroundStore.THUMB_SIZE), lambda name=name: select_background(name),
+                image=thumbnail, press_scale=0.9, outline="theme", outline_radius=px(5)))
+            x += 120
+        self.background_row.add(PlusButton(px_rect(x, 260, 100, 60), add_custom_background))
+
+    def sync(self, now):
+        if backgrounds.version != self._backgrounds_version:
+            self.build_backgrounds()
+            self._backgrounds_version = backgrounds.version  # after: a thumbnail that fails to load bumps it
+        for name, swatch in self.themes.items():
+            swatch.set(selected=current_theme_color == THEMES[name])
+        for name, swatch in self.backgrounds.items():
+            swatch.set(selected=current_background_key == name)
+        for name, swatch in self.digit_colors.items():
+            swatch.set(selected=current_digit_color == DIGIT_COLORS[name])
+
+        custom = sum(1 for path in sound_config["events"].values() if path)
+        preview = os.path.basename(sound_config["path"]) if sound_config["path"] else "Built-in tones"
+        if custom: preview += f"  +{custom} event sound{'s' if custom != 1 else ''}"
+        self.sound_preview.set(text=preview)
+
+
+class SoundSettingsView(View):
+    """Default file plus one row per SoundManager event: choose / test / clear."""
+    def build(self):
+        panel = self.add_panel()
+        pad = px(20)
+        x = panel.x + pad; y = panel.y + pad
+        self.add(Label((x, y), "Notification Sounds", font_regular, shadow=True))
+        y += px(52)
+
+        actions = {"clear": clear_custom_sound, "test": sound_manager.play, "choose": choose_custom_sound}
+        self.rows = []
+        for event, label in [(None, "Default")] + list(SoundManager.EVENTS.items()):
+            self.add(Label((x, y), label, font_small, (235,235,235)))
+            source = self.add(Label((x, y + px(28)), "", font_tiny, (170,170,180)))
+            bx = panel.right - pad
+            for key, text in (("clear", "Clear"), ("test", "Test"), ("choose", "Choose")):
+                if key == "test" and event is None:
+                    continue
+                rect = px_rect(0, 0, 84, 32)
+                rect.topright = (bx, y + px(8))
+                button = self.add(Button(rect, text, font_tiny, lambda action=actions[key], event=event: action(event), radius=px(8)))
+                if key == "clear":
+                    clear = button
+                bx = rect.x - px(10)
+            self.rows.append((event, source, clear))
+            y += px(58)
+        self.add_back_button(panel, 'settings')
+
+    def sync(self, now):
+        for event, source, clear in self.rows:
+            path = sound_config["path"] if event is None else sound_config["events"].get(event)
+            if path: text = os.path.basename(path)
+            elif event is None: text = "Built-in tones"
+            else: text = os.path.basename(sound_config["path"]) + " (default)" if sound_config["path"] else "Built-in tone"
+            source.set(text=text[:40])
+            clear.set(enabled=bool(path))
+
+
+class WeatherView(View):
+    """Full-screen weather card: panel, title and content in a single cache, repainted only when
+    the snapshot version, the theme, the digit colour or the units change."""
+    def build(self):
+        self.card = self.add(Card(self.panel_rect(), self.paint_card))
+        self.snapshot = None
+
+    def sync(self, now):
+        key = (weather_service.version, current_theme_color, current_digit_color, weather_config["units"])
+        if key != self.card.state:
+            self.snapshot = weather_service.get_snapshot()
+            self.card.set(state=key)
+
+    def paint_card(self, surface, key):
+        snap = self.snapshot
+        panel = surface.get_rect()
+        pad = px(20)
+        draw_text_with_shadow(surface, "Weather", font_regular, (255,255,255), (pad, pad))
+        x = pad
+        y = pad + px(50)
+        if not snap.get("ok"):
+            surface.blit(font_small.render(snap.get("reason","Weather unavailable"), True, (230,230,230)), (x, y))
+            return
+
+        icon_rect = pygame.Rect(panel.right - px(130) - pad, pad + px(50), px(130), px(130))
+        draw_simple_weather_icon(surface, icon_rect, snap.get("condition_code"), snap.get("is_day", 1))
+
+        # Big temperature
+        temp = snap.get("temp"); unit = snap.get("temp_unit","°C")
+        if temp is not None:
+            big = font_weather_big.render(f"{round(temp)}{unit}", True, current_digit_color)
+            surface.blit(big, (x, y))
+            y += big.get_height() + px(8)
+
+        # Condition
+        cond = snap.get("condition","")
+        if cond:
+            surface.blit(font_small.render(cond, True, (225,225,225)), (x, y))
+            y += px(30)
+
+        # Details row
+        feels = snap.get("feels"); hum = snap.get("humidity")
+        wind = snap.get("wind"); wind_u = snap.get("wind_unit","kph")
+        high = snap.get("high"); low = snap.get("low"); pop = snap.get("pop_today")
+        bits = []
+        if feels is not None: bits.append(f"Feels {round(feels)}{unit}")
+        if hum is not None:   bits.append(f"Humidity {hum}%")
+        if wind is not None:  bits.append(f"Wind {round(wind)} {wind_u}")
+        if high is not None and low is not None: bits.append(f"Today H {round(high)} / L {round(low)}{unit}")
+        if pop is not None: bits.append(f"Rain {pop}%")
+        info = "  •  ".join(bits)
+        surface.blit(font_small.render(info, True, (210,210,210)), (x, y))
+
+        # Mini forecast (bottom area)
+        mini = snap.get("mini", [])
+        col_w = (panel.width - 2*pad)//3
+        bottom_y = panel.bottom - px(120)
+        surface.blit(font_small.render("Next 3 days", True, (230,230,230)), (x, bottom_y - px(28)))
+        for i, d in enumerate(mini[:3]):
+            cx = x + i*col_w; dy = bottom_y
+            date_str = d.get("date","")
+            try: mmdd = date_str[5:7] + "/" + date_str[8:10]
+            except: mmdd = date_str
+            surface.blit(font_small.render(mmdd, True, (230,230,230)), (cx, dy)); dy += px(26)
+
+            mini_icon_rect = pygame.Rect(cx + px(60), dy - px(20), px(40), px(40))
+            draw_simple_weather_icon(surface, mini_icon_rect, d.get("cond_code"), True) # Assume day for forecast
+
+            hi, lo = d.get("high"), d.get("low")
+            if hi is not None and lo is not None:
+                surface.blit(font_tiny.render(f"{round(hi)}/{round(lo)}{unit}", True, (210,210,210)), (cx, dy)); dy += px(20)
+            popd = d.get("pop")
+            if popd is not None:
+                surface.blit(font_tiny.render(f"Rain {popd}%", True, (200,200,200)), (cx, dy)); dy += px(18)
+            cond2 = d.get("cond","")
+            if cond2: surface.blit(font_tiny.render(cond2, True, (190,190,190)), (cx, dy))
+
+
+class PomodoroView(View):
+    """Pomodoro screen; the ring is sized so the time always fits and the controls follow it.
+    Nothing is pushed to the widgets unless the displayed second or the timer's state changed,
+    and the ring is composed from pre-rasterized anti-aliased textures."""
+    draggable = True
+    RING_THICKNESS = 12
+    RING_SUPERSAMPLE = 4
+    RING_TRACK = (80, 82, 96)
+    MODE_NAMES = {'focus': 'Focus', 'short_break': 'Break', 'long_break': 'Long Break'}
+
+    def build(self):
+        panel = self.panel = self.panel_rect()
+        pad = px(20)
+        x = panel.x + pad; y = panel.y + pad
+        self.card = self.add(Card(panel, lambda surface, mode: draw_text_with_shadow(
+            surface, mode, font_regular, (255,255,255), (pad, pad))))
+        adjust_rect = pygame.Rect(panel.right - px(140), y, px(120), px(32))
+        self.add(Button(adjust_rect, "Adjust", font_tiny, lambda: start_flip('pomo_adjust'), selected=True))
+        self.add(Button(adjust_rect.move(-px(130), 0), "Stats", font_tiny, lambda: start_flip('pomo_stats'), selected=True))
+
+        self.ring = self.add(Canvas((0, 0, 0, 0), self.paint_ring))
+        self.info = self.add(Label((x, 0), "", font_small, (220,220,220)))
+        self.controls = [self.add(Button((0, 0, px(120), px(40)), text, font_small, action))
+                         for text, action in (("Start", pomodoro_timer.toggle), ("Reset", pomodoro_timer.reset),
+                                              ("Skip", pomodoro_timer.skip))]
+        self.toggles = [self.add(Button((0, 0, px(140), px(34)), "", font_small, action))
+                        for action in (toggle_auto_advance, toggle_sound)]
+        self._fit = (None, None, None)
+        self._shown = None
+        self._ring_textures = {}
+        self._wedge = None
+
+    def ring_texture(self, diameter, color):
+        """Anti-aliased ring, drawn at RING_SUPERSAMPLE times the size and smoothscaled down once."""
+        key = (diameter, color)
+        if key not in self._ring_textures:
+            ss = self.RING_SUPERSAMPLE
+            big = pygame.Surface((diameter * ss, diameter * ss), pygame.SRCALPHA)
+            pygame.draw.circle(big, color, big.get_rect().center, diameter * ss // 2, px(self.RING_THICKNESS) * ss)
+            self._ring_textures[key] = pygame.transform.smoothscale(big, (diameter, diameter))
+        return self._ring_textures[key]
+
+    def fit_timer(self, timer_text):
+        """(ring diameter, timer font) for the text; the font shrinks rather than overflowing the ring."""
+        if self._fit[0] == timer_text:
+            return self._fit[1:]
+        ring_thickness = px(self.RING_THICKNESS)
+        # Max outer diameter allowed by layout (leave space for controls below)
+        max_d = min(self.panel.width - 2*px(20), self.panel.height - px(220))
+        max_d = max(px(220), max_d)
+
+        base_size = px(110)
+        timer_font = scaled_assets.font_px(FONT_BOLD_PATH, base_size)
         t_w, t_h = timer_font.size(timer_text)
-        diameter = int(max_d)
-
-    ring_rect = pygame.Rect(0, 0, diameter, diameter)
-    ring_rect.center = (panel.centerx, panel.centery - 20)
-
-    # Progress ring
-    pygame.draw.arc(surface, (80, 82, 96), ring_rect, 0, math.tau, ring_thickness)
-    progress = pomodoro_timer.progress_ratio()
-    start_ang = -math.pi/2
-    end_ang = start_ang + progress * math.tau
-    pygame.draw.arc(surface, theme_color, ring_rect, start_ang, end_ang, ring_thickness)
-
-    # Center timer text inside ring
-    t_surf = timer_font.render(timer_text, True, digit_color)
-    surface.blit(t_surf, t_surf.get_rect(center=ring_rect.center))
-
-    # Info row
-    info_y = ring_rect.bottom + 8
-    info = f"Session {pomodoro_timer.sessions_completed + (1 if pomodoro_timer.mode!='focus' else 0)}  |  Auto {'ON' if pomodoro_timer.auto_advance else 'OFF'}  |  Sound {'ON' if sound_manager.enabled else 'OFF'}"
-    surface.blit(font_small.render(info, True, (220,220,220)), (x, info_y))
-
-    # Controls
-    btn_w, btn_h = 120, 40
-    gap = 18
-    total_w = btn_w*3 + gap*2
-    start_x = panel.centerx - total_w//2
-    btn_y = info_y + 30
-
-    def draw_btn(key, label):
-        rect = pygame.Rect(start_x + order[key]*(btn_w+gap), btn_y, btn_w, btn_h)
-        pygame.draw.rect(surface, (55,57,68), rect, border_radius=10)
-        pygame.draw.rect(surface, theme_color, rect, 2, border_radius=10)
-        label_s = font_small.render(label, True, (240,240,240))
-        surface.blit(label_s, label_s.get_rect(center=rect.center))
-        pomo_buttons[key] = rect
-
-    order = {'start':0, 'reset':1, 'skip':2}
-    draw_btn('start', 'Pause' if pomodoro_timer.running else 'Start')
-    draw_btn('reset', 'Reset')
-    draw_btn('skip',  'Skip')
-
-    # Toggles: Auto, Sound
-    toggle_w, toggle_h = 140, 34
-    tog_gap = 16
-    tot_w = toggle_w*2 + tog_gap
-    start_tx = panel.centerx - tot_w//2
-    tog_y = btn_y + btn_h + 18
-
-    auto_rect  = pygame.Rect(start_tx, tog_y, toggle_w, toggle_h)
-    sound_rect = pygame.Rect(start_tx + toggle_w + tog_gap, tog_y, toggle_w, toggle_h)
-
-    for r, text in [(auto_rect, f"Auto: {'ON' if pomodoro_timer.auto_advance else 'OFF'}"),
-                    (sound_rect, f"Sound: {'ON' if sound_manager.enabled else 'OFF'}")]:
-        pygame.draw.rect(surface, (55,57,68), r, border_radius=10)
-        pygame.draw.rect(surface, theme_color, r, 2, border_radius=10)
-        lbl = font_small.render(text, True, (240,240,240))
-        surface.blit(lbl, lbl.get_rect(center=r.center))
-
-    pomo_buttons['auto'] = auto_rect
-    pomo_buttons['sound_toggle'] = sound_rect
-
-
-def draw_pomodoro_adjust_view(surface, theme_color, digit_color, fonts):
+        needed_inner = max(t_w, t_h) + px(42)
+        needed_outer = needed_inner + 2*ring_thickness
+        if needed_outer <= max_d:
+            diameter = int(min(max_d, needed_outer))
+        else:
+            scale = (max_d - 2*ring_thickness) / max(1, needed_inner)
+            timer_font = scaled_assets.font_px(FONT_BOLD_PATH, max(px(40), int(base_size * scale)))
+            diameter = int(max_d)
+        self._fit = (timer_text, diameter, timer_font)
+        return diameter, timer_font
+
+    def place_controls(self, diameter):
+        panel = self.panel
+        ring_rect = pygame.Rect(0, 0, diameter, diameter)
+        ring_rect.center = (panel.centerx, panel.centery - px(20))
+        self.ring.rect = ring_rect
+
+        info_y = ring_rect.bottom + px(8)
+        self.info.set(pos=(panel.x + px(20), info_y))
+
+        btn_w, btn_h, gap = px(120), px(40), px(18)
+        start_x = panel.centerx - (btn_w*3 + gap*2)//2
+        btn_y = info_y + px(30)
+        for i, button in enumerate(self.controls):
+            button.rect.topleft = (start_x + i*(btn_w+gap), btn_y)
+
+        toggle_w, tog_gap = px(140), px(16)
+        start_tx = panel.centerx - (toggle_w*2 + tog_gap)//2
+        for i, button in enumerate(self.toggles):
+            button.rect.topleft = (start_tx + i*(toggle_w + tog_gap), btn_y + btn_h + px(18))
+
+    def sync(self, now):
+        shown = (pomodoro_timer.remaining_ms // 1000, pomodoro_timer.running, pomodoro_timer.mode,
+                 pomodoro_timer.sessions_completed, pomodoro_timer.auto_advance, sound_manager.enabled)
+        if shown == self._shown:
+            return
+        self._shown = shown
+        timer_text = pomodoro_timer.format_mmss()
+        diameter, timer_font = self.fit_timer(timer_text)
+        if diameter != self.ring.rect.width:
+            self.place_controls(diameter)
+        self.ring.set(state=(timer_text, timer_font, pomodoro_timer.progress_ratio()))
+
+        auto = 'ON' if pomodoro_timer.auto_advance else 'OFF'
+        sound = 'ON' if sound_manager.enabled else 'OFF'
+        self.card.set(state=self.MODE_NAMES.get(pomodoro_timer.mode, 'Focus'))
+        self.info.set(text=f"Session {pomodoro_timer.sessions_completed + (1 if pomodoro_timer.mode!='focus' else 0)}  |  Auto {auto}  |  Sound {sound}")
+        self.controls[0].set(text='Pause' if pomodoro_timer.running else 'Start')
+        self.toggles[0].set(text=f"Auto: {auto}")
+        self.toggles[1].set(text=f"Sound: {sound}")
+
+    def paint_ring(self, surface, state):
+        timer_text, timer_font, progress = state
+        ring_rect = surface.get_rect()
+        surface.blit(self.ring_texture(ring_rect.width, self.RING_TRACK), (0, 0))
+        if progress > 0:
+            # The progress ring masked to a wedge from the bottom, sweeping the way draw.arc did
+            if self._wedge is None or self._wedge.get_size() != ring_rect.size:
+                self._wedge = pygame.Surface(ring_rect.size, pygame.SRCALPHA)
+            self._wedge.fill((0, 0, 0, 0))
+            cx, cy = ring_rect.center
+            reach = ring_rect.width   # beyond the ring's outer edge
+            sweep = min(1.0, progress) * math.tau
+            steps = max(2, int(sweep / math.radians(3)) + 1)
+            points = [(cx, cy)] + [(cx + reach * math.cos(-math.pi/2 + sweep * i / steps),
+                                    cy - reach * math.sin(-math.pi/2 + sweep * i / steps)) for i in range(steps + 1)]
+            pygame.draw.polygon(self._wedge, (255, 255, 255, 255), points)
+            self._wedge.blit(self.ring_texture(ring_rect.width, current_theme_color), (0, 0),
+                             special_flags=pygame.BLEND_RGBA_MULT)
+            surface.blit(self._wedge, (0, 0))
+        t_surf = timer_font.render(timer_text, True, current_digit_color)
+        surface.blit(t_surf, t_surf.get_rect(center=ring_rect.center))
+
+
+class PomodoroAdjustView(View):
     """Sliders for Focus/Short/Long (1–180 min), Sessions (1–10), Volume (0–200%)."""
-    global pomo_sliders_initialized
-    font_small, font_tiny, font_regular = fonts
-
-    panel = pygame.Rect(24, 70, WIDTH-48, HEIGHT-110)
-    pygame.draw.rect(surface, (35,37,45,210), panel, border_radius=16)
-    pygame.draw.rect(surface, theme_color, panel, 2, border_radius=16)
-
-    pad = 20
-    x = panel.x + pad; y = panel.y + pad
-    draw_text_with_shadow(surface, "Adjust Pomodoro", font_regular, (255,255,255), (x, y))
-
-    if not pomo_sliders_initialized:
-        init_pomo_sliders()
-
-    labels = [("Focus", "focus"), ("Short break", "short"), ("Long break", "long"),
-              ("Sessions before long", "sessions"), ("Volume", "volume")]
-    for label, key in labels:
-        s = pomo_sliders[key]
-        s.draw(surface, label, font_small, theme_color)
-
-    btn_w, btn_h = 140, 40
-    gap = 16
-    total_w = btn_w*2 + gap
-    start_x = panel.centerx - total_w//2
-    by = panel.bottom - 60
-
-    save_rect = pygame.Rect(start_x, by, btn_w, btn_h)
-    back_rect = pygame.Rect(start_x + btn_w + gap, by, btn_w, btn_h)
-    for r, text in [(save_rect, "Save"), (back_rect, "Back")]:
-        pygame.draw.rect(surface, (55,57,68), r, border_radius=10)
-        pygame.draw.rect(surface, theme_color, r, 2, border_radius=10)
-        t = font_small.render(text, True, (240,240,240))
-        surface.blit(t, t.get_rect(center=r.center))
-
-    pomo_adjust_buttons['save'] = save_rect
-    pomo_adjust_buttons['back'] = back_rect
-
-# --- NEW: System Stats View ---
-def draw_system_view(surface, theme_color, digit_color, fonts):
-    """Full-screen system monitor card."""
-    font_small, font_tiny, font_regular, font_sys_big = fonts
-    panel = pygame.Rect(24, 70, WIDTH-48, HEIGHT-110)
-    pygame.draw.rect(surface, (35,37,45,210), panel, border_radius=16)
-    pygame.draw.rect(surface, theme_color, panel, 2, border_radius=16)
-
-    pad = 20
-    x = panel.x + pad
-    y = panel.y + pad
-
-    # Header
-    draw_text_with_shadow(surface, "System Monitor", font_regular, (255,255,255), (x, y))
-    y += 60
-
-    snap = system_monitor.get_snapshot()
-    if snap.get("cpu", -1) == -1.0:
-        surface.blit(font_small.render("Install 'psutil' to enable this view.", True, (230,230,230)), (x, y))
-        return
-        
-    cpu_pct = snap.get("cpu", 0.0)
-    ram_pct = snap.get("ram_pct", 0.0)
-    ram_used = snap.get("ram_used", 0.0)
-    ram_total = snap.get("ram_total", 0.0)
+    SLIDERS = (("focus", "Focus", *POMODORO_MINUTES_RANGE, 1, "min"),
+               ("short", "Short break", *POMODORO_MINUTES_RANGE, 1, "min"),
+               ("long", "Long break", *POMODORO_MINUTES_RANGE, 1, "min"),
+               ("sessions", "Sessions before long", *POMODORO_SESSIONS_RANGE, 1, "sessions"),
+               ("volume", "Volume", 0, 200, 5, "%"))
+
+    def build(self):
+        panel = self.add_panel()
+        pad = px(20)
+        self.add(Label((panel.x + pad, panel.y + pad), "Adjust Pomodoro", font_regular, shadow=True))
+
+        padx, start_y, gap = 60, 150, 70
+        self.sliders = {}
+        for i, (key, label, lo, hi, step, unit) in enumerate(self.SLIDERS):
+            self.sliders[key] = self.add(Slider(px_rect(padx, start_y + gap*i, BASE_WIDTH - 2*padx, 6),
+                                                label, font_small, lo, hi, lo, step, unit))
+
+        btn_w, btn_h, gap = px(140), px(40), px(16)
+        start_x = panel.centerx - (btn_w*2 + gap)//2
+        by = panel.bottom - px(60)
+        self.add(Button((start_x, by, btn_w, btn_h), "Save", font_small, self.save))
+        self.add(Button((start_x + btn_w + gap, by, btn_w, btn_h), "Back", font_small, lambda: start_flip('pomodoro')))
+        self.on_show()
+
+    def on_show(self):
+        """Start from the saved settings every time the view is opened."""
+        values = {"focus": pomodoro_config["focus_minutes"], "short": pomodoro_config["short_break_minutes"],
+                  "long": pomodoro_config["long_break_minutes"], "sessions": pomodoro_config["sessions_before_long"],
+                  "volume": int(sound_config.get("gain_percent", 100))}
+        for key, value in values.items():
+            slider = self.sliders[key]
+            slider.set(value=max(slider.min, min(slider.max, value)))
+
+    def save(self):
+        save_pomodoro_adjustments({key: int(slider.value) for key, slider in self.sliders.items()})
+        start_flip('pomodoro')
+
+
+# --- Pomodoro statistics view ---
+POMO_STATS_DAYS = 7
+
+class PomodoroStatsView(View):
+    """Focus minutes per day and streaks, drawn from the precomputed rollups only."""
+    def build(self):
+        panel = self.add_panel()
+        pad = px(20)
+        x = panel.x + pad; y = panel.y + pad
+        self.add(Label((x, y), "Focus Stats", font_regular, shadow=True))
+        y += px(56)
+        self.lines = []
+        for _ in range(3):
+            self.lines.append(self.add(Label((x, y), "", font_small, (225,225,225))))
+            y += px(30)
+        chart = pygame.Rect(x, y + px(14), panel.width - 2*pad, panel.bottom - px(80) - (y + px(14)))
+        self.chart = self.add(Canvas(chart, self.paint_chart))
+        self.add_back_button(panel, 'pomodoro')
+        self._stale = False
+        clock_model.subscribe('second', self.mark_stale)   # the rollups change far less often than that
+
+    def mark_stale(self, clock):
+        self._stale = True
+
+    def sync(self, now):
+        if not self._stale:
+            return
+        self._stale = False
+        today = clock_model.today
+        today_min = pomodoro_history.day(today).get("focus_sec", 0) / 60.0
+        week = pomodoro_history.week(today)
+        current, best = pomodoro_history.streaks(today)
+        for label, text in zip(self.lines, (
+                f"Today {today_min:.0f} min  |  This week {week.get('focus_sec', 0) / 60.0:.0f} min",
+                f"Sessions this week {week.get('focus_done', 0)}  |  Skipped {week.get('skipped', 0)}",
+                f"Streak {current} day{'s' if current != 1 else ''}  |  Best {best}")):
+            label.set(text=text)
+        self.chart.set(state=(today, tuple(pomodoro_history.focus_minutes_by_day(POMO_STATS_DAYS, today)),
+                              pomodoro_config["focus_minutes"]))
+
+    def paint_chart(self, surface, state):
+        today, days, focus_minutes = state
+        chart = surface.get_rect()
+        peak = max([m for _, m in days] + [focus_minutes])
+        slot_w = chart.width // len(days)
+        for i, (day, minutes) in enumerate(days):
+            bar_h = int((chart.height - px(44)) * minutes / peak) if peak else 0
+            bar = pygame.Rect(chart.x + i*slot_w + px(8), chart.bottom - px(22) - bar_h, slot_w - px(16), bar_h)
+            pygame.draw.rect(surface, (55,57,68), (bar.x, chart.y + px(20), bar.width, chart.height - px(42)), border_radius=px(6))
+            if bar_h > 0:
+                pygame.draw.rect(surface, current_theme_color, bar, border_radius=px(6))
+            if minutes:
+                val = font_tiny.render(f"{minutes:.0f}", True, (230,230,230))
+                surface.blit(val, val.get_rect(midbottom=(bar.centerx, bar.y - px(2))))
+            lbl = font_tiny.render(day.strftime("%a"), True, (255,255,255) if day == today else (190,190,190))
+            surface.blit(lbl, lbl.get_rect(midtop=(bar.centerx, chart.bottom - px(18))))
+
+
+class SystemView(View):
+    """Full-screen system monitor card, repainted when a new sample arrives."""
+    def build(self):
+        panel = self.add_panel()
+        pad = px(20)
+        x = panel.x + pad; y = panel.y + pad
+        self.add(Label((x, y), "System Monitor", font_regular, shadow=True))
+        history = self.add(Button((panel.right - px(140), y, px(120), px(32)), "History", font_tiny,
+                                  lambda: start_flip('system_history'), selected=True))
+        history.visible = metrics_history is not None
+        self.card = self.add(Canvas(panel, self.paint_card))
+
+    def sync(self, now):
+        self.card.set(state=system_monitor.get_snapshot())
+
+    def paint_card(self, surface, snap):
+        panel = surface.get_rect()
+        pad = px(20)
+        x = pad
+        y = pad + px(60)
+        if snap.get("cpu", -1) == -1.0:
+            surface.blit(font_small.render("Install 'psutil' to enable this view.", True, (230,230,230)), (x, y))
+            return
 
-    # --- CPU Section ---
-    draw_text_with_shadow(surface, "CPU", font_regular, (230,230,230), (x, y))
-    
-    cpu_str = f"{cpu_pct:.1f}%"
-    cpu_surf = font_sys_big.render(cpu_str, True, digit_color)
-    cpu_rect = cpu_surf.get_rect(topleft=(x + 100, y - 10))
-    surface.blit(cpu_surf, cpu_rect)
-    
-    y += cpu_surf.get_height() + 10
-    
-    bar_rect = pygame.Rect(x, y, panel.width - (2*pad), 30)
-    draw_progress_bar(surface, bar_rect, cpu_pct / 100.0, theme_color)
-    
-    y += 70
-    
-    # --- RAM Section ---
-    draw_text_with_shadow(surface, "RAM", font_regular, (230,230,230), (x, y))
+        cpu_pct = snap.get("cpu", 0.0)
+        ram_pct = snap.get("ram_pct", 0.0)
+        ram_used = snap.get("ram_used", 0.0)
+        ram_total = snap.get("ram_total", 0.0)
+
+        # --- CPU Section ---
+        draw_text_with_shadow(surface, "CPU", font_regular, (230,230,230), (x, y))
+        cpu_surf = font_sys_big.render(f"{cpu_pct:.1f}%", True, current_digit_color)
+        surface.blit(cpu_surf, cpu_surf.get_rect(topleft=(x + px(100), y - px(10))))
+        y += cpu_surf.get_height() + px(10)
+        draw_progress_bar(surface, pygame.Rect(x, y, panel.width - (2*pad), px(30)), cpu_pct / 100.0, current_theme_color)
+        y += px(40)
+
+        # --- RAM Section ---
+        draw_text_with_shadow(surface, "RAM", font_regular, (230,230,230), (x, y))
+        ram_surf = font_sys_big.render(f"{ram_pct:.1f}%", True, current_digit_color)
+        surface.blit(ram_surf, ram_surf.get_rect(topleft=(x + px(100), y - px(10))))
+        y += ram_surf.get_height() + px(10)
+        ram_bar_rect = pygame.Rect(x, y, panel.width - (2*pad), px(30))
+        draw_progress_bar(surface, ram_bar_rect, ram_pct / 100.0, current_theme_color)
+
+        # Text label for RAM usage
+        ram_info_surf = font_small.render(f"{ram_used:.1f} GB / {ram_total:.1f} GB", True, (210,210,210))
+        ram_info_rect = ram_info_surf.get_rect(midtop=(ram_bar_rect.centerx, ram_bar_rect.bottom + px(10)))
+        surface.blit(ram_info_surf, ram_info_rect)
+
+        # Disk / network throughput
+        if "disk_read" in snap:
+            io_str = (f"Disk R {format_rate(snap['disk_read'])}  W {format_rate(snap['disk_write'])}"
+                      f"   Net In {format_rate(snap['net_rx'])}  Out {format_rate(snap['net_tx'])}")
+            io_surf = font_tiny.render(io_str, True, (200,200,200))
+            io_rect = io_surf.get_rect(midtop=(panel.centerx, ram_info_rect.bottom + px(8)))
+            surface.blit(io_surf, io_rect)
+            y = io_rect.bottom
+        else:
+            y = ram_info_rect.bottom
+
+        # --- This app's own overhead ---
+        own = snap.get("self")
+        if own:
+            process_line, frame_line = format_self_stats(own)
+            for line in ("App: " + process_line, frame_line):
+                own_surf = font_tiny.render(line, True, current_theme_color)
+                own_rect = own_surf.get_rect(midtop=(panel.centerx, y + px(4)))
+                surface.blit(own_surf, own_rect)
+                y = own_rect.bottom
+
+
+class SystemHistoryView(View):
+    """CPU and RAM history over the last hour, day or week, read from the on-disk rollups."""
+    def build(self):
+        panel = self.add_panel()
+        pad = px(20)
+        x = panel.x + pad; y = panel.y + pad
+        self.add(Label((x, y), "History", font_regular, shadow=True))
+
+        # Range selector
+        self.range = "1H"
+        self.range_buttons = {}
+        bx = panel.right - pad - px(3*70 - 10)
+        for key in MetricsHistory.RANGES:
+            self.range_buttons[key] = self.add(Button((bx, y, px(60), px(32)), key, font_tiny,
+                                                      lambda key=key: setattr(self, 'range', key)))
+            bx += px(70)
+        y += px(56)
+
+        self.graphs = []
+        for title, index in (("CPU", 1), ("RAM", 4)):
+            label = self.add(Label((x, y), title, font_small, (230,230,230)))
+            y += px(30)
+            graph = self.add(Canvas((x, y, panel.width - 2*pad, px(140)),
+                                    lambda surface, state, index=index: draw_history_graph(
+                                        surface, surface.get_rect(), state[0], state[1], index,
+                                        current_theme_color, font_tiny, state[2])))
+            y += graph.rect.height + px(16)
+            self.graphs.append((title, index, label, graph))
+        self.add_back_button(panel, 'system')
+
+    def sync(self, now):
+        for key, button in self.range_buttons.items():
+            button.set(selected=key == self.range)
+        rows = metrics_history.query(self.range) if metrics_history else []
+        span = MetricsHistory.RANGES[self.range][0]
+        for title, index, label, graph in self.graphs:
+            if rows:
+                title = f"{title}  avg {rows[-1][index + 2]:.0f}%  peak {max(r[index + 1] for r in rows):.0f}%"
+            label.set(text=title)
+            # Quantize "now" to one pixel of the time axis so the graph repaints when it would move
+            px_span = span / max(1, graph.rect.width - px(12))
+            graph.set(state=(rows, span, math.ceil(time.time() / px_span) * px_span))
 
-    ram_str = f"{ram_pct:.1f}%"
-    ram_surf = font_sys_big.render(ram_str, True, digit_color)
-    ram_rect = ram_surf.get_rect(topleft=(x + 100, y - 10))
-    surface.blit(ram_surf, ram_rect)
-    
-    y += ram_surf.get_height() + 10
 
-    ram_bar_rect = pygame.Rect(x, y, panel.width - (2*pad), 30)
-    draw_progress_bar(surface, ram_bar_rect, ram_pct / 100.0, theme_color)
-    
-    # Text label for RAM usage
-    ram_info_str = f"{ram_used:.1f} GB / {ram_total:.1f} GB"
-    ram_info_surf = font_small.render(ram_info_str, True, (210,210,210))
-    ram_info_rect = ram_info_surf.get_rect(midtop=(ram_bar_rect.centerx, ram_bar_rect.bottom + 10))
-    surface.blit(ram_info_surf, ram_info_rect)
+# =================================================================================
+# 6.93 SESSION RECORD & REPLAY
+# =================================================================================
+# A recording is JSON lines: a header with the starting settings, tasks, UI scale and random seed,
+# then one line per frame with its tick time, the pointer (only when it moved) and the events the
+# app acts on. Replaying it feeds those frames back on the recorded clock, unthrottled.
+SESSION_EVENT_TYPES = (pygame.QUIT, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP,
+                       pygame.MOUSEMOTION, pygame.MOUSEWHEEL, pygame.KEYDOWN)
+
+def encode_event(event):
+    """The JSON-safe attributes of an event (window handles and the like are dropped)."""
+    fields = {}
+    for key, value in event.dict.items():
+        if isinstance(value, (bool, int, float, str)):
+            fields[key] = value
+        elif isinstance(value, tuple) and all(isinstance(v, (int, float)) for v in value):
+            fields[key] = list(value)
+    return [event.type, fields]
+
+def decode_event(record):
+    event_type, fields = record
+    return pygame.event.Event(event_type, {k: tuple(v) if isinstance(v, list) else v for k, v in fields.items()})
+
+def session_state():
+    """What a replay has to reproduce. Task ids are random per run, so tasks compare by text."""
+    return {"view": app_view,
+            "settings": settings_snapshot(),
+            "tasks": [[t['text'], bool(t['completed'])] for t in tasks],
+            "pomodoro": {"mode": pomodoro_timer.mode, "running": pomodoro_timer.running,
+                         "sessions_completed": pomodoro_timer.sessions_completed}}
+
+def session_state_hash():
+    return hashlib.sha256(json.dumps(session_state(), sort_keys=True).encode()).hexdigest()
+
+
+class LiveInput:
+    """Events, pointer and clock straight from pygame. The main loop reads all three through
+    its input source so a recorder or replayer can stand in for it."""
+    replaying = False
+
+    def __init__(self):
+        self.now = 0
+        self.mouse = (0, 0)
+
+    def begin_frame(self):
+        self.now = pygame.time.get_ticks()
+        self.mouse = pygame.mouse.get_pos()
+
+    def events(self):
+        return pygame.event.get()
+
+    def end_frame(self, frame_ms):
+        pass
+
+    def close(self):
+        pass
+
+
+class SessionRecorder(LiveInput):
+    """Live input, written to a recording as it is consumed."""
+    def __init__(self, path, seed):
+        super().__init__()
+        self._file = open(path, 'w')
+        self._last_mouse = None
+        self._frame = None
+        config = settings_snapshot()
+        config['weather'] = dict(config['weather'], api_key="")  # recordings get shared; replays stay offline
+        self._write({"version": SESSION_VERSION, "ui_scale": UI_SCALE, "seed": seed,
+                     "config": config, "tasks": tasks})
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, separators=(',', ':')) + "\n")
+
+    def begin_frame(self):
+        super().begin_frame()
+        self._frame = {"t": self.now}
+        if self.mouse != self._last_mouse:
+            self._frame["mouse"] = self._last_mouse = self.mouse
+
+    def events(self):
+        events = super().events()
+        kept = [encode_event(e) for e in events if e.type in SESSION_EVENT_TYPES]
+        if kept:
+            self._frame["events"] = kept
+        self._write(self._frame)
+        return events
+
+    def close(self):
+        self._file.close()
+        print(f"[RECORD] session saved to {self._file.name}")
+
+
+class SessionReplayer(LiveInput):
+    """Plays a recording back frame by frame and times each frame. Once the recording runs out
+    it posts QUIT, so the app shuts down through its normal path."""
+    replaying = True
+
+    def __init__(self, path):
+        super().__init__()
+        with open(path, 'r') as f:
+            header = json.loads(f.readline())
+            self.frames = [json.loads(line) for line in f if line.strip()]
+        self.seed = header["seed"]
+        self.timings = []
+        self._index = 0
+        self._events = []
+
+    def begin_frame(self):
+        if self._index >= len(self.frames):
+            self._events = [pygame.event.Event(pygame.QUIT)]
+            return
+        frame = self.frames[self._index]
+        self._index += 1
+        self.now = frame["t"]
+        if "mouse" in frame:
+            self.mouse = tuple(frame["mouse"])
+        self._events = [decode_event(e) for e in frame.get("events", ())]
+
+    def events(self):
+        return self._events
+
+    def end_frame(self, frame_ms):
+        self.timings.append(frame_ms)
+
+    def report(self, state_hash, timings_path=None, expect_hash=None):
+        """Print the frame-time summary and state hash. Returns the process exit status."""
+        ordered = sorted(self.timings) or [0.0]
+        def pct(p):
+            return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+        print(f"[REPLAY] {len(self.timings)} frames  mean {sum(ordered) / len(ordered):.2f} ms  "
+              f"p50 {pct(0.50):.2f}  p95 {pct(0.95):.2f}  p99 {pct(0.99):.2f}  max {ordered[-1]:.2f}")
+        print(f"[REPLAY] state {state_hash}")
+        if timings_path:
+            with open(timings_path, 'w') as f:
+                f.write("frame,t_ms,frame_ms\n")
+                for i, (frame, ms) in enumerate(zip(self.frames, self.timings)):
+                    f.write(f"{i},{frame['t']},{ms:.3f}\n")
+        if expect_hash and not state_hash.startswith(expect_hash.lower()):
+            print(f"[REPLAY] state mismatch: expected {expect_hash}")
+            return 1
+        return 0
+
+
+# =================================================================================
+# 6.94 MEMORY REPORT (surface bytes per store, tracemalloc sites and growth)
+# =================================================================================
+MEMORY_TOP_SITES = 10
+
+def surface_bytes(surface):
+    """Pixel memory a surface owns. Subsurfaces share their parent's pixels and count as nothing."""
+    return 0 if surface.get_parent() is not None else surface.get_pitch() * surface.get_height()
+
+def widget_surfaces(root):
+    """Surfaces held by a widget tree: repaint caches, previews, icons and tooltips."""
+    found, stack = [], [root]
+    while stack:
+        widget = stack.pop()
+        found += [value for value in vars(widget).values() if isinstance(value, pygame.Surface)]
+        stack += widget.children
+    return found
+
+def surface_stores():
+    """(name, surfaces) for everything that keeps surfaces alive, biggest owners first. A surface
+    shared between stores is counted under the first one that lists it."""
+    stores = [("frame buffers", [screen, app_surface, ui_surface]),
+              ("backgrounds", backgrounds.surfaces()),
+              ("scaled assets", scaled_assets.surfaces()),
+              ("sprite sheets", character_library.surfaces()),
+              ("top bar", widget_surfaces(top_bar) + list(focus_icons.values()))]
+    stores += [(f"view '{name}'", widget_surfaces(views[name])) for name in views.built()]
+    return stores
+
+def sound_bytes(sound):
+    frequency, size, channels = pygame.mixer.get_init()
+    return int(sound.get_length() * frequency) * channels * abs(size) // 8
+
+
+class MemoryReport:
+    """Prints surface bytes per store, decoded sound buffers, threads and (while tracemalloc runs)
+    the top Python allocation sites. Every report after the first also lists what grew since the
+    previous one, which is how a slow leak in a long session shows up."""
+    def __init__(self):
+        self._previous = None
+
+    @staticmethod
+    def _snapshot():
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+    def print_report(self):
+        seen, rows = set(), []
+        for name, surfaces in surface_stores():
+            unique = [s for s in surfaces if id(s) not in seen]
+            seen.update(id(s) for s in unique)
+            rows.append((name, len(unique), sum(surface_bytes(s) for s in unique)))
+        print(f"[MEMORY] surfaces {format_bytes(sum(r[2] for r in rows))}")
+        for name, count, total in sorted(rows, key=lambda r: -r[2]):
+            print(f"  {format_bytes(total):>10}  {count:4d}  {name}")
+
+        if pygame.mixer.get_init():
+            sounds = sound_manager.buffers()
+            print(f"[MEMORY] sound buffers {format_bytes(sum(sound_bytes(s) for s in sounds))} ({len(sounds)} sounds)")
+
+        threads = threading.enumerate()
+        print(f"[MEMORY] threads {len(threads)}: " + ", ".join(t.name for t in threads))
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._previous = self._snapshot()
+            print("[MEMORY] tracemalloc started; allocation sites appear from the next report")
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        print(f"[MEMORY] python heap {format_bytes(current)} traced, peak {format_bytes(peak)}")
+        snapshot = self._snapshot()
+        print("[MEMORY] top allocation sites:")
+        for stat in snapshot.statistics('lineno')[:MEMORY_TOP_SITES]:
+            print(f"  {format_bytes(stat.size):>10}  {stat.count:7d} blocks  {stat.traceback}")
+        if self._previous is not None:
+            grown = [d for d in snapshot.compare_to(self._previous, 'lineno') if d.size_diff or d.count_diff]
+            print("[MEMORY] change since last report:")
+            for diff in grown[:MEMORY_TOP_SITES]:
+                change = ('+' if diff.size_diff >= 0 else '-') + format_bytes(abs(diff.size_diff))
+                print(f"  {change:>10}  {diff.count_diff:+7d} blocks  {diff.traceback}")
+            if not grown:
+                print("  (none)")
+        self._previous = snapshot
+
+memory_report = MemoryReport()
+
+
+# =================================================================================
+# 6.945 METRICS ENDPOINT (Prometheus text format, served off the render thread)
+# =================================================================================
+class MetricsText:
+    """One exposition in the Prometheus text format (0.0.4); every name gets the trife_ prefix."""
+    def __init__(self):
+        self.lines = []
+
+    def family(self, name, kind, help_text):
+        self.lines += [f"# HELP trife_{name} {help_text}", f"# TYPE trife_{name} {kind}"]
+
+    def sample(self, name, value, **labels):
+        tags = ",".join(f'{key}="{val}"' for key, val in labels.items())
+        self.lines.append(f"trife_{name}{{{tags}}} {value}" if tags else f"trife_{name} {value}")
+
+    def histogram(self, name, histogram, **labels):
+        cumulative, total = histogram.snapshot()
+        for bound, count in zip(histogram.bounds + ("+Inf",), cumulative):
+            self.sample(f"{name}_bucket", count, **labels, le=bound)
+        self.sample(f"{name}_sum", total, **labels)
+        self.sample(f"{name}_count", cumulative[-1], **labels)
+
+    def text(self):
+        return "\n".join(self.lines) + "\n"
+
+def collect_metrics():
+    """Read at scrape time from the counters and histograms the services keep anyway."""
+    m = MetricsText()
+    frames = system_monitor.frame_stats
+    m.family("frame_work_seconds", "histogram", "Main-loop work per frame, not counting the frame-rate sleep.")
+    m.histogram("frame_work_seconds", frames.histogram)
+    m.family("fps", "gauge", "Frames per second over the last 120 frames.")
+    m.sample("fps", round(frames.summary()[0], 2))
+    m.family("watchdog_stalls_total", "counter", "Frames that overran the watchdog's frame budget.")
+    m.sample("watchdog_stalls_total", watchdog.stalls)
+
+    caches = {"widget": (Widget.cache_hits, Widget.repaints),
+              "glyph": (GlyphAtlas.hits, GlyphAtlas.misses),
+              "scaled_asset": (scaled_assets.hits, scaled_assets.misses),
+              "background": (backgrounds.hits, backgrounds.misses)}
+    m.family("cache_hits_total", "counter", "Lookups answered from a cache.")
+    for cache, (hits, _) in caches.items():
+        m.sample("cache_hits_total", hits, cache=cache)
+    m.family("cache_misses_total", "counter", "Lookups that had to render, decode or load.")
+    for cache, (_, misses) in caches.items():
+        m.sample("cache_misses_total", misses, cache=cache)
+
+    m.family("weather_fetches_total", "counter", "Weather API requests made.")
+    m.sample("weather_fetches_total", weather_service.fetches)
+    m.family("weather_fetch_failures_total", "counter", "Weather API requests that failed or returned unusable data.")
+    m.sample("weather_fetch_failures_total", weather_service.fetch_errors)
+    m.family("weather_fetch_seconds", "histogram", "Weather API request latency, failures included.")
+    m.histogram("weather_fetch_seconds", weather_service.fetch_latency)
+    m.family("weather_consecutive_failures", "gauge", "Weather updates in a row that were not ok.")
+    m.sample("weather_consecutive_failures", weather_service.failures)
+    m.family("weather_backoff_seconds", "gauge", "Current delay before the next weather retry (0 when healthy).")
+    m.sample("weather_backoff_seconds", weather_service.backoff_secs())
+
+    m.family("system_sample_seconds", "histogram", "Cost of one SystemMonitor sampling round.")
+    m.histogram("system_sample_seconds", system_monitor.sample_cost)
+    m.family("persist_write_seconds", "histogram", "Time to write a persisted file.")
+    for name, histogram in write_latency.items():
+        m.histogram("persist_write_seconds", histogram, file=name)
+
+    m.family("python_threads", "gauge", "Live Python threads.")
+    m.sample("python_threads", threading.active_count())
+    own_threads = system_monitor.get_snapshot().get("self", {}).get("threads")
+    if own_threads is not None:
+        m.family("process_threads", "gauge", "OS threads in the process, as of the last system sample.")
+        m.sample("process_threads", own_threads)
+    return m.text()
+
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    timeout = 5   # a stalled client must not hold the exporter's only thread for long
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = collect_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass   # one line per scrape would drown the console
+
+
+class MetricsTCPServer(socketserver.TCPServer):
+    allow_reuse_address = True   # a restart can rebind while the old socket is in TIME_WAIT
+
+
+class MetricsExporter:
+    """Serves collect_metrics() from its own daemon thread, one request at a time, so a scrape never
+    waits on a frame or delays one. TCP on host:port (loopback by default), or a Unix socket when
+    unix_socket is set. A bind failure disables the endpoint with a warning; the app runs on."""
+    def __init__(self, config, enabled):
+        self.unix_path = config["unix_socket"] if enabled else ""
+        self._server = None
+        if not enabled:
+            return
+        try:
+            self._server, where = self._bind(config)
+        except OSError as e:
+            print(f"Warning: metrics endpoint disabled: {e}")
+            return
+        threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.25},
+                         name="metrics", daemon=True).start()
+        print(f"[METRICS] serving {where}")
+
+    def _bind(self, config):
+        if self.unix_path:
+            if not hasattr(socketserver, "UnixStreamServer"):
+                raise OSError("Unix sockets are not available on this platform")
+            if os.path.exists(self.unix_path) and stat.S_ISSOCK(os.stat(self.unix_path).st_mode):
+                os.unlink(self.unix_path)   # left behind by a run that did not exit cleanly
+            return socketserver.UnixStreamServer(self.unix_path, MetricsHandler), f"unix:{self.unix_path}"
+        host, port = config["host"], config["port"]
+        try:
+            loopback = ipaddress.ip_address(host).is_loopback
+        except ValueError:
+            loopback = host == "localhost"
+        if not loopback:
+            print(f"[METRICS] host {host} is not loopback: the endpoint is reachable from the network")
+        return MetricsTCPServer((host, port), MetricsHandler), f"http://{host}:{port}/metrics"
+
+    def stop(self):
+        server, self._server = self._server, None
+        if server is None:
+            return
+        server.shutdown()
+        server.server_close()
+        if self.unix_path:
+            with contextlib.suppress(OSError):
+                os.unlink(self.unix_path)
+
+# Replays and benchmarks never serve: they would take the live app's port
+metrics_exporter = MetricsExporter(metrics_config, enabled=metrics_config["enabled"] and not HEADLESS)
+
+
+# =================================================================================
+# 6.95 COMMAND-LINE TOOLS
+# =================================================================================
+def run_cli_tools():
+    """Run the one-shot tool requested on the command line, if any. Returns True when the app should exit."""
+    if cli_args.bench_sampler is not None:
+        run_sampler_benchmark(max(1, cli_args.bench_sampler))
+        return True
+    if cli_args.bench_gain:
+        run_gain_benchmark()
+        return True
+    return False
+
+PNG_LEVEL = 1   # zlib level for --render output: several times faster than pygame.image.save, still lossless
+
+def _png_chunk(tag, data):
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+def save_png(surface, path):
+    """Write surface as an 8-bit RGBA PNG with no row filtering and fast compression."""
+    w, h = surface.get_size()
+    pixels, stride = pygame.image.tobytes(surface, "RGBA"), w * 4
+    rows = b"".join(b"\x00" + pixels[y * stride:(y + 1) * stride] for y in range(h))
+    with open(path, 'wb') as f:
+        f.write(b"\x89PNG\r\n\x1a\n" + _png_chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 6, 0, 0, 0))
+                + _png_chunk(b"IDAT", zlib.compress(rows, PNG_LEVEL)) + _png_chunk(b"IEND", b""))
+
+def render_views_to_png(out_dir, view_list, matrix):
+    """--render: draw views, with the top bar, from the injected render_state into out_dir as
+    <view>-<theme>-<digit colour>-<background>.png. Views, fonts and glyph atlases are built once
+    for the whole batch, only widgets whose look changed repaint between images, and backgrounds
+    are the outer loop so each is decoded once. Returns the exit status."""
+    global current_theme_color, current_digit_color, current_background_key
+    names = views.names() if view_list == "all" else [n.strip() for n in view_list.split(",") if n.strip()]
+    unknown = [n for n in names if n not in views]
+    if unknown:
+        print(f"Unknown view(s) {', '.join(unknown)}; choose from {', '.join(views.names())}")
+        return 2
+    theme_name = next(n for n, c in THEMES.items() if c == current_theme_color)
+    digit_name = next(n for n, c in DIGIT_COLORS.items() if c == current_digit_color)
+    looks = ((backgrounds.keys(), list(THEMES), list(DIGIT_COLORS)) if matrix
+             else ([current_background_key], [theme_name], [digit_name]))
+
+    weather = render_state["weather"]
+    if weather is None:
+        with open(os.path.join(assets_dir, 'Output.json'), 'r') as f:
+            weather = json.load(f)
+    weather_service.pin(parse_weather(weather, weather_config["units"], weather_config["city"]))
+    system_monitor.pin(render_state["system"])
+    clock_model.source = lambda: render_epoch
+    clock_model.tick()
+    random.seed(0)   # the chibi's blink schedule
+
+    os.makedirs(out_dir, exist_ok=True)
+    outside = (-1, -1)   # no hover, no tooltips
+    started, count = time.perf_counter(), 0
+    for background, theme, digit in itertools.product(*looks):
+        current_background_key = background
+        current_theme_color, current_digit_color = THEMES[theme], DIGIT_COLORS[digit]
+        for name in names:
+            view = views[name]
+            view.on_show()
+            app_surface.fill((0, 0, 0, 0))
+            view.render(app_surface, 0, outside)
+            top_bar.update_tree(0, outside)
+            ui_surface.fill((0, 0, 0, 0))
+            top_bar.draw(ui_surface)
+            app_surface.blit(ui_surface, (0, 0))
+            save_png(app_surface, os.path.join(out_dir, f"{name}-{theme}-{digit}-{background}.png"))
+            count += 1
+    elapsed = time.perf_counter() - started
+    print(f"[RENDER] {count} images in {elapsed:.2f} s ({elapsed * 1000 / max(1, count):.1f} ms each) -> {out_dir}")
+    return 0
+
+if run_cli_tools():
+    weather_service.stop()
+    system_monitor.stop()
+    pomodoro_timer.shutdown()
+    pomodoro_history.flush()
+    os.chdir(script_dir)
+    shutil.rmtree(sandbox_dir, ignore_errors=True)
+    pygame.quit()
+    sys.exit(0)
 
 
 # =================================================================================
@@ -1129,34 +5018,37 @@ def draw_system_view(surface, theme_color, digit_color, fonts):
 # =================================================================================
 clock = pygame.time.Clock()
 running = True
+exit_status = 0
 dragging = False
 offset_x, offset_y = 0, 0
 
-# Chibi animation state
-chibi_rect = pygame.Rect(0,0,0,0)
-chibi_state = 'normal'
-chibi_frame_index = 0
-is_in_blink_sequence = False
-blink_sequence = [0,1,2,1,0]
-blink_sequence_step = 0
-last_blink_time = 0
-next_blink_delay = random.randint(2000, 5000)
-last_frame_update_time = 0
-next_state_change_time = 0
-
-# Views & flip animation
-# --- MODIFIED: Added 'system' view ---
-app_view = 'main'        # 'main' | 'settings' | 'weather' | 'pomodoro' | 'pomo_adjust' | 'system'
+# Input: live, recorded to a file, or replayed from one. Recorded runs are seeded so the
+# chibi's random blinks come out the same on replay.
+if cli_args.replay:
+    session = SessionReplayer(cli_args.replay)
+    random.seed(session.seed)
+elif cli_args.record:
+    session_seed = random.randrange(2**32)
+    random.seed(session_seed)
+    session = SessionRecorder(cli_args.record, session_seed)
+else:
+    session = LiveInput()
+
+# Views (built on first open) & flip animation
+views = ViewRegistry()
+for name, factory in (('main', MainView), ('settings', SettingsView), ('sound_settings', SoundSettingsView),
+                      ('weather', WeatherView), ('pomodoro', PomodoroView), ('pomo_adjust', PomodoroAdjustView),
+                      ('pomo_stats', PomodoroStatsView), ('system', SystemView), ('system_history', SystemHistoryView)):
+    views.register(name, factory)
+views.attach(weather_service, ('main', 'weather'))
+views.attach(system_monitor, ('system', 'system_history'))
+app_view = 'main'
 is_flipping = False
 flip_progress = 0.0
 flip_direction = 1
 from_view = 'main'
 to_view = 'main'
 
-theme_buttons, background_buttons, digit_color_buttons = {}, {}, {}
-sound_buttons = {}
-click_feedback, hover_targets = {}, {}
-
 def start_flip(target_view):
     """Begin a flip from current app_view to target_view."""
     global is_flipping, flip_progress, from_view, to_view, flip_direction, app_view
@@ -1167,404 +5059,120 @@ def start_flip(target_view):
     flip_direction = -1 if target_view == 'main' else 1
     flip_progress = 0.0
     is_flipping = True
+    if cli_args.profile == 'flip':
+        profiler.start(f"flip-{from_view}-{to_view}")
+    views[target_view].on_show()
+
+def quit_app():
+    global running
+    running = False
+
+def toggle_focus_mode():
+    global is_focus_mode
+    is_focus_mode = not is_focus_mode
+    focus_button.image = focus_icons[is_focus_mode]
+    save_settings()
+
+# Top bar (shared by every view)
+focus_icons = {active: paint_icon(draw_focus_icon, focus_button_rect, active=active) for active in (False, True)}
+top_bar = TopBar()
+top_bar.add(IconButton(settings_button_rect, settings_icon,
+                       lambda: start_flip('main' if app_view in ('settings', 'sound_settings') else 'settings'), "Settings"))
+top_bar.add(IconButton(weather_button_rect,
+                       weather_png if weather_png is not None else paint_icon(draw_weather_icon, weather_button_rect),
+                       lambda: start_flip('main' if app_view == 'weather' else 'weather'), "Weather",
+                       animated=weather_png is not None))
+top_bar.add(IconButton(pomodoro_button_rect,
+                       pomodoro_png if pomodoro_png is not None else paint_icon(draw_tomato_icon, pomodoro_button_rect),
+                       lambda: start_flip('main' if app_view in ('pomodoro', 'pomo_adjust', 'pomo_stats') else 'pomodoro'),
+                       "Pomodoro", animated=pomodoro_png is not None))
+top_bar.add(IconButton(system_button_rect, paint_icon(draw_system_icon, system_button_rect),
+                       lambda: start_flip('main' if app_view in ('system', 'system_history') else 'system'),
+                       "System Stats", animated=False))
+focus_button = top_bar.add(IconButton(focus_button_rect, focus_icons[is_focus_mode], toggle_focus_mode,
+                                      "Focus Mode", animated=False))
+top_bar.add(CloseButton(close_button_rect, quit_app, "Close"))
+
+# Reused every frame; the UI goes on its own surface so icon edges never blend with the colour key
+app_surface = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+ui_surface = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+
+if isinstance(cli_args.profile, float):
+    profiler.start("startup", seconds=cli_args.profile)
+
+if cli_args.render:
+    exit_status = render_views_to_png(cli_args.render, cli_args.render_views, cli_args.render_matrix)
+    running = False   # no frames: straight to shutdown, which also removes the sandbox
 
 while running:
-    now = pygame.time.get_ticks()
-    mouse_pos = pygame.mouse.get_pos()
+    frame_start = time.perf_counter()
+    watchdog.beat()
+    session.begin_frame()
+    now, mouse_pos = session.now, session.mouse
+    clock_model.tick()   # formats and publishes only on second / minute / day boundaries
+    config_watcher.poll()
 
     pomodoro_timer.update()
 
-    for event in pygame.event.get():
+    for event in session.events():
         if event.type == pygame.QUIT:
             running = False
 
-        # --- NEW: Mouse Wheel for To-Do scrolling ---
-        elif event.type == pygame.MOUSEWHEEL:
-            if app_view == 'main' and tasks_area_rect.collidepoint(mouse_pos):
-                if event.y > 0: # Scroll up
-                    task_scroll_offset = max(0, task_scroll_offset - 1)
-                elif event.y < 0: # Scroll down
-                    task_scroll_offset = min(max(0, len(tasks) - MAX_TASKS_DISPLAY), task_scroll_offset + 1)
-
         elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-            if close_button_rect.collidepoint(event.pos):
-                running = False
-
-            elif settings_button_rect.collidepoint(event.pos):
-                start_flip('main' if app_view == 'settings' else 'settings')
-
-            elif weather_button_rect.collidepoint(event.pos):
-                start_flip('main' if app_view == 'weather' else 'weather')
-
-            elif pomodoro_button_rect.collidepoint(event.pos):
-                start_flip('main' if app_view in ('pomodoro','pomo_adjust') else 'pomodoro')
-                if to_view == 'pomodoro':
-                    pomo_sliders_initialized = False
-                    
-            # --- NEW: System button ---
-            elif system_button_rect.collidepoint(event.pos):
-                start_flip('main' if app_view == 'system' else 'system')
-                
-            # --- NEW: Focus button ---
-            elif focus_button_rect.collidepoint(event.pos):
-                is_focus_mode = not is_focus_mode
-                save_settings()
-
-            elif app_view == 'settings':
-                for name, rect in theme_buttons.items():
-                    if rect.collidepoint(event.pos):
-                        current_theme_color = THEMES[name]; click_feedback[name] = {'start_time': now, 'scale': 0.8}; save_settings()
-                for name, rect in background_buttons.items():
-                    if rect.collidepoint(event.pos):
-                        if name == "add_custom": add_custom_background()
-                        else: current_background_key = name; click_feedback[name] = {'start_time': now, 'scale': 0.9}; save_settings()
-                for name, rect in digit_color_buttons.items():
-                    if rect.collidepoint(event.pos):
-                        current_digit_color = DIGIT_COLORS[name]; click_feedback[name] = {'start_time': now, 'scale': 0.8}; save_settings()
-                for name, rect in sound_buttons.items():
-                    if rect.collidepoint(event.pos) and name == "choose_sound": choose_custom_sound()
-
-            elif app_view == 'pomodoro':
-                for key, rect in list(pomo_buttons.items()):
-                    if rect.collidepoint(event.pos):
-                        if key == 'start': pomodoro_timer.toggle()
-                        elif key == 'reset': pomodoro_timer.reset()
-                        elif key == 'skip': pomodoro_timer.skip()
-                        elif key == 'auto': pomodoro_timer.set_auto(not pomodoro_timer.auto_advance); pomodoro_config["auto_advance"] = pomodoro_timer.auto_advance; save_settings()
-                        elif key == 'sound_toggle': sound_manager.enabled = not sound_manager.enabled; sound_config["enabled"] = sound_manager.enabled; save_settings()
-                        elif key == 'adjust':
-                            start_flip('pomo_adjust'); pomo_sliders_initialized = False
-                        break
+            button = top_bar.hit(event.pos)
+            if button is not None:
+                button.press(event.pos)
+            elif not views[app_view].handle_event(event, mouse_pos) and win32api and views[app_view].draggable \
+                    and not session.replaying:
+                dragging, offset_x, offset_y = True, *event.pos
 
-                if win32api and not any(r.collidepoint(event.pos) for r in pomo_buttons.values()) and \
-                   not any(r.collidepoint(event.pos) for r in [settings_button_rect, weather_button_rect, pomodoro_button_rect, system_button_rect, focus_button_rect, close_button_rect]):
-                    dragging, offset_x, offset_y = True, *event.pos
+        elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+            dragging = False
+            views[app_view].handle_event(event, mouse_pos)
 
-            elif app_view == 'pomo_adjust':
-                for name, s in pomo_sliders.items():
-                    if s.track_rect.collidepoint(event.pos) or s.handle_rect.collidepoint(event.pos):
-                        pomo_active_slider = name
-                        s.set_from_pos(event.pos[0])
-                        break
-                for key, rect in list(pomo_adjust_buttons.items()):
-                    if rect.collidepoint(event.pos):
-                        if key == 'save':
-                            pomodoro_config["focus_minutes"] = int(pomo_sliders["focus"].value)
-                            pomodoro_config["short_break_minutes"] = int(pomo_sliders["short"].value)
-                            pomodoro_config["long_break_minutes"] = int(pomo_sliders["long"].value)
-                            pomodoro_config["sessions_before_long"] = int(pomo_sliders["sessions"].value)
-                            sound_config["gain_percent"] = int(pomo_sliders["volume"].value)
-                            pomodoro_timer.focus_minutes = pomodoro_config["focus_minutes"]
-                            pomodoro_timer.short_break_minutes = pomodoro_config["short_break_minutes"]
-                            pomodoro_timer.long_break_minutes = pomodoro_config["long_break_minutes"]
-                            pomodoro_timer.sessions_before_long = pomodoro_config["sessions_before_long"]
-                            pomodoro_timer.reset()
-                            sound_manager.set_gain_percent(sound_config["gain_percent"])
-                            save_settings()
-                            start_flip('pomodoro')
-                        elif key == 'back':
-                            start_flip('pomodoro')
-                        break
+        elif event.type == pygame.MOUSEMOTION and dragging:
+            screen_x, screen_y = win32gui.GetCursorPos()
+            win32gui.SetWindowPos(hwnd, win32con.HWND_TOP,
+                                  screen_x - offset_x, screen_y - offset_y, 0, 0,
+                                  win32con.SWP_NOSIZE)
 
-            elif app_view == 'main':
-                # --- NEW: Chibi petting ---
-                if chibi_rect.collidepoint(event.pos):
-                    chibi_state = 'blush'
-                    next_state_change_time = now + random.randint(4000, 6000) # Stay blushing for a bit
-                    is_in_blink_sequence = True # Force a blink
-                    blink_sequence_step = 0
-                    last_blink_time = now
-                
-                elif add_task_button_rect.collidepoint(event.pos):
-                    task_input_active = not task_input_active
-                    if not task_input_active and task_input_text:
-                        tasks.append({'id': str(uuid.uuid4()), 'text': task_input_text, 'completed': False})
-                        task_input_text = ""; save_tasks(); tasks.sort(key=lambda t: t['completed'])
-                elif input_box_rect.collidepoint(event.pos) and task_input_active:
-                    pass
-                else:
-                    if task_input_active:
-                        if task_input_text:
-                            tasks.append({'id': str(uuid.uuid4()), 'text': task_input_text, 'completed': False})
-                            task_input_text = ""; save_tasks(); tasks.sort(key=lambda t: t['completed'])
-                        task_input_active = False
-
-                for task_id, rect in list(task_rects.items()):
-                    if rect.collidepoint(event.pos):
-                        if task_id.endswith('_del'):
-                            original_task_id = task_id.replace('_del', '')
-                            tasks[:] = [t for t in tasks if t['id'] != original_task_id]
-                            save_tasks(); tasks.sort(key=lambda t: t['completed'])
-                        else:
-                            for task in tasks:
-                                if task['id'] == task_id:
-                                    task['completed'] = not task['completed']; save_tasks(); tasks.sort(key=lambda t: t['completed']); break
-                        break
-                
-                # --- MODIFIED: Added new buttons to drag check ---
-                if win32api and not add_task_button_rect.collidepoint(event.pos) and \
-                   not input_box_rect.collidepoint(event.pos) and \
-                   not any(r.collidepoint(event.pos) for r in task_rects.values()) and \
-                   not chibi_rect.collidepoint(event.pos) and \
-                   not any(r.collidepoint(event.pos) for r in [settings_button_rect, weather_button_rect, pomodoro_button_rect, system_button_rect, focus_button_rect, close_button_rect]):
-                    dragging, offset_x, offset_y = True, *event.pos
+        elif event.type == pygame.KEYDOWN and event.key in [pygame.K_q, pygame.K_ESCAPE]:
+            running = False
 
-        elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
-            dragging = False
-            pomo_active_slider = None
-
-        elif event.type == pygame.MOUSEMOTION and win32api:
-            if dragging:
-                screen_x, screen_y = win32gui.GetCursorPos()
-                win32gui.SetWindowPos(hwnd, win32con.HWND_TOP,
-                                      screen_x - offset_x, screen_y - offset_y, 0, 0,
-                                      win32con.SWP_NOSIZE)
-            if app_view == 'pomo_adjust' and pomo_active_slider:
-                s = pomo_sliders.get(pomo_active_slider)
-                if s: s.set_from_pos(event.pos[0])
-
-        elif event.type == pygame.KEYDOWN:
-            if event.key in [pygame.K_q, pygame.K_ESCAPE]:
-                running = False
-            elif task_input_active:
-                if event.key == pygame.K_RETURN:
-                    if task_input_text:
-                        tasks.append({'id': str(uuid.uuid4()), 'text': task_input_text, 'completed': False})
-                        task_input_text = ""; save_tasks(); tasks.sort(key=lambda t: t['completed'])
-                    task_input_active = False
-                elif event.key == pygame.K_BACKSPACE:
-                    task_input_text = task_input_text[:-1]
-                else:
-                    if font_tiny.size(task_input_text + event.unicode)[0] < input_box_rect.width - 20:
-                        task_input_text += event.unicode
-
-    # --- Chibi animation ---
-    if now > next_state_change_time:
-        chibi_state = 'blush' if chibi_state == 'normal' and random.random() < 0.4 else 'normal'
-        next_state_change_time = now + random.randint(5000 if chibi_state == 'blush' else 10000,
-                                                      8000 if chibi_state == 'blush' else 20000)
-    if not is_in_blink_sequence and now - last_blink_time > next_blink_delay:
-        is_in_blink_sequence = True; blink_sequence_step = 0
-        last_blink_time = now; next_blink_delay = random.randint(2000, 5000)
-    if is_in_blink_sequence and now - last_frame_update_time > 75:
-        chibi_frame_index = blink_sequence[blink_sequence_step]
-        blink_sequence_step += 1; last_frame_update_time = now
-        if blink_sequence_step >= len(blink_sequence):
-            is_in_blink_sequence = False; blink_sequence_step = 0
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_F9:
+            memory_report.print_report()
+
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_F10:
+            profiler.toggle("manual")
+
+        else:
+            views[app_view].handle_event(event, mouse_pos)
 
     screen.fill(TRANSPARENT_COLOR)
-    app_surface = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
 
     # --- Flip animation progress ---
     if is_flipping:
         flip_progress += 0.05
         if flip_progress >= 1.0:
             flip_progress = 1.0; is_flipping = False; app_view = to_view
+            if cli_args.profile == 'flip':
+                profiler.stop()
 
     current_content_view = to_view if flip_progress > 0.5 else from_view
+    views.show((from_view, to_view) if is_flipping else (app_view,))
 
-    # --- Render views ---
-    if current_content_view == 'main':
-        app_surface.blit(rounded_backgrounds[current_background_key], (0, 0))
-        
-        # --- MODIFIED: Focus Mode ---
-        # Calculate alpha for fading elements
-        focus_alpha = 0 if is_focus_mode else 255
-        
-        # Weather Summary
-        weather_surf = pygame.Surface((200, 30), pygame.SRCALPHA)
-        draw_weather_summary_inline(weather_surf, (0, 0), (font_small, font_tiny), current_theme_color)
-        weather_surf.set_alpha(focus_alpha)
-        app_surface.blit(weather_surf, (24, 52))
-        
-        chibi_y_offset = math.sin(now * 0.001) * 5
-        chibi_image = chibi_frames[chibi_state][chibi_frame_index]
-        chibi_rect = chibi_image.get_rect(center=(WIDTH // 2, HEIGHT - 100 + chibi_y_offset))
-        app_surface.blit(chibi_image, chibi_rect)
-
-        currentTime = datetime.now()
-        time_str = currentTime.strftime("%I:%M")
-        seconds_str = currentTime.strftime("%S")
-        ampm_str = currentTime.strftime("%p")
-        date_str = currentTime.strftime("%A, %B %d")
-
-        time_rect = font_bold.render(time_str, True, (0,0,0)).get_rect(center=(WIDTH // 2, HEIGHT // 2 - 80))
-        draw_text_with_shadow(app_surface, time_str, font_bold, current_digit_color, time_rect.topleft)
-
-        colon_alpha = (math.sin(now*0.002)+1)/2*255
-        colon_surface = font_bold.render(":", True, current_digit_color)
-        colon_surface.set_alpha(colon_alpha); app_surface.blit(colon_surface, colon_surface.get_rect(center=time_rect.center))
-
-        secondary_color = (100,100,100) if current_digit_color == DIGIT_COLORS["Black"] else (200,200,200)
-        app_surface.blit(font_small.render(ampm_str, True, secondary_color), (time_rect.right + 10, time_rect.top + 15))
-        app_surface.blit(font_small.render(seconds_str, True, secondary_color), (time_rect.right + 10, time_rect.bottom - 30))
-
-        # Date string (Focus Mode)
-        date_surf = pygame.Surface(font_regular.size(date_str), pygame.SRCALPHA)
-        draw_text_with_shadow(date_surf, date_str, font_regular, current_theme_color, (0,0))
-        date_surf.set_alpha(focus_alpha)
-        date_pos = font_regular.render(date_str, True, (0,0,0)).get_rect(center=(WIDTH//2, HEIGHT//2 + 20)).topleft
-        app_surface.blit(date_surf, date_pos)
-
-        # --- MODIFIED: To-Do List with scrolling and focus mode ---
-        todo_list_surf = pygame.Surface(tasks_area_rect.size, pygame.SRCALPHA)
-        todo_list_surf.fill((0,0,0,0)) # Transparent
-        
-        draw_text_with_shadow(todo_list_surf, "To-Do List", font_small, (220,220,220), (10, 0))
-        
-        task_y = 40; task_rects = {}
-        
-        tasks_to_display = tasks[task_scroll_offset : task_scroll_offset + MAX_TASKS_DISPLAY]
-        
-        for i, task in enumerate(tasks_to_display):
-            task_text_color = (150,150,150) if task['completed'] else (255,255,255)
-            task_surface = font_tiny.render(task['text'], True, task_text_color)
-            task_text_rect = task_surface.get_rect(topleft=(10, task_y))
-            todo_list_surf.blit(task_surface, task_text_rect)
-            
-            if task['completed']:
-                pygame.draw.line(todo_list_surf, task_text_color, (task_text_rect.left, task_text_rect.centery),
-                                 (task_text_rect.right, task_text_rect.centery), 1)
-                                 
-            # Store rects relative to the main app surface for click detection
-            global_task_rect = task_text_rect.move(tasks_area_rect.x, tasks_area_rect.y)
-            task_rects[task['id']] = global_task_rect
-            
-            delete_button_rect = delete_task_icon.get_rect(midleft=(task_text_rect.right + 10, task_text_rect.centery))
-            todo_list_surf.blit(delete_task_icon, delete_button_rect)
-            
-            global_del_rect = delete_button_rect.move(tasks_area_rect.x, tasks_area_rect.y)
-            task_rects[task['id'] + '_del'] = global_del_rect
-            
-            task_y += 30
-
-        # Draw scrollbar if needed
-        if len(tasks) > MAX_TASKS_DISPLAY:
-            track_h = tasks_area_rect.height - 40
-            track_rect = pygame.Rect(tasks_area_rect.width - 12, 40, 8, track_h)
-            pygame.draw.rect(todo_list_surf, (60,60,60), track_rect, border_radius=4)
-            
-            thumb_h = max(20, (MAX_TASKS_DISPLAY / len(tasks)) * track_h)
-            thumb_y_ratio = task_scroll_offset / (len(tasks) - MAX_TASKS_DISPLAY)
-            thumb_y = track_rect.y + thumb_y_ratio * (track_h - thumb_h)
-            thumb_rect = pygame.Rect(track_rect.x, thumb_y, 8, thumb_h)
-            pygame.draw.rect(todo_list_surf, current_theme_color, thumb_rect, border_radius=4)
-
-        todo_list_surf.set_alpha(focus_alpha)
-        app_surface.blit(todo_list_surf, tasks_area_rect.topleft)
-
-        # Add task button (Focus Mode)
-        add_task_surf = pygame.Surface(add_task_button_rect.size, pygame.SRCALPHA)
-        add_task_surf.blit(add_task_icon, (0,0))
-        add_task_surf.set_alpha(focus_alpha)
-        app_surface.blit(add_task_surf, add_task_button_rect)
-
-
-        if task_input_active:
-            pygame.draw.rect(app_surface, (60,60,60), input_box_rect, border_radius=8)
-            pygame.draw.rect(app_surface, (100,100,100), input_box_rect, 2, border_radius=8)
-            input_text_surface = font_tiny.render(task_input_text, True, (255,255,255))
-            app_surface.blit(input_text_surface, (input_box_rect.x + 10, input_box_rect.y + 10))
-            if now % 1000 < 500:
-                cx = input_box_rect.x + 10 + input_text_surface.get_width()
-                pygame.draw.line(app_surface, (255,255,255), (cx, input_box_rect.y + 10), (cx, input_box_rect.y + input_box_rect.height - 10), 2)
-
-    elif current_content_view == 'settings':
-        pygame.draw.rect(app_surface, (40,42,54), (0,0,WIDTH,HEIGHT), border_radius=CORNER_RADIUS)
-        draw_text_with_shadow(app_surface, "Settings", font_regular, (255,255,255), (30, 30))
-        draw_text_with_shadow(app_surface, "Theme Color", font_small, (220,220,220), (50, 100))
-        draw_text_with_shadow(app_surface, "Background",  font_small, (220,220,220), (50, 220))
-        draw_text_with_shadow(app_surface, "Digit Color", font_small, (220,220,220), (50, 340))
-        draw_text_with_shadow(app_surface, "Sound",       font_small, (220,220,220), (50, 460))
-
-        theme_buttons = {}; background_buttons = {}; digit_color_buttons = {}; sound_buttons = {}
-
-        x = 50
-        for name, color in THEMES.items():
-            rect = pygame.Rect(x, 140, 80, 40); theme_buttons[name] = rect
-            feedback = click_feedback.get(name); scale = 1.0
-            if feedback:
-                elapsed = now - feedback['start_time']
-                if elapsed < 200: scale = 0.8 + ease_out_quad(elapsed/200)*0.2
-                else: click_feedback.pop(name)
-            scaled_rect = rect.inflate((rect.width*scale)-rect.width, (rect.height*scale)-rect.height)
-            pygame.draw.rect(app_surface, color, scaled_rect, border_radius=8)
-            if current_theme_color == color: pygame.draw.rect(app_surface, (255,255,255), rect, 2, border_radius=8)
-            x += 100
-
-        x = 50
-        for name, image in raw_backgrounds.items():
-            rect = pygame.Rect(x, 260, 100, 60); background_buttons[name] = rect
-            feedback = click_feedback.get(name); scale = 1.0
-            if feedback:
-                elapsed = now - feedback['start_time']
-                if elapsed < 200: scale = 0.9 + ease_out_quad(elapsed/200)*0.1
-                else: click_feedback.pop(name)
-            scaled_rect = rect.inflate((rect.width*scale)-rect.width, (rect.height*scale)-rect.height)
-            preview = pygame.transform.scale(rounded_backgrounds[name], scaled_rect.size)
-            app_surface.blit(preview, scaled_rect)
-            if current_background_key == name: pygame.draw.rect(app_surface, current_theme_color, rect, 2, border_radius=5)
-            x += 120
-
-        plus_rect = pygame.Rect(x, 260, 100, 60)
-        background_buttons["add_custom"] = plus_rect
-        pygame.draw.rect(app_surface, (255,255,255), plus_rect, 2, border_radius=8)
-        pygame.draw.line(app_surface, (255,255,255), (plus_rect.centerx - 15, plus_rect.centery), (plus_rect.centerx + 15, plus_rect.centery), 3)
-        pygame.draw.line(app_surface, (255,255,255), (plus_rect.centerx, plus_rect.centery - 15), (plus_rect.centerx, plus_rect.centery + 15), 3)
-
-        x = 50
-        for name, color in DIGIT_COLORS.items():
-            rect = pygame.Rect(x, 380, 80, 40); digit_color_buttons[name] = rect
-            feedback = click_feedback.get(name); scale = 1.0
-            display_color = color if name != "Black" else (80,80,80)
-            if feedback:
-                elapsed = now - feedback['start_time']
-                if elapsed < 200: scale = 0.8 + ease_out_quad(elapsed/200)*0.2
-                else: click_feedback.pop(name)
-            scaled_rect = rect.inflate((rect.width*scale)-rect.width, (rect.height*scale)-rect.height)
-            pygame.draw.rect(app_surface, display_color, scaled_rect, border_radius=8)
-            if current_digit_color == color: pygame.draw.rect(app_surface, (255,255,255), rect, 2, border_radius=8)
-            text_color = (0,0,0) if name == "White" else (255,255,255)
-            name_surf = font_small.render(name, True, text_color)
-            app_surface.blit(name_surf, name_surf.get_rect(center=rect.center))
-            x += 100
-
-        choose_rect = pygame.Rect(50, 500, 100, 60)
-        sound_buttons["choose_sound"] = choose_rect
-        pygame.draw.rect(app_surface, (255,255,255), choose_rect, 2, border_radius=8)
-        pygame.draw.line(app_surface, (255,255,255), (choose_rect.centerx - 15, choose_rect.centery), (choose_rect.centerx + 15, choose_rect.centery), 3)
-        pygame.draw.line(app_surface, (255,255,255), (choose_rect.centerx, choose_rect.centery - 15), (choose_rect.centerx, choose_rect.centery + 15), 3)
-        preview = os.path.basename(sound_config["path"]) if sound_config["path"] else "Default beep / Custom"
-        name_surf = font_tiny.render(preview, True, (230,230,230))
-        app_surface.blit(name_surf, (choose_rect.right + 12, choose_rect.centery - name_surf.get_height()//2))
-
-    elif current_content_view == 'weather':
-        app_surface.blit(rounded_backgrounds[current_background_key], (0,0))
-        draw_weather_view(app_surface, current_theme_color, current_digit_color,
-                          (font_small, font_tiny, font_regular, font_bold, font_weather_big))
-
-    # --- NEW: System view render ---
-    elif current_content_view == 'system':
-        app_surface.blit(rounded_backgrounds[current_background_key], (0,0))
-        draw_system_view(app_surface, current_theme_color, current_digit_color,
-                         (font_small, font_tiny, font_regular, font_sys_big))
-
-    elif current_content_view == 'pomo_adjust':
-        app_surface.blit(rounded_backgrounds[current_background_key], (0,0))
-        draw_pomodoro_adjust_view(app_surface, current_theme_color, current_digit_color,
-                                  (font_small, font_tiny, font_regular))
-
-    else:  # 'pomodoro'
-        app_surface.blit(rounded_backgrounds[current_background_key], (0,0))
-        draw_pomodoro_view(app_surface, current_theme_color, current_digit_color,
-                           (font_small, font_tiny, font_regular, font_pomo_big))
+    # --- Render the current view's widget tree (only invalidated widgets repaint) ---
+    app_surface.fill((0, 0, 0, 0))
+    views[current_content_view].render(app_surface, now, mouse_pos)
 
     # --- Flip perspective effect ---
     eased = ease_in_out_quad(flip_progress); scale_x = math.cos(eased * math.pi)
     anim_width = int(WIDTH * abs(scale_x))
-    if anim_width > 0:
+    if anim_width >= WIDTH:
+        screen.blit(app_surface, (0, 0))  # not flipping: nothing to scale or shear
+    elif anim_width > 0:
         scaled_surface = pygame.transform.scale(app_surface, (anim_width, HEIGHT))
-        perspective_shift_amount = 50
+        perspective_shift_amount = px(50)
         perspective_shift = int((1 - abs(scale_x)) * perspective_shift_amount * flip_direction)
         distorted_surface = pygame.Surface((anim_width, HEIGHT), pygame.SRCALPHA)
         for y in range(HEIGHT):
@@ -1574,79 +5182,39 @@ while running:
             distorted_surface.blit(temp_row_surface.subsurface(abs(row_offset) + row_offset, 0, anim_width, 1), (0, y))
         screen.blit(distorted_surface, ((WIDTH - anim_width)//2, 0))
 
-    # --- MODIFIED: Draw all static UI to a separate surface to fix green glow ---
-    
-    # Create a new, fully transparent surface for the UI
-    ui_surface = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-
-    # --- Top buttons + hovers (Hover logic is unchanged) ---
-    for key, rect in [('settings', settings_button_rect),
-                      ('weather',  weather_button_rect),
-                      ('pomodoro', pomodoro_button_rect),
-                      ('system',   system_button_rect),
-                      ('focus',    focus_button_rect),
-                      ('close',    close_button_rect)]:
-        if key not in hover_targets:
-            hover_targets[key] = {'scale': 1.0, 'angle': 0.0, 'tip_alpha': 0.0}
-        is_hover = rect.collidepoint(mouse_pos)
-        target_scale = 1.2 if is_hover else 1.0
-        target_angle = -15 if is_hover else 0
-        target_alpha = 255.0 if is_hover else 0.0
-        hover_targets[key]['scale'] += (target_scale - hover_targets[key]['scale']) * 0.2
-        hover_targets[key]['angle'] += (target_angle - hover_targets[key]['angle']) * 0.2
-        hover_targets[key]['tip_alpha'] += (target_alpha - hover_targets[key]['tip_alpha']) * 0.25
-
-    # --- Draw all icons to the new ui_surface ---
-    settings_icon_rot = pygame.transform.rotozoom(settings_icon, hover_targets['settings']['angle'], hover_targets['settings']['scale'])
-    ui_surface.blit(settings_icon_rot, settings_icon_rot.get_rect(center=settings_button_rect.center))
-
-    if weather_png is not None:
-        weather_icon_rot = pygame.transform.rotozoom(weather_png, hover_targets['weather']['angle'], hover_targets['weather']['scale'])
-        ui_surface.blit(weather_icon_rot, weather_icon_rot.get_rect(center=weather_button_rect.center))
-    else:
-        draw_weather_icon(ui_surface, weather_button_rect, color=(255,255,255)) # Draw to ui_surface
-
-    if pomodoro_png is not None:
-        pomo_icon_rot = pygame.transform.rotozoom(pomodoro_png, hover_targets['pomodoro']['angle'], hover_targets['pomodoro']['scale'])
-        ui_surface.blit(pomo_icon_rot, pomo_icon_rot.get_rect(center=pomodoro_button_rect.center))
-    else:
-        draw_tomato_icon(ui_surface, pomodoro_button_rect) # Draw to ui_surface
-        
-    draw_system_icon(ui_surface, system_button_rect) # Draw to ui_surface
-    draw_focus_icon(ui_surface, focus_button_rect, active=is_focus_mode) # Draw to ui_surface
-
-    close_button_bg_color = (255, 0, 0, 200) if close_button_rect.collidepoint(mouse_pos) else (40, 42, 54, 180)
-    btn_surf = pygame.Surface(close_button_rect.size, pygame.SRCALPHA)
-    pygame.draw.rect(btn_surf, close_button_bg_color, btn_surf.get_rect(), border_radius=5)
-    ui_surface.blit(btn_surf, close_button_rect.topleft) # Draw to ui_surface
-    
-    close_surf = pygame.transform.rotozoom(font_small.render("X", True, (255,255,255)),
-                                           hover_targets['close']['angle'], hover_targets['close']['scale'])
-    ui_surface.blit(close_surf, close_surf.get_rect(center=close_button_rect.center)) # Draw to ui_surface
-
-    # Tooltips
-    for key, label, rect in [
-        ('settings', 'Settings', settings_button_rect),
-        ('weather',  'Weather',  weather_button_rect),
-        ('pomodoro', 'Pomodoro', pomodoro_button_rect),
-        ('system',   'System Stats', system_button_rect),
-        ('focus',    'Focus Mode',   focus_button_rect),
-        ('close',    'Close',    close_button_rect),
-    ]:
-        alpha = int(hover_targets.get(key, {}).get('tip_alpha', 0))
-        draw_tooltip(ui_surface, label, rect, font_tiny, alpha) # Draw to ui_surface
-
-    # --- Finally, blit the entire UI surface onto the main screen ---
+    # --- Top bar: icons, hover easing and tooltips ---
+    top_bar.update_tree(now, mouse_pos)
+    ui_surface.fill((0, 0, 0, 0))
+    top_bar.draw(ui_surface)
     screen.blit(ui_surface, (0, 0))
 
     pygame.display.flip()
-    clock.tick(60)
+    frame_ms = (time.perf_counter() - frame_start) * 1000
+    system_monitor.frame_stats.record(frame_ms)
+    session.end_frame(frame_ms)
+    if not session.replaying:  # a replay runs on its recorded clock, as fast as it can
+        clock.tick(60)
 
 # =================================================================================
 # 9. SAVE SETTINGS & QUIT
 # =================================================================================
+watchdog.stop()   # shutdown work below is not a stalled frame
+config_watcher.stop()
+profiler.stop(wait=True)
+metrics_exporter.stop()
 save_settings()
 save_tasks()
+pomodoro_timer.shutdown()
+pomodoro_history.flush()
 if weather_service: weather_service.stop()
 if system_monitor: system_monitor.stop() # --- NEW ---
-pygame.quit()
\ No newline at end of file
+session.close()
+if cli_args.memory_report:
+    memory_report.print_report()
+if session.replaying:
+    exit_status = session.report(session_state_hash(), cli_args.replay_timings, cli_args.expect_hash)
+if sandbox_dir:
+    os.chdir(script_dir)
+    shutil.rmtree(sandbox_dir, ignore_errors=True)
+pygame.quit()
+sys.exit(exit_status)